@@ -27,6 +27,10 @@ from app.models import reseller # Ensure ResellerProfile is loaded
 from app.models import product  # Ensure ProductPackage is loaded
 from app.models import order    # Ensure Order is loaded
 from app.models import commission # Ensure Commission is loaded
+from app.models import sales_rollup # Ensure ResellerSalesRollup is loaded
+from app.models import commission_outbox # Ensure CommissionOutbox is loaded
+from app.models import payment_event # Ensure PaymentWebhookEvent is loaded
+from app.models import idempotency # Ensure IdempotencyKey is loaded
 from app.db.base_class import Base # Import your Base
 from app.core.config import SQLALCHEMY_DATABASE_URI # Import your DB URI
 
@@ -0,0 +1,30 @@
+"""add order status created_at index
+
+Revision ID: 468a280450bb
+Revises: a1cdcf5b07db
+Create Date: 2026-10-17 04:24:34.890824
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '468a280450bb'
+down_revision: Union[str, None] = 'a1cdcf5b07db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Serves the stale unpaid order sweeper (app/core/order_sweeper.py). ix_order_order_status
+    # stays: reads of one status by id (get_completed_orders_after) use its (status, id) order.
+    op.create_index('ix_order_order_status_created_at', 'order', ['order_status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_order_order_status_created_at', table_name='order')
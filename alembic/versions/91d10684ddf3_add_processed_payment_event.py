@@ -0,0 +1,35 @@
+"""add_processed_payment_event
+
+Revision ID: 91d10684ddf3
+Revises: 7a0ef7655b02
+Create Date: 2026-10-17 03:44:50.878043
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '91d10684ddf3'
+down_revision: Union[str, None] = '7a0ef7655b02'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('processed_payment_event',
+    sa.Column('event_id', sa.String(length=255), nullable=False),
+    sa.Column('event_type', sa.String(length=100), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+    sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index(op.f('ix_processed_payment_event_processed_at'), 'processed_payment_event', ['processed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_processed_payment_event_processed_at'), table_name='processed_payment_event')
+    op.drop_table('processed_payment_event')
@@ -0,0 +1,28 @@
+"""add order version
+
+Revision ID: a1cdcf5b07db
+Revises: 895584cc4c47
+Create Date: 2026-10-17 04:01:37.708063
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1cdcf5b07db'
+down_revision: Union[str, None] = '895584cc4c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('order', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('order', 'version')
@@ -0,0 +1,55 @@
+"""add_reseller_sales_rollup
+
+Revision ID: a93c5e71d2b8
+Revises: f81d3b2c6a07
+Create Date: 2026-10-17 16:21:07.418356
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a93c5e71d2b8'
+down_revision: Union[str, None] = 'f81d3b2c6a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reseller_sales_rollup',
+    sa.Column('reseller_id', sa.Integer(), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('currency', sa.String(length=3), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('commission_total', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['reseller_id'], ['reseller_profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('reseller_id', 'period_start', 'currency')
+    )
+    # Backfill, as crud_team_volume.rebuild_sales_rollup does: COMPLETED orders count
+    # for their seller, commissions for their earner, both in the order's month.
+    if op.get_bind().dialect.name == 'postgresql':
+        month = "CAST(date_trunc('month', {}) AS DATE)"
+    else:
+        month = "date({}, 'start of month')"
+    op.execute(
+        "INSERT INTO reseller_sales_rollup (reseller_id, period_start, currency, order_count, revenue, commission_total) "
+        "SELECT reseller_id, period_start, currency, SUM(order_count), SUM(revenue), SUM(commission_total) FROM ("
+        f" SELECT reseller_id, {month.format('created_at')} AS period_start, currency_paid AS currency,"
+        "  1 AS order_count, price_paid AS revenue, 0 AS commission_total"
+        " FROM \"order\" WHERE order_status = 'COMPLETED'"
+        " UNION ALL"
+        f" SELECT commission.reseller_id, {month.format('o.created_at')}, commission.currency, 0, 0, commission.amount"
+        " FROM commission JOIN \"order\" o ON o.id = commission.order_id"
+        ") AS sales "
+        "GROUP BY reseller_id, period_start, currency"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('reseller_sales_rollup')
@@ -0,0 +1,45 @@
+"""add_listing_composite_indexes
+
+Revision ID: c41f2d9e8a17
+Revises: 7a629e8e322e
+Create Date: 2026-10-17 09:12:41.503118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41f2d9e8a17'
+down_revision: Union[str, None] = '7a629e8e322e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Composite indexes matching the listing queries: filter columns first, then the
+    # (created_at, id) sort key used by offset and keyset pagination.
+    op.create_index('ix_order_reseller_id_created_at', 'order', ['reseller_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_order_customer_email_created_at', 'order', ['customer_email', 'created_at', 'id'], unique=False)
+    op.create_index('ix_commission_reseller_id_created_at', 'commission', ['reseller_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_commission_reseller_id_status_created_at', 'commission', ['reseller_id', 'commission_status', 'created_at', 'id'], unique=False)
+    op.create_index('ix_product_package_country_code_is_active_name', 'product_package', ['country_code', 'is_active', 'name'], unique=False)
+    op.create_index(op.f('ix_reseller_profile_recruiter_id'), 'reseller_profile', ['recruiter_id'], unique=False)
+    # Superseded by the composites above (same leading column)
+    op.drop_index(op.f('ix_order_customer_email'), table_name='order')
+    op.drop_index(op.f('ix_commission_reseller_id'), table_name='commission')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_commission_reseller_id'), 'commission', ['reseller_id'], unique=False)
+    op.create_index(op.f('ix_order_customer_email'), 'order', ['customer_email'], unique=False)
+    op.drop_index(op.f('ix_reseller_profile_recruiter_id'), table_name='reseller_profile')
+    op.drop_index('ix_product_package_country_code_is_active_name', table_name='product_package')
+    op.drop_index('ix_commission_reseller_id_status_created_at', table_name='commission')
+    op.drop_index('ix_commission_reseller_id_created_at', table_name='commission')
+    op.drop_index('ix_order_customer_email_created_at', table_name='order')
+    op.drop_index('ix_order_reseller_id_created_at', table_name='order')
@@ -0,0 +1,29 @@
+"""add_product_commission_rules
+
+Revision ID: c9d4a6e31f58
+Revises: b57e2d90c4a3
+Create Date: 2026-10-17 19:32:16.504127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d4a6e31f58'
+down_revision: Union[str, None] = 'b57e2d90c4a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL: existing products keep paying their *_rate_or_amount fields as fixed amounts
+    op.add_column('product_package', sa.Column('commission_rules', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('product_package', 'commission_rules')
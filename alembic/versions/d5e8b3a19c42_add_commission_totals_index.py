@@ -0,0 +1,30 @@
+"""add_commission_totals_index
+
+Revision ID: d5e8b3a19c42
+Revises: c41f2d9e8a17
+Create Date: 2026-10-17 11:03:27.218940
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e8b3a19c42'
+down_revision: Union[str, None] = 'c41f2d9e8a17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Covering index for SUM/COUNT grouped by status and currency per reseller:
+    # the aggregate is answered from the index alone, already in group order.
+    op.create_index('ix_commission_reseller_id_status_currency_amount', 'commission', ['reseller_id', 'commission_status', 'currency', 'amount'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_commission_reseller_id_status_currency_amount', table_name='commission')
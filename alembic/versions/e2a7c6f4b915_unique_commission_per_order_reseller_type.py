@@ -0,0 +1,61 @@
+"""unique_commission_per_order_reseller_type
+
+Revision ID: e2a7c6f4b915
+Revises: d5e8b3a19c42
+Create Date: 2026-10-17 12:26:09.481377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a7c6f4b915'
+down_revision: Union[str, None] = 'd5e8b3a19c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Which row of a duplicate commission set is kept: the furthest along the payout, then the earliest
+_STATUS_RANK = (
+    "CASE commission_status WHEN 'PAID' THEN 0 WHEN 'READY_FOR_PAYOUT' THEN 1 WHEN 'UNPAID' THEN 2"
+    " WHEN 'PENDING_VALIDATION' THEN 3 ELSE 4 END"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    connection = op.get_bind()
+    # Several PAID rows for one set are payouts that really happened: deleting any of
+    # them would lose payout history, so leave that to someone rather than guess
+    paid_twice = connection.execute(sa.text(
+        "SELECT order_id, reseller_id, commission_type, COUNT(*) FROM commission"
+        " WHERE commission_status = 'PAID' GROUP BY order_id, reseller_id, commission_type HAVING COUNT(*) > 1"
+    )).fetchall()
+    if paid_twice:
+        report = "\n".join(
+            f"  order_id={order_id} reseller_id={reseller_id} commission_type={commission_type}: {count} PAID rows"
+            for order_id, reseller_id, commission_type, count in paid_twice
+        )
+        raise RuntimeError(
+            "Duplicate commissions were paid more than once; resolve them by hand before upgrading:\n" + report
+        )
+    # Otherwise keep one row of each duplicate set, so the unique index can be built
+    op.execute(
+        "DELETE FROM commission WHERE id IN (SELECT id FROM ("
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY order_id, reseller_id, commission_type"
+        f" ORDER BY {_STATUS_RANK}, id) AS keep_rank FROM commission) ranked WHERE keep_rank > 1)"
+    )
+    # A unique index rather than a table constraint: SQLite cannot add constraints with
+    # ALTER TABLE, and ON CONFLICT (order_id, reseller_id, commission_type) works with either.
+    op.create_index('uq_commission_order_id_reseller_id_commission_type', 'commission', ['order_id', 'reseller_id', 'commission_type'], unique=True)
+    # Superseded by the unique index (same leading column)
+    op.drop_index(op.f('ix_commission_order_id'), table_name='commission')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_commission_order_id'), 'commission', ['order_id'], unique=False)
+    op.drop_index('uq_commission_order_id_reseller_id_commission_type', table_name='commission')
@@ -0,0 +1,51 @@
+"""add_reseller_closure
+
+Revision ID: f81d3b2c6a07
+Revises: e2a7c6f4b915
+Create Date: 2026-10-17 14:02:51.730264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81d3b2c6a07'
+down_revision: Union[str, None] = 'e2a7c6f4b915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reseller_closure',
+    sa.Column('ancestor_id', sa.Integer(), nullable=False),
+    sa.Column('descendant_id', sa.Integer(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['reseller_profile.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['reseller_profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_reseller_closure_ancestor_id_depth', 'reseller_closure', ['ancestor_id', 'depth', 'descendant_id'], unique=False)
+    op.create_index('ix_reseller_closure_descendant_id_depth', 'reseller_closure', ['descendant_id', 'depth', 'ancestor_id'], unique=False)
+    # Backfill from recruiter_id: every reseller paired with itself and with each of its
+    # descendants. Existing data is assumed acyclic, as it has no way to express a cycle's depth.
+    op.execute(
+        "INSERT INTO reseller_closure (ancestor_id, descendant_id, depth) "
+        "WITH RECURSIVE tree(ancestor_id, descendant_id, depth) AS ("
+        " SELECT id, id, 0 FROM reseller_profile"
+        " UNION ALL"
+        " SELECT tree.ancestor_id, reseller_profile.id, tree.depth + 1"
+        " FROM tree JOIN reseller_profile ON reseller_profile.recruiter_id = tree.descendant_id"
+        ") "
+        "SELECT ancestor_id, descendant_id, depth FROM tree"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reseller_closure_descendant_id_depth', table_name='reseller_closure')
+    op.drop_index('ix_reseller_closure_ancestor_id_depth', table_name='reseller_closure')
+    op.drop_table('reseller_closure')
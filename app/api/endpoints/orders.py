@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from app.crud import crud_order, crud_product, crud_reseller # crud_reseller is needed for public endpoint
@@ -9,36 +9,45 @@ from app.schemas.order import (
     OrderUpdate,
     OrderCreateInternal,
     OrderCreatePublic, # Import the new schema
+    OrderBatchCreate,
+    OrderBatchItemResult,
+    OrderBatchResult,
 )
 # from app.models.product import ProductPackage # Not directly needed if using CRUD
-from app.models.reseller import ResellerProfile # For type hinting current_user
+from app.schemas.token import Principal # For type hinting current_user
 # from app.schemas.order import OrderStatus # If defined as Enum
-from app.core.commissions_calculator import calculate_and_record_commissions
-from app.crud import crud_commission # Added import for crud_commission
-from app.db.session import get_db
+from app.core.commission_outbox import update_order_and_enqueue_commissions_async
+from app.core import idempotency
+from app.core.order_writer import order_writer
+from app.db.session import get_async_db
 from app.core.dependencies import get_current_active_user, get_current_active_superuser
+from app.utils.pagination import CURSOR_DESCRIPTION, set_next_cursor_header
 import logging # For logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__) # For logging within the endpoint
 
-# Define order status constants if not using an Enum yet
-ORDER_STATUS_COMPLETED = "COMPLETED"
-
 @router.post("/", response_model=Order, status_code=201)
 async def create_new_order(
     order_in: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user),
+    idempotency_key: Optional[str] = Depends(idempotency.idempotency_key_header),
 ):
     """
     Create a new order. The authenticated user is the reseller for this sale.
     Product details (price, duration, country) are fetched from the database.
+    Retries sent with the same Idempotency-Key header return the order first created.
     """
     reseller_id = current_user.id
+    scope = f"orders:reseller:{reseller_id}"
+    if idempotency_key:
+        replayed = await idempotency.replay(db, scope=scope, key=idempotency_key, request=order_in)
+        if replayed is not None:
+            return replayed
 
     # Get product details to confirm price, duration, country_code
-    product = crud_product.get_product(db, product_id=order_in.product_package_id, show_inactive=False) # Ensure product is active
+    product = await crud_product.get_product_cached_async(db, product_id=order_in.product_package_id, show_inactive=False) # Ensure product is active
     if not product: # crud_product.get_product returns None if not found or not active (if show_inactive=False)
         raise HTTPException(status_code=404, detail="Product not found or not active")
 
@@ -55,41 +64,48 @@ async def create_new_order(
         # Default status (PENDING_PAYMENT) and other defaults will be set by OrderCreateInternal schema
     )
 
-    return crud_order.create_order(db=db, obj_in=order_internal_data)
+    if idempotency_key:
+        return await idempotency.create_order(db, scope=scope, key=idempotency_key, request=order_in, obj_in=order_internal_data)
+    return await _create_order(db, order_internal_data)
 
 @router.get("/my-sales/", response_model=List[Order])
 async def read_my_sales(
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=200)
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION)
 ):
     """
-    Retrieve sales made by the currently authenticated reseller.
+    Retrieve sales made by the currently authenticated reseller, newest first.
     """
-    return crud_order.get_orders_by_reseller(db, reseller_id=current_user.id, skip=skip, limit=limit)
+    orders = await crud_order.get_orders_by_reseller_async(
+        db, reseller_id=current_user.id, skip=skip, limit=limit, cursor=cursor
+    )
+    return set_next_cursor_header(response, orders, limit)
 
 @router.get("/my-sales/count", response_model=int) # Simplified response model, consider dict like {"count": int}
 async def read_my_sales_count(
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Retrieve the total count of sales for the currently authenticated reseller.
     """
-    return crud_order.get_order_count_for_reseller(db, reseller_id=current_user.id)
+    return await crud_order.get_order_count_for_reseller_async(db, reseller_id=current_user.id)
 
 @router.get("/{order_id}", response_model=Order)
 async def read_order_details(
     order_id: int,
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_user)
 ):
     """
     Retrieve details for a specific order.
     A reseller can only view their own sales. Superusers can view any order.
     """
-    db_order = crud_order.get_order(db, order_id=order_id)
+    db_order = await crud_order.get_order_async(db, order_id=order_id)
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -103,88 +119,109 @@ async def read_order_details(
 async def update_existing_order_status( # Renamed for clarity, as OrderUpdate is limited
     order_id: int,
     order_in: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser) # Only superusers can update
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_superuser) # Only superusers can update
 ):
     """
     Update an existing order's status, Stripe ID, or E-SIM provisioning status.
     Requires superuser privileges.
     """
-    db_order = crud_order.get_order(db, order_id=order_id) # get_order fetches with relations
+    db_order = await crud_order.get_order_async(db, order_id=order_id) # get_order fetches with relations
     if not db_order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    old_status = db_order.order_status
-    updated_order = crud_order.update_order(db=db, db_obj=db_order, obj_in=order_in)
-    new_status = updated_order.order_status
-
-    status_changed_to_completed = False
-    if order_in.order_status and new_status == ORDER_STATUS_COMPLETED and old_status != ORDER_STATUS_COMPLETED:
-        status_changed_to_completed = True
-
-    if status_changed_to_completed:
-        # Check if commissions have already been calculated for this order to prevent duplicates
-        existing_commissions = crud_commission.get_commissions_by_order_id(db=db, order_id=updated_order.id)
-        if not existing_commissions:
-            logger.info(f"Order ID: {updated_order.id} status changed to COMPLETED. Calculating commissions.")
-            await calculate_and_record_commissions(db=db, order=updated_order)
-            # db.refresh(updated_order) # Refresh if calculate_and_record_commissions changes the order itself directly
-        else:
-            logger.info(f"Commissions for order ID: {updated_order.id} already exist. Skipping recalculation.")
-
+    # The status change and, on completion, the order's commission outbox entry are committed
+    # in one transaction; the commissions themselves are calculated by the outbox worker
+    updated_order = await update_order_and_enqueue_commissions_async(db=db, db_obj=db_order, obj_in=order_in)
     return updated_order
 
 # Admin specific endpoints
 @router.get("/admin/by-reseller/{reseller_id}", response_model=List[Order], tags=["Admin Orders"])
 async def admin_read_orders_by_reseller(
     reseller_id: int,
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_superuser),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=200)
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION)
 ):
     """
     Admin: Retrieve all orders associated with a specific reseller ID.
     """
     # Check if reseller exists (optional, but good practice)
-    # existing_reseller = crud_reseller.get_reseller(db, reseller_id=reseller_id)
+    # existing_reseller = await crud_reseller.get_reseller_async(db, reseller_id=reseller_id)
     # if not existing_reseller:
     #     raise HTTPException(status_code=404, detail=f"Reseller with id {reseller_id} not found.")
-    return crud_order.get_orders_by_reseller(db, reseller_id=reseller_id, skip=skip, limit=limit)
+    orders = await crud_order.get_orders_by_reseller_async(
+        db, reseller_id=reseller_id, skip=skip, limit=limit, cursor=cursor
+    )
+    return set_next_cursor_header(response, orders, limit)
 
 @router.get("/admin/by-customer/", response_model=List[Order], tags=["Admin Orders"])
 async def admin_read_orders_by_customer(
+    response: Response,
     customer_email: str = Query(..., description="Customer email to search orders for."),
-    db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_active_superuser),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=200)
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION)
 ):
     """
     Admin: Retrieve all orders for a specific customer email.
     """
-    return crud_order.get_orders_by_customer(db, customer_email=customer_email, skip=skip, limit=limit)
+    orders = await crud_order.get_orders_by_customer_async(
+        db, customer_email=customer_email, skip=skip, limit=limit, cursor=cursor
+    )
+    return set_next_cursor_header(response, orders, limit)
 
 
 @router.post("/public/", response_model=Order, status_code=201, summary="Create Order (Public)")
-async def create_public_order(order_in: OrderCreatePublic, db: Session = Depends(get_db)):
+async def create_public_order(
+    order_in: OrderCreatePublic,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Depends(idempotency.idempotency_key_header),
+):
     """
     Public endpoint to create a new order.
     Requires reseller_id to be provided in the request body.
     Product details (price, duration, country) are fetched from the database.
+    Retries sent with the same Idempotency-Key header return the order first created.
     """
+    scope = "orders:public"
+    if idempotency_key:
+        replayed = await idempotency.replay(db, scope=scope, key=idempotency_key, request=order_in)
+        if replayed is not None:
+            return replayed
+
     # Validate reseller_id
-    reseller = crud_reseller.get_reseller(db, reseller_id=order_in.reseller_id)
+    reseller = await crud_reseller.get_reseller_async(db, reseller_id=order_in.reseller_id)
     if not reseller or not reseller.is_active:
         raise HTTPException(status_code=404, detail="Reseller not found or not active")
 
     # Get product details to confirm price, duration, country_code
-    product = crud_product.get_product(db, product_id=order_in.product_package_id, show_inactive=False)
+    product = await crud_product.get_product_cached_async(db, product_id=order_in.product_package_id, show_inactive=False)
     if not product: # crud_product.get_product returns None if not found or not active
         raise HTTPException(status_code=404, detail="Product not found or not active")
 
-    # Prepare OrderCreateInternal data
-    order_internal_data = OrderCreateInternal(
+    order_internal_data = _public_order_internal(order_in, product)
+    if idempotency_key:
+        return await idempotency.create_order(db, scope=scope, key=idempotency_key, request=order_in, obj_in=order_internal_data)
+    return await _create_order(db, order_internal_data)
+
+async def _create_order(db: AsyncSession, obj_in: OrderCreateInternal) -> Order:
+    if order_writer.running:
+        # Write-coalescing mode: inserted and committed along with other requests' orders.
+        # End the (read-only) transaction first, so that its pooled connection is free for
+        # the writer while this request waits on it.
+        await db.commit()
+        order_id = await order_writer.submit(obj_in)
+        return await crud_order.get_order_async(db, order_id=order_id)
+    return await crud_order.create_order_async(db=db, obj_in=obj_in)
+
+def _public_order_internal(order_in: OrderCreatePublic, product) -> OrderCreateInternal:
+    return OrderCreateInternal(
         customer_email=order_in.customer_email,
         customer_name=order_in.customer_name,
         product_package_id=order_in.product_package_id,
@@ -196,5 +233,34 @@ async def create_public_order(order_in: OrderCreatePublic, db: Session = Depends
         # Default status (PENDING_PAYMENT) will be set by OrderCreateInternal schema
     )
 
-    created_order = crud_order.create_order(db=db, obj_in=order_internal_data)
-    return created_order
+@router.post("/public/batch/", response_model=OrderBatchResult, summary="Create Orders in Batch (Public)")
+async def create_public_orders_batch(batch_in: OrderBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    """
+    Public endpoint to create several orders at once, e.g. a group booking.
+    Each order is checked like on POST /orders/public/, but the resellers and products
+    of the whole batch are looked up with one query each and the valid orders are
+    inserted together, in one transaction. Orders that fail the checks are reported
+    in their result and don't stop the others.
+    """
+    orders_in = batch_in.orders
+    resellers = await crud_reseller.get_resellers_by_ids_async(db, reseller_ids=[o.reseller_id for o in orders_in])
+    products = await crud_product.get_products_by_ids_async(db, product_ids=[o.product_package_id for o in orders_in])
+
+    results: List[Optional[OrderBatchItemResult]] = [None] * len(orders_in)
+    to_create: List[OrderCreateInternal] = []
+    positions: List[int] = []
+    for index, order_in in enumerate(orders_in):
+        reseller = resellers.get(order_in.reseller_id)
+        product = products.get(order_in.product_package_id)
+        if not reseller or not reseller.is_active:
+            results[index] = OrderBatchItemResult(index=index, status_code=404, detail="Reseller not found or not active")
+        elif not product:
+            results[index] = OrderBatchItemResult(index=index, status_code=404, detail="Product not found or not active")
+        else:
+            to_create.append(_public_order_internal(order_in, product))
+            positions.append(index)
+
+    created_orders = await crud_order.create_orders_async(db, objs_in=to_create)
+    for index, created_order in zip(positions, created_orders):
+        results[index] = OrderBatchItemResult(index=index, status_code=201, order=created_order)
+    return OrderBatchResult(created=len(created_orders), failed=len(orders_in) - len(created_orders), results=results)
@@ -1,44 +1,107 @@
 # app/api/endpoints/payments.py
 import stripe # Stripe library
-from fastapi import APIRouter, Depends, HTTPException, Body
-from sqlalchemy.orm import Session
-from typing import Any # For type hinting if needed for stripe objects
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Optional
 from decimal import Decimal # For handling currency amounts
 
-from app import crud
+from app.crud import crud_order, crud_payment_event
 from app.models.order import Order as OrderModel
-from app.models.reseller import ResellerProfile
+from app.schemas.token import Principal
 from app.schemas.payment import PaymentIntentCreateRequest, PaymentIntentCreateResponse
 from app.schemas.order import OrderUpdate
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.core.dependencies import get_current_active_user
-from app.core.config import STRIPE_SECRET_KEY # For direct use if not globally set, or just rely on global set
+from app.core import config, metrics
+from app.core.order_status import InvalidOrderStatusTransitionError
+from app.core.payment_event_dedup import recent_payment_events
+from app.core.payment_intent_cache import payment_intent_cache
+from app.core.payment_webhooks import EVENT_HANDLERS, payment_webhook_worker, verify_event
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Ensure stripe.api_key is set. It should be set in config.py when imported.
-# This check is more for runtime verification if config.py didn't log a warning.
-if not stripe.api_key:
-    if STRIPE_SECRET_KEY and "YOUR_STRIPE_SECRET_KEY" not in STRIPE_SECRET_KEY:
-        stripe.api_key = STRIPE_SECRET_KEY
-        logger.info("Stripe API key configured in payments.py (was not set by config.py import).")
-    else:
-        logger.warning("Stripe secret key is not properly configured. Payment endpoints may not work.")
+class PaymentsClient:
+    """
+    The Stripe API calls of the payment endpoints, made on the event loop through the
+    stripe library's async methods and a pooled httpx client (connections are kept
+    alive and reused), with a per-request timeout and network retries. The blocking
+    stripe.PaymentIntent calls would hold up the whole event loop for every round trip.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        *,
+        api_base: Optional[str] = None,
+        timeout_seconds: float = config.STRIPE_TIMEOUT_SECONDS,
+        max_network_retries: int = config.STRIPE_MAX_NETWORK_RETRIES,
+    ):
+        self.api_key = api_key if api_key is not None else config.STRIPE_SECRET_KEY
+        self.api_base = api_base if api_base is not None else config.STRIPE_API_BASE
+        self.timeout_seconds = timeout_seconds
+        self.max_network_retries = max_network_retries
+        self._http_client: Optional[stripe.HTTPXClient] = None
+        self._client: Optional[stripe.StripeClient] = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key) and "YOUR_STRIPE_SECRET_KEY" not in self.api_key
+
+    def _stripe(self) -> stripe.StripeClient:
+        if self._client is None:
+            self._http_client = stripe.HTTPXClient(timeout=self.timeout_seconds)
+            self._client = stripe.StripeClient(
+                self.api_key,
+                http_client=self._http_client,
+                max_network_retries=self.max_network_retries,
+                base_addresses={"api": self.api_base} if self.api_base else None,
+            )
+        return self._client
+
+    async def retrieve_payment_intent(self, payment_intent_id: str) -> stripe.PaymentIntent:
+        return await self._stripe().v1.payment_intents.retrieve_async(payment_intent_id)
+
+    async def create_payment_intent(self, params: Dict[str, Any], *, idempotency_key: Optional[str] = None) -> stripe.PaymentIntent:
+        options = {"idempotency_key": idempotency_key} if idempotency_key else None
+        return await self._stripe().v1.payment_intents.create_async(params, options)
+
+    async def aclose(self) -> None:
+        """
+        Close the pooled connections (on app shutdown). The client reconnects if used again.
+        """
+        http_client, self._http_client, self._client = self._http_client, None, None
+        if http_client is not None:
+            await http_client.close_async()
+
+payments_client = PaymentsClient()
+if not payments_client.configured:
+    logger.warning("Stripe secret key is not properly configured. Payment endpoints may not work.")
+
+def get_payments_client() -> PaymentsClient:
+    return payments_client
+
+def _create_idempotency_key(order: OrderModel, amount_in_cents: int, replacing: Optional[str]) -> str:
+    # Retries of the same creation (a browser resubmitting, a timeout after Stripe created
+    # the intent) get the intent of the first attempt back from Stripe instead of another
+    # one. The intent being replaced is part of the key, so replacing a dead intent, or
+    # a changed amount or currency, still creates a new one.
+    return f"create-payment-intent:order-{order.id}:{amount_in_cents}:{order.currency_paid.lower()}:replacing-{replacing or 'none'}"
 
 
 @router.post("/create-payment-intent", response_model=PaymentIntentCreateResponse)
 async def create_payment_intent_endpoint(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     payload: PaymentIntentCreateRequest,
-    current_user: ResellerProfile = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_active_user),
+    payments: PaymentsClient = Depends(get_payments_client),
 ):
     order_id = payload.order_id
     logger.info(f"User {current_user.email} (ID: {current_user.id}) creating payment intent for order ID: {order_id}")
 
-    order = crud.order.get_order(db, order_id=order_id)
+    order = await crud_order.get_order_async(db, order_id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
@@ -48,7 +111,7 @@ async def create_payment_intent_endpoint(
     if order.order_status not in ["PENDING_PAYMENT", "AWAITING_PAYMENT"]:
         raise HTTPException(status_code=400, detail=f"Cannot create payment intent for order with status: {order.order_status}")
 
-    if not stripe.api_key: # Check again in case it wasn't set by any means
+    if not payments.configured:
         logger.error("Stripe API key is not configured. Cannot create payment intent.")
         raise HTTPException(status_code=500, detail="Payment system configuration error.")
 
@@ -67,9 +130,19 @@ async def create_payment_intent_endpoint(
 
         payment_intent = None
         existing_pi_id = order.stripe_payment_intent_id
+        idempotency_key = _create_idempotency_key(order, amount_in_cents, existing_pi_id)
+
+        async def create_intent():
+            return payment_intent_cache.put(
+                await payments.create_payment_intent(payment_intent_params, idempotency_key=idempotency_key)
+            )
+
         if existing_pi_id:
             try:
-                pi = stripe.PaymentIntent.retrieve(existing_pi_id)
+                # Checkout page reloads reuse the intent: usually known from a moment ago
+                pi = payment_intent_cache.get(existing_pi_id)
+                if pi is None:
+                    pi = payment_intent_cache.put(await payments.retrieve_payment_intent(existing_pi_id))
                 # Check if PI is still in a state that can be confirmed or needs a new payment method
                 if pi.status in ['requires_payment_method', 'requires_confirmation', 'requires_action']:
                      # Check if key parameters like amount or currency have changed
@@ -78,22 +151,23 @@ async def create_payment_intent_endpoint(
                         payment_intent = pi
                     else:
                         logger.info(f"Amount/currency changed for order ID: {order_id}. Creating new PaymentIntent.")
-                        # Potentially cancel the old PI if appropriate: stripe.PaymentIntent.cancel(existing_pi_id)
-                        payment_intent = stripe.PaymentIntent.create(**payment_intent_params)
+                        # Potentially cancel the old PI if appropriate
+                        payment_intent = await create_intent()
                 else:
                     logger.info(f"Existing PaymentIntent {existing_pi_id} status is {pi.status}. Creating new PaymentIntent for order ID: {order_id}")
-                    payment_intent = stripe.PaymentIntent.create(**payment_intent_params)
+                    payment_intent = await create_intent()
             except stripe.error.StripeError as e:
                 logger.warning(f"Error retrieving/updating existing PaymentIntent {existing_pi_id}: {e}. Creating new one.")
-                payment_intent = stripe.PaymentIntent.create(**payment_intent_params)
+                payment_intent = await create_intent()
         else:
-            payment_intent = stripe.PaymentIntent.create(**payment_intent_params)
+            payment_intent = await create_intent()
 
-        order_update_data = OrderUpdate(
-            stripe_payment_intent_id=payment_intent.id,
-            order_status="AWAITING_PAYMENT"
-        )
-        crud.order.update_order(db=db, db_obj=order, obj_in=order_update_data)
+        if order.stripe_payment_intent_id != payment_intent.id or order.order_status != "AWAITING_PAYMENT":
+            order_update_data = OrderUpdate(
+                stripe_payment_intent_id=payment_intent.id,
+                order_status="AWAITING_PAYMENT"
+            )
+            await crud_order.update_order_async(db=db, db_obj=order, obj_in=order_update_data)
 
         logger.info(f"PaymentIntent {payment_intent.id} created/retrieved for order ID: {order.id}")
         return PaymentIntentCreateResponse(
@@ -102,6 +176,8 @@ async def create_payment_intent_endpoint(
             payment_intent_id=payment_intent.id
         )
 
+    except (crud_order.OrderVersionConflictError, InvalidOrderStatusTransitionError):
+        raise # The order changed meanwhile: 409, see app.main
     except stripe.error.StripeError as e:
         logger.error(f"Stripe API error for order {order.id}: {e}")
         user_message = getattr(e, 'user_message', str(e))
@@ -109,3 +185,30 @@ async def create_payment_intent_endpoint(
     except Exception as e:
         logger.error(f"Generic error creating payment intent for order {order.id}: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error while creating payment intent.")
+
+
+@router.post("/webhook")
+async def stripe_webhook_endpoint(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Acknowledge fast: verify and store the event here, apply it in the background
+    # (app/core/payment_webhooks.py). Stripe retries anything but a 2xx.
+    payload = await request.body()
+    try:
+        event = verify_event(payload, request.headers.get("Stripe-Signature"))
+    except (stripe.error.SignatureVerificationError, ValueError) as e:
+        logger.warning(f"Rejected Stripe webhook: {e}")
+        raise HTTPException(status_code=400, detail="Invalid webhook signature or payload")
+
+    if event["type"] not in EVENT_HANDLERS: # Other event types need nothing from us
+        return {"received": True}
+    if recent_payment_events.seen(event["id"]):
+        metrics.inc("payment_webhook_duplicates_total")
+        return {"received": True}
+    stored = await crud_payment_event.store_event_async(
+        db, event_id=event["id"], event_type=event["type"], payload=payload.decode("utf-8")
+    )
+    recent_payment_events.add(event["id"])
+    if stored:
+        payment_webhook_worker.notify()
+    else: # Already pending or processed
+        metrics.inc("payment_webhook_duplicates_total")
+    return {"received": True}
@@ -11,7 +11,7 @@ from app.schemas.product import (
 )
 from app.db.session import get_db
 from app.core.dependencies import get_current_active_superuser, get_current_active_user, get_current_user # Explicitly import get_current_user
-from app.models.reseller import ResellerProfile # For type hinting current_user
+from app.schemas.token import Principal # For type hinting current_user
 
 router = APIRouter()
 
@@ -19,7 +19,7 @@ router = APIRouter()
 def create_product_package(
     product_in: ProductPackageCreate,
     db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser) # Admin only
+    current_user: Principal = Depends(get_current_active_superuser) # Admin only
 ):
     """
     Create a new product package. Requires superuser privileges.
@@ -34,7 +34,7 @@ def read_products(
     show_inactive_for_admin: bool = Query(False, description="Admin flag to also show inactive products when is_active is None or True."),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=200),
-    current_user: Optional[ResellerProfile] = Depends(get_current_user) # Optional current user to adjust behavior
+    current_user: Optional[Principal] = Depends(get_current_user) # Optional current user to adjust behavior
 ):
     """
     Retrieve product packages.
@@ -55,6 +55,11 @@ def read_products(
         effective_is_active_filter = True # Force active for non-admins if they try to set it to False or None
 
 
+    if country_code and effective_is_active_filter is True:
+        # Public catalog view: served from the in-process catalog cache
+        return crud_product.get_active_products_by_country_cached(
+            db=db, country_code=country_code, skip=skip, limit=limit
+        )
     if country_code:
         return crud_product.get_products_by_country(
             db=db, country_code=country_code, is_active=effective_is_active_filter, skip=skip, limit=limit
@@ -67,7 +72,7 @@ def read_products(
 def read_product(
     product_id: int,
     db: Session = Depends(get_db),
-    current_user: Optional[ResellerProfile] = Depends(get_current_user) # Optional: to allow admin to see inactive
+    current_user: Optional[Principal] = Depends(get_current_user) # Optional: to allow admin to see inactive
 ):
     """
     Get a specific product package by ID.
@@ -77,7 +82,7 @@ def read_product(
     if current_user and current_user.is_superuser:
         show_inactive_product = True
 
-    db_product = crud_product.get_product(db, product_id=product_id, show_inactive=show_inactive_product)
+    db_product = crud_product.get_product_cached(db, product_id=product_id, show_inactive=show_inactive_product)
     if not db_product:
         raise HTTPException(status_code=404, detail="Product not found or not accessible")
 
@@ -92,7 +97,7 @@ def update_product_package(
     product_id: int,
     product_in: ProductPackageUpdate,
     db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser) # Admin only
+    current_user: Principal = Depends(get_current_active_superuser) # Admin only
 ):
     """
     Update a product package. Requires superuser privileges.
@@ -107,7 +112,7 @@ def update_product_package(
 def delete_product_package(
     product_id: int,
     db: Session = Depends(get_db),
-    current_user: ResellerProfile = Depends(get_current_active_superuser) # Admin only
+    current_user: Principal = Depends(get_current_active_superuser) # Admin only
 ):
     """
     Logically delete a product package (set as inactive). Requires superuser privileges.
@@ -125,7 +130,7 @@ async def get_distinct_countries(db: Session = Depends(get_db)):
     """
     Get a list of distinct country codes from active product packages.
     """
-    countries = crud_product.get_distinct_active_countries(db=db)
+    countries = crud_product.get_distinct_active_countries_cached(db=db)
     # if not countries:
     #     # Depending on desired behavior, could return 404 or empty list.
     #     # For populating a dropdown, an empty list is often preferred.
@@ -1,23 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, Query # Added Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response # Added Query
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from typing import List, Optional # Added List, Optional
+from datetime import date
 
-from app.crud import crud_reseller # Changed to import specific module
+from app.crud import crud_reseller, crud_team_volume # Changed to import specific module
 from app import schemas # Import schemas module
 from app.core import dependencies # Import dependencies module
-from app.db.session import get_db # Changed to import specific get_db
-from app.models.reseller import ResellerProfile as ResellerModel # For type hinting
-from app.schemas.commission import Commission as CommissionSchema # Explicit import for clarity
+from app.db.session import get_async_db
+from app.schemas.token import Principal # For type hinting current_user
+from app.schemas.commission import Commission as CommissionSchema, CommissionSummary # Explicit import for clarity
+from app.utils.pagination import CURSOR_DESCRIPTION, set_next_cursor_header
 
 router = APIRouter()
 
 @router.post("/register", response_model=schemas.reseller.Reseller, status_code=201) # Corrected path
-def register_reseller(reseller_in: schemas.reseller.ResellerCreate, db: Session = Depends(get_db)): # Corrected path
+async def register_reseller(reseller_in: schemas.reseller.ResellerCreate, db: AsyncSession = Depends(get_async_db)): # Corrected path
     """
     Register a new reseller.
     """
-    existing_reseller = crud_reseller.get_reseller_by_email(db, email=reseller_in.email)
+    existing_reseller = await crud_reseller.get_reseller_by_email_async(db, email=reseller_in.email)
     if existing_reseller:
         raise HTTPException(
             status_code=400,
@@ -26,7 +28,7 @@ def register_reseller(reseller_in: schemas.reseller.ResellerCreate, db: Session
 
     # Check for recruiter if ID is provided
     if reseller_in.recruiter_id:
-        recruiter = crud_reseller.get_reseller(db, reseller_id=reseller_in.recruiter_id)
+        recruiter = await crud_reseller.get_reseller_async(db, reseller_id=reseller_in.recruiter_id)
         if not recruiter:
             raise HTTPException(
                 status_code=404,
@@ -35,46 +37,87 @@ def register_reseller(reseller_in: schemas.reseller.ResellerCreate, db: Session
         # Potentially add logic here to check if the recruiter is allowed to recruit,
         # or if there are limits on recruitment, etc.
 
-    new_reseller = crud_reseller.create_reseller(db=db, obj_in=reseller_in)
+    # Password hashing runs on the password hashing pool (see create_reseller_async)
+    new_reseller = await crud_reseller.create_reseller_async(db=db, obj_in=reseller_in)
     return new_reseller
 
 @router.get("/me", response_model=schemas.reseller.Reseller) # Corrected path
 async def read_reseller_me(
-    current_user: ResellerModel = Depends(dependencies.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(dependencies.get_current_active_user)
 ):
     """
     Get current logged-in reseller's profile.
     """
-    return current_user
+    return await crud_reseller.get_reseller_async(db, reseller_id=current_user.id)
+
+@router.get("/me/downline", response_model=List[schemas.reseller.DownlineMember])
+async def read_my_downline(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(dependencies.get_current_active_user),
+    max_depth: Optional[int] = Query(None, ge=1, description="Only include resellers up to this many levels below. Whole subtree if omitted."),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """
+    Resellers recruited by the current reseller, directly or indirectly, nearest levels first.
+    """
+    return await crud_reseller.get_downline_async(
+        db, reseller_id=current_user.id, max_depth=max_depth, skip=skip, limit=limit
+    )
+
+@router.get("/me/team-volume", response_model=schemas.team_volume.TeamVolume)
+async def read_my_team_volume(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(dependencies.get_current_active_user),
+    max_depth: Optional[int] = Query(None, ge=0, description="Only include resellers up to this many levels below. Whole downline if omitted."),
+    include_self: bool = Query(True, description="Include the current reseller's own sales (depth 0)."),
+    period_from: Optional[date] = Query(None, description="First month to include (any day of it)."),
+    period_to: Optional[date] = Query(None, description="Last month to include (any day of it)."),
+    by_depth: bool = Query(True, description="Break totals down by downline level."),
+    by_period: bool = Query(True, description="Break totals down by month.")
+):
+    """
+    Completed order count, revenue and commission totals of the current reseller's team,
+    per currency, optionally broken down by downline level and month.
+    """
+    rows = await crud_team_volume.get_team_volume_async(
+        db, reseller_id=current_user.id, max_depth=max_depth, include_self=include_self,
+        period_from=period_from, period_to=period_to, by_depth=by_depth, by_period=by_period
+    )
+    return schemas.team_volume.TeamVolume(reseller_id=current_user.id, rows=rows)
 
 @router.put("/me/promotion-details", response_model=schemas.reseller.Reseller) # Corrected path
 async def update_reseller_promotion(
     *,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     promotion_update: schemas.reseller.ResellerPromotionUpdate, # Corrected path
-    current_user: ResellerModel = Depends(dependencies.get_current_active_user)
+    current_user: Principal = Depends(dependencies.get_current_active_user)
 ):
     """
     Update promotion details for the current logged-in reseller.
     """
     # We construct a ResellerUpdate schema to pass to the CRUD function,
     # ensuring only promotion_details is updated.
+    db_reseller = await crud_reseller.get_reseller_async(db, reseller_id=current_user.id)
     reseller_update_schema = schemas.reseller.ResellerUpdate(promotion_details=promotion_update.promotion_details) # Corrected path
 
-    updated_reseller = crud_reseller.update_reseller(
+    updated_reseller = await crud_reseller.update_reseller_async(
         db=db,
-        db_obj=current_user,
+        db_obj=db_reseller,
         obj_in=reseller_update_schema
     )
     return updated_reseller
 
 @router.get("/me/commissions", response_model=List[CommissionSchema]) # Use imported CommissionSchema
 async def read_my_commissions(
-    db: Session = Depends(get_db),
-    current_user: ResellerModel = Depends(dependencies.get_current_active_user),
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(dependencies.get_current_active_user),
     status: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(100, ge=1, le=200)
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION)
 ):
     """
     Retrieve commissions for the currently authenticated reseller.
@@ -82,8 +125,8 @@ async def read_my_commissions(
     """
     # Need to import crud_commission for this
     from app.crud import crud_commission as crud_commission_module
-    commissions = crud_commission_module.get_commissions_by_reseller(
-        db, reseller_id=current_user.id, status=status, skip=skip, limit=limit
+    commissions = await crud_commission_module.get_commissions_by_reseller_async(
+        db, reseller_id=current_user.id, status=status, skip=skip, limit=limit, cursor=cursor
     )
     if not commissions and status is None: # Only raise 404 if no commissions at all and no filter
         # Or simply return empty list, which is often preferred for list endpoints
@@ -91,4 +134,18 @@ async def read_my_commissions(
         pass
     # If status is provided and no commissions match, an empty list is also fine.
     # The 404 in tests for this was because the endpoint itself was missing.
-    return commissions
+    return set_next_cursor_header(response, commissions, limit)
+
+
+@router.get("/me/commissions/summary", response_model=CommissionSummary)
+async def read_my_commissions_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(dependencies.get_current_active_user)
+):
+    """
+    Commission totals (sum and count) for the currently authenticated reseller,
+    grouped by commission status and currency.
+    """
+    from app.crud import crud_commission as crud_commission_module
+    totals = await crud_commission_module.get_commission_totals_by_reseller_async(db, reseller_id=current_user.id)
+    return CommissionSummary(reseller_id=current_user.id, totals=totals)
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from app.core import metrics
+from app.core.config import AUTH_CACHE_MAX_SIZE, AUTH_CACHE_TTL_SECONDS
+from app.schemas.token import Principal
+
+# Token -> Principal cache used by get_current_user, so that an authenticated request
+# does not need a JWT decode plus a reseller lookup every time.
+# - Bounded: least recently used entries are evicted beyond AUTH_CACHE_MAX_SIZE.
+# - Time-limited: an entry lives for AUTH_CACHE_TTL_SECONDS, and never past the token's own exp.
+# - Invalidated explicitly by crud_reseller.update_reseller when email, is_active or
+#   is_superuser change, via invalidate_reseller().
+#
+# Counters (see app.core.metrics): auth_cache_hits_total, auth_cache_misses_total,
+# auth_cache_evictions_total, auth_cache_invalidations_total.
+
+class PrincipalCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._tokens_by_reseller: Dict[int, Set[str]] = {}
+        # update_reseller may run in a threadpool (sync endpoints), so guard with a lock.
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                metrics.inc("auth_cache_misses_total")
+                return None
+            principal, expires_at = entry
+            if expires_at <= now:
+                self._remove(token)
+                metrics.inc("auth_cache_misses_total")
+                return None
+            self._entries.move_to_end(token)
+        metrics.inc("auth_cache_hits_total")
+        return principal
+
+    def put(self, token: str, principal: Principal, token_exp: Optional[float] = None) -> None:
+        """
+        Cache `principal` for `token`. token_exp is the token's `exp` claim (unix time);
+        the entry never outlives it.
+        """
+        if self.max_size <= 0:
+            return
+        ttl = self.ttl_seconds
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (principal, time.monotonic() + ttl)
+            self._tokens_by_reseller.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                oldest_token = next(iter(self._entries))
+                self._remove(oldest_token)
+                metrics.inc("auth_cache_evictions_total")
+
+    def invalidate_reseller(self, reseller_id: int) -> None:
+        """
+        Drop every cached token that resolves to `reseller_id`.
+        """
+        with self._lock:
+            tokens = self._tokens_by_reseller.pop(reseller_id, set())
+            for token in tokens:
+                self._entries.pop(token, None)
+        if tokens:
+            metrics.inc("auth_cache_invalidations_total", len(tokens))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_reseller.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, token: str) -> None:
+        # Caller must hold self._lock
+        principal, _ = self._entries.pop(token)
+        tokens = self._tokens_by_reseller.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_reseller[principal.id]
+
+
+principal_cache = PrincipalCache(max_size=AUTH_CACHE_MAX_SIZE, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_reseller(reseller_id: int) -> None:
+    principal_cache.invalidate_reseller(reseller_id)
@@ -0,0 +1,54 @@
+import abc
+import asyncio
+from typing import Optional
+
+# Lifecycle shared by the app's background tasks (queue workers, the order writer,
+# periodic jobs): one asyncio task on the running event loop, started and stopped from
+# the app's lifespan (app.main), and a new database session per unit of work.
+
+class BackgroundTask(abc.ABC):
+    """
+    Runs _run as one task on the running event loop, between start() and stop().
+    """
+    task_name = "background-task"
+
+    def __init__(self, session_factory=None):
+        self._session_factory = session_factory # Defaults to app.db.session.AsyncSessionLocal
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _sessions(self):
+        if self._session_factory is None:
+            from app.db.session import AsyncSessionLocal
+            self._session_factory = AsyncSessionLocal
+        return self._session_factory()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._prepare()
+        self._task = asyncio.create_task(self._run(), name=self.task_name)
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            await self._finish(task)
+
+    def _prepare(self) -> None:
+        # Set up what the task needs on the running loop, before it is created
+        pass
+
+    async def _finish(self, task: asyncio.Task) -> None:
+        # Cancel the task; subclasses that drain their work first override this
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    @abc.abstractmethod
+    async def _run(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import CATALOG_CACHE_MAX_SIZE, CATALOG_CACHE_TTL_SECONDS
+from app.schemas.product import ProductPackage
+
+# In-process cache of the product catalog, used by the crud_product *_cached reads so
+# that public catalog reads (product page, country selection, order creation) don't
+# touch the database. The catalog only changes through crud_product's write functions,
+# which update/invalidate this cache after committing (write-through).
+# - Holds ProductPackage schema snapshots, not ORM objects, so entries are safe to
+#   share across sessions and requests. Treat them as read-only.
+# - Three views: product by id (active or not), active products of a country sorted
+#   by name, and the sorted list of countries with active products.
+# - Bounded: at most CATALOG_CACHE_MAX_SIZE products by id, and as many products in all
+#   country lists together (an empty list counts as one); least recently used entries
+#   are evicted. A country list longer than that is not cached.
+# - Entries expire after CATALOG_CACHE_TTL_SECONDS. Invalidation is per process, so
+#   this bounds how stale another worker process can be after an admin write.
+#
+# Counters (see app.core.metrics): catalog_cache_hits_total, catalog_cache_misses_total,
+# catalog_cache_evictions_total, catalog_cache_invalidations_total.
+
+class ProductCatalogCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._products: "OrderedDict[int, Tuple[ProductPackage, float]]" = OrderedDict()
+        self._by_country: "OrderedDict[str, Tuple[List[ProductPackage], float]]" = OrderedDict()
+        self._active_countries: Optional[Tuple[List[str], float]] = None
+        # Bumped on every write. A reader records it before going to the database and
+        # only stores its result if no write happened meanwhile, so a slow read can't
+        # put back a snapshot that a concurrent write has already invalidated.
+        self._generation = 0
+        # Sync endpoints run in a threadpool, so guard with a lock.
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    # --- Reads ---
+
+    def get_product(self, product_id: int) -> Optional[ProductPackage]:
+        with self._lock:
+            return self._get(self._products, product_id)
+
+    def get_country(self, country_code: str) -> Optional[List[ProductPackage]]:
+        with self._lock:
+            return self._get(self._by_country, country_code.upper())
+
+    def get_active_countries(self) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._active_countries
+            if entry is None or entry[1] <= time.monotonic():
+                self._active_countries = None
+                metrics.inc("catalog_cache_misses_total")
+                return None
+        metrics.inc("catalog_cache_hits_total")
+        return entry[0]
+
+    # --- Populating after a miss ---
+
+    def put_product(self, product: ProductPackage, generation: int) -> None:
+        with self._lock:
+            if generation == self._generation:
+                self._put(self._products, product.id, product)
+
+    def put_country(self, country_code: str, products: List[ProductPackage], generation: int) -> None:
+        if len(products) > self.max_size:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._put(self._by_country, country_code.upper(), products)
+
+    def put_active_countries(self, countries: List[str], generation: int) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation == self._generation:
+                self._active_countries = (countries, time.monotonic() + self.ttl_seconds)
+
+    # --- Write-through from crud_product ---
+
+    def product_saved(self, product: ProductPackage, previous_country_code: Optional[str] = None) -> None:
+        """
+        Record a created or updated product: replace its snapshot and drop the views it
+        may appear in (its country, its previous country, the active-country list).
+        """
+        with self._lock:
+            self._generation += 1
+            self._invalidate_views(product.country_code, previous_country_code)
+            self._products.pop(product.id, None)
+            self._put(self._products, product.id, product)
+        metrics.inc("catalog_cache_invalidations_total")
+
+    def product_deleted(self, product_id: int, country_code: Optional[str] = None) -> None:
+        with self._lock:
+            self._generation += 1
+            self._products.pop(product_id, None)
+            self._invalidate_views(country_code)
+        metrics.inc("catalog_cache_invalidations_total")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._products.clear()
+            self._by_country.clear()
+            self._active_countries = None
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    # Callers of the helpers below must hold self._lock
+
+    def _get(self, entries: OrderedDict, key: Any) -> Any:
+        entry = entries.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            if entry is not None:
+                del entries[key]
+            metrics.inc("catalog_cache_misses_total")
+            return None
+        entries.move_to_end(key)
+        metrics.inc("catalog_cache_hits_total")
+        return entry[0]
+
+    def _put(self, entries: OrderedDict, key: Any, value: Any) -> None:
+        if self.max_size <= 0:
+            return
+        entries[key] = (value, time.monotonic() + self.ttl_seconds)
+        entries.move_to_end(key)
+        while self._size(entries) > self.max_size:
+            entries.popitem(last=False)
+            metrics.inc("catalog_cache_evictions_total")
+
+    def _size(self, entries: OrderedDict) -> int:
+        # Products held: one per product entry, the length of each country list. There are
+        # few country lists and they are only stored after a miss, so summing them is cheap.
+        if entries is self._by_country:
+            return sum(max(1, len(products)) for products, _ in entries.values())
+        return len(entries)
+
+    def _invalidate_views(self, *country_codes: Optional[str]) -> None:
+        self._active_countries = None
+        for country_code in country_codes:
+            if country_code:
+                self._by_country.pop(country_code.upper(), None)
+
+
+catalog_cache = ProductCatalogCache(max_size=CATALOG_CACHE_MAX_SIZE, ttl_seconds=CATALOG_CACHE_TTL_SECONDS)
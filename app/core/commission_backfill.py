@@ -0,0 +1,255 @@
+"""
+Recalculate the commissions of historical COMPLETED orders, e.g. after a change to
+the commission rules or a calculator fix.
+
+    python -m app.core.commission_backfill --dry-run
+    python -m app.core.commission_backfill --workers 4 --chunk-size 1000
+    python -m app.core.commission_backfill --first-id 1000 --last-id 2000 --replace-unpaid
+
+Completed orders are streamed by id in chunks. Each chunk costs a fixed number of
+queries: the orders (with product and seller), the upline of every seller in the
+chunk, and the commissions already recorded. Commissions are computed with the live
+calculator's commissions_for_order, from each product's compiled rules (see
+app.core.commission_rules), and written with one bulk INSERT per chunk, in one
+transaction per chunk.
+
+Missing commissions are inserted. Existing ones that differ from the calculation,
+or that it no longer produces, are only reported, unless --replace-unpaid is given:
+then those still in REPLACEABLE_STATUSES are deleted and recalculated. Paid
+commissions are never touched. --dry-run writes nothing and prints the diff.
+
+--workers N splits the order id range into N contiguous ranges, each processed by
+its own process with its own database connection.
+"""
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
+from decimal import Decimal
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import config
+from app.core.commissions_calculator import commissions_for_order
+from app.crud import crud_commission, crud_order, crud_reseller
+from app.models.commission import Commission
+from app.schemas.commission import CommissionCreate
+
+logger = logging.getLogger(__name__)
+
+# Commissions not yet paid out, which --replace-unpaid may delete and recalculate
+REPLACEABLE_STATUSES = ("PENDING_VALIDATION", "UNPAID")
+
+CommissionKey = Tuple[int, int, str] # (order_id, reseller_id, commission_type)
+
+@dataclass
+class CommissionDiff:
+    """One difference between the recorded and the calculated commissions of an order."""
+    kind: str # "missing", "changed" or "stale"
+    key: CommissionKey
+    recorded: Optional[Tuple[Decimal, str, str]] = None # (amount, currency, commission_status)
+    calculated: Optional[Tuple[Decimal, str]] = None # (amount, currency)
+
+    def __str__(self) -> str:
+        order_id, reseller_id, commission_type = self.key
+        return (
+            f"{self.kind:8} order={order_id} reseller={reseller_id} type={commission_type}"
+            f" recorded={self.recorded} calculated={self.calculated}"
+        )
+
+@dataclass
+class BackfillReport:
+    orders: int = 0
+    missing: int = 0 # Calculated but not recorded
+    changed: int = 0 # Recorded with another amount or currency
+    stale: int = 0 # Recorded but no longer calculated
+    locked: int = 0 # Changed or stale, but already paid (or not replaced): left as is
+    inserted: int = 0
+    deleted: int = 0
+    diffs: List[CommissionDiff] = field(default_factory=list) # Only collected on dry runs
+
+    def merge(self, other: "BackfillReport") -> "BackfillReport":
+        for f in fields(self):
+            setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+        return self
+
+def _diff_chunk(
+    calculated: List[CommissionCreate], recorded: List[Commission]
+) -> Tuple[List[CommissionDiff], List[CommissionCreate], List[Commission]]:
+    # Returns the differences, the commissions to insert, and the recorded commissions
+    # that would have to go for the calculated set to replace them
+    recorded_by_key = {(c.order_id, c.reseller_id, c.commission_type): c for c in recorded}
+    diffs, to_insert, to_replace = [], [], []
+    calculated_keys = set()
+    for commission in calculated:
+        key = (commission.order_id, commission.reseller_id, commission.commission_type)
+        calculated_keys.add(key)
+        existing = recorded_by_key.get(key)
+        if existing is None:
+            diffs.append(CommissionDiff("missing", key, calculated=(commission.amount, commission.currency)))
+            to_insert.append(commission)
+        elif Decimal(existing.amount) != commission.amount or existing.currency != commission.currency:
+            diffs.append(CommissionDiff(
+                "changed", key,
+                recorded=(Decimal(existing.amount), existing.currency, existing.commission_status),
+                calculated=(commission.amount, commission.currency),
+            ))
+            to_insert.append(commission)
+            to_replace.append(existing)
+    for key, existing in recorded_by_key.items():
+        if key not in calculated_keys:
+            diffs.append(CommissionDiff(
+                "stale", key, recorded=(Decimal(existing.amount), existing.currency, existing.commission_status)
+            ))
+            to_replace.append(existing)
+    return diffs, to_insert, to_replace
+
+def backfill_range(
+    db: Session,
+    *,
+    first_id: int = 0,
+    last_id: Optional[int] = None,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+    replace_unpaid: bool = False,
+) -> BackfillReport:
+    """
+    Recalculate the commissions of the COMPLETED orders with first_id <= id <= last_id
+    (no upper bound if last_id is None), chunk_size orders per transaction.
+    """
+    report = BackfillReport()
+    after_id = first_id - 1
+    while True:
+        orders = crud_order.get_completed_orders_after(db, after_id=after_id, last_id=last_id, limit=chunk_size)
+        if not orders:
+            break
+        after_id = orders[-1].id
+
+        # Preload every upline the chunk needs with one query; every product pays tier 1 and the configured tiers 2..N
+        max_depth = 1 + len(config.UPLINE_COMMISSION_TIER_AMOUNTS)
+        uplines = crud_reseller.get_uplines(
+            db, reseller_ids=[o.reseller_id for o in orders if o.reseller and o.reseller.recruiter_id], max_depth=max_depth
+        )
+        calculated: List[CommissionCreate] = []
+        calculated_order_ids: List[int] = []
+        for order in orders:
+            if order.product_package is None or order.reseller is None:
+                logger.error(f"Order ID: {order.id} is missing product_package or reseller. Skipped.")
+                continue
+            calculated.extend(commissions_for_order(order, uplines.get(order.reseller_id, [])))
+            calculated_order_ids.append(order.id)
+        # Only compare the orders calculated: a skipped order's commissions are not stale
+        recorded = crud_commission.get_commissions_by_order_ids(db, order_ids=calculated_order_ids)
+
+        diffs, to_insert, to_replace = _diff_chunk(calculated, recorded)
+        chunk = BackfillReport(orders=len(orders))
+        for diff in diffs:
+            setattr(chunk, diff.kind, getattr(chunk, diff.kind) + 1)
+        replaceable = [c for c in to_replace if replace_unpaid and c.commission_status in REPLACEABLE_STATUSES]
+        chunk.locked = len(to_replace) - len(replaceable)
+        if dry_run:
+            chunk.diffs = diffs
+            db.rollback()
+        else:
+            # Only insert a changed commission where its recorded row is being deleted
+            replaced_keys = {(c.order_id, c.reseller_id, c.commission_type) for c in replaceable}
+            locked_keys = {(c.order_id, c.reseller_id, c.commission_type) for c in to_replace} - replaced_keys
+            to_insert = [c for c in to_insert if (c.order_id, c.reseller_id, c.commission_type) not in locked_keys]
+            try:
+                crud_commission.delete_commissions(db, commission_ids=[c.id for c in replaceable], commit=False)
+                chunk.deleted = len(replaceable)
+                chunk.inserted = len(crud_commission.create_commissions(db, objs_in=to_insert, commit=False))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+        report.merge(chunk)
+        logger.info(f"Commission backfill: orders up to ID {after_id} done ({report.orders} so far)")
+    return report
+
+def split_id_range(first_id: int, last_id: int, parts: int) -> List[Tuple[int, int]]:
+    """
+    Split [first_id, last_id] into at most `parts` contiguous, non-empty, inclusive ranges.
+    """
+    size = max(1, -(-(last_id - first_id + 1) // parts)) # Ceiling division
+    return [(start, min(start + size - 1, last_id)) for start in range(first_id, last_id + 1, size)]
+
+def _session_factory(database_url: Optional[str]):
+    if database_url is None:
+        from app.db.session import SessionLocal
+        return SessionLocal
+    return sessionmaker(autocommit=False, autoflush=False, bind=create_engine(database_url))
+
+def _backfill_worker(database_url: Optional[str], first_id: int, last_id: int, options: Dict) -> BackfillReport:
+    # Runs in a pool process, with its own engine and connections
+    with _session_factory(database_url)() as db:
+        return backfill_range(db, first_id=first_id, last_id=last_id, **options)
+
+def run_backfill(
+    *,
+    first_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+    workers: int = 1,
+    chunk_size: int = 500,
+    dry_run: bool = False,
+    replace_unpaid: bool = False,
+    database_url: Optional[str] = None,
+) -> BackfillReport:
+    """
+    backfill_range over [first_id, last_id] (defaulting to every order), split across
+    `workers` processes when more than one. database_url defaults to the app's database.
+    """
+    with _session_factory(database_url)() as db:
+        min_id, max_id = crud_order.get_order_id_range(db)
+    if min_id is None:
+        return BackfillReport()
+    first_id = max(first_id or min_id, min_id)
+    last_id = min(last_id or max_id, max_id)
+    if first_id > last_id:
+        return BackfillReport()
+
+    options = dict(chunk_size=chunk_size, dry_run=dry_run, replace_unpaid=replace_unpaid)
+    if workers <= 1:
+        return _backfill_worker(database_url, first_id, last_id, options)
+    report = BackfillReport()
+    # spawn: workers must not inherit the parent's pooled connections
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        futures = [
+            pool.submit(_backfill_worker, database_url, start, end, options)
+            for start, end in split_id_range(first_id, last_id, workers)
+        ]
+        for future in futures:
+            report.merge(future.result())
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--first-id", type=int, default=None, help="Lowest order id to process")
+    parser.add_argument("--last-id", type=int, default=None, help="Highest order id to process")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Orders per query and transaction")
+    parser.add_argument("--workers", type=int, default=1, help="Processes to split the id range across")
+    parser.add_argument("--dry-run", action="store_true", help="Write nothing; print the differences")
+    parser.add_argument("--replace-unpaid", action="store_true", help=f"Recalculate commissions still in {', '.join(REPLACEABLE_STATUSES)}")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1 or args.workers < 1:
+        parser.error("--chunk-size and --workers must be at least 1")
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_backfill(
+        first_id=args.first_id, last_id=args.last_id, workers=args.workers, chunk_size=args.chunk_size,
+        dry_run=args.dry_run, replace_unpaid=args.replace_unpaid,
+    )
+    for diff in report.diffs:
+        print(diff)
+    print(
+        f"orders={report.orders} missing={report.missing} changed={report.changed} stale={report.stale}"
+        f" locked={report.locked} inserted={report.inserted} deleted={report.deleted}"
+        + (" (dry run)" if args.dry_run else "")
+    )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.core.commissions_calculator import ORDER_STATUS_COMPLETED, calculate_and_record_commissions
+from app.core.queue_worker import LeasedQueueWorker
+from app.crud import crud_order, crud_outbox
+from app.models.order import Order as OrderModel
+from app.schemas.commission import CommissionOutboxEntry
+from app.schemas.order import OrderUpdate
+
+# Background commission calculation through a durable outbox.
+# The order's move to COMPLETED and its commission_outbox entry are committed together
+# (update_order_and_enqueue_commissions), so the request only pays for the status change
+# and no completed order can be left without its commissions. CommissionOutboxWorker,
+# running on the app's event loop, then drains the outbox: it claims due entries with a
+# lease, records each order's commissions with calculate_and_record_commissions and deletes
+# the entry; app.core.queue_worker covers the leases, retries and backoff. Commissions
+# are unique per (order, reseller, type), so processing an entry twice records them once.
+
+logger = logging.getLogger(__name__)
+
+def update_order_and_enqueue_commissions(db: Session, *, db_obj: OrderModel, obj_in: OrderUpdate) -> OrderModel:
+    """
+    Apply `obj_in` to the order and, if it moves the order to COMPLETED, queue the
+    calculation of its commissions, in one transaction.
+    """
+    old_status = db_obj.order_status
+    try:
+        updated_order = crud_order.update_order(db, db_obj=db_obj, obj_in=obj_in, commit=False)
+        if updated_order.order_status == ORDER_STATUS_COMPLETED and old_status != ORDER_STATUS_COMPLETED:
+            crud_outbox.enqueue_commission_calculation(db, order_id=updated_order.id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    db.refresh(updated_order)
+    return updated_order
+
+async def update_order_and_enqueue_commissions_async(db: AsyncSession, *, db_obj: OrderModel, obj_in: OrderUpdate) -> OrderModel:
+    updated_order = await db.run_sync(update_order_and_enqueue_commissions, db_obj=db_obj, obj_in=obj_in)
+    commission_outbox_worker.notify()
+    return updated_order
+
+
+class CommissionOutboxWorker(LeasedQueueWorker):
+    """
+    Drains the commission outbox on the running event loop: up to `concurrency` orders
+    at a time, polling every poll_seconds when idle or sooner when notify() is called.
+    """
+    label = "Commission outbox"
+    metrics_prefix = "commission_outbox"
+
+    def __init__(
+        self,
+        session_factory=None,
+        *,
+        concurrency: int = config.COMMISSION_OUTBOX_CONCURRENCY,
+        batch_size: int = config.COMMISSION_OUTBOX_BATCH_SIZE,
+        poll_seconds: float = config.COMMISSION_OUTBOX_POLL_SECONDS,
+        lease_seconds: int = config.COMMISSION_OUTBOX_LEASE_SECONDS,
+        retry_base_seconds: float = config.COMMISSION_OUTBOX_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = config.COMMISSION_OUTBOX_RETRY_MAX_SECONDS,
+        max_attempts: int = config.COMMISSION_OUTBOX_MAX_ATTEMPTS,
+    ):
+        super().__init__(
+            session_factory, concurrency=concurrency, batch_size=batch_size, poll_seconds=poll_seconds,
+            lease_seconds=lease_seconds, retry_base_seconds=retry_base_seconds,
+            retry_max_seconds=retry_max_seconds, max_attempts=max_attempts,
+        )
+
+    async def _claim(self, db: AsyncSession, *, limit: int, lease_seconds: int) -> List[CommissionOutboxEntry]:
+        return await crud_outbox.claim_due_entries_async(db, limit=limit, lease_seconds=lease_seconds)
+
+    async def _handle(self, db: AsyncSession, entry: CommissionOutboxEntry) -> None:
+        order = await crud_order.get_order_async(db, order_id=entry.order_id)
+        if order is not None and order.order_status == ORDER_STATUS_COMPLETED:
+            await calculate_and_record_commissions(db, order)
+        else:
+            # Deleted, or moved out of COMPLETED before its turn came: nothing is owed
+            logger.info(f"Commission outbox: order ID {entry.order_id} is no longer COMPLETED, skipped")
+
+    async def _complete(self, db: AsyncSession, entry: CommissionOutboxEntry) -> None:
+        await crud_outbox.complete_entry_async(db, entry_id=entry.id)
+
+    async def _fail(self, db: AsyncSession, entry: CommissionOutboxEntry, *, error: str, retry_at: Optional[datetime]) -> None:
+        await crud_outbox.fail_entry_async(db, entry_id=entry.id, error=error, retry_at=retry_at)
+
+    def _describe(self, entry: CommissionOutboxEntry) -> str:
+        return f"order ID {entry.order_id}"
+
+commission_outbox_worker = CommissionOutboxWorker()
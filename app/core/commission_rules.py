@@ -0,0 +1,163 @@
+import json
+import threading
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core import config, metrics
+from app.schemas.product import CommissionRules, FixedCommissionRule
+
+# Commission rules compiled per product version.
+# A product's commission terms are its commission_rules (schemas.product.CommissionRules)
+# where given, else its direct_/recruitment_commission_rate_or_amount as fixed amounts;
+# upline tiers 2..N are config.UPLINE_COMMISSION_TIER_AMOUNTS. compile_rules turns them
+# into plain closures with the Decimals, rates and calculation_details templates worked
+# out once, so the calculator (live and batch paths) only calls them per commission.
+# Compiled rules are cached per product id along with the commission terms they were
+# compiled from; crud_product invalidates a product's entry when it changes it, and
+# comparing the terms catches changes made by other processes (updated_at would miss
+# two updates within the same second on SQLite).
+#
+# Counters (see app.core.metrics): commission_rules_cache_hits_total,
+# commission_rules_cache_misses_total, commission_rules_cache_invalidations_total.
+
+CENT = Decimal("0.01")
+
+# (order price_paid, earning reseller's reseller_type) -> (amount, calculation_details)
+RuleEvaluator = Callable[[Decimal, Optional[str]], Tuple[Decimal, Dict[str, Any]]]
+
+def _nothing(price: Decimal, reseller_type: Optional[str]) -> Tuple[Decimal, Dict[str, Any]]:
+    return Decimal(0), {}
+
+def _compile_rate(rule, source: str, extra: Dict[str, Any]) -> Tuple[RuleEvaluator, bool]:
+    # Returns the evaluator and whether it can ever pay anything
+    if isinstance(rule, FixedCommissionRule):
+        amount = Decimal(rule.amount)
+        details = {"type": "fixed_amount", "source_field": source, **extra, "value": float(amount)}
+        return (lambda price, reseller_type: (amount, details)), amount > 0
+    rate = Decimal(rule.percent) / 100
+    percent = float(rule.percent)
+
+    def percent_of_price(price: Decimal, reseller_type: Optional[str]) -> Tuple[Decimal, Dict[str, Any]]:
+        amount = (Decimal(price) * rate).quantize(CENT, rounding=ROUND_HALF_UP)
+        return amount, {
+            "type": "percent_of_price", "source_field": source, **extra,
+            "percent": percent, "base_amount": float(price), "value": float(amount),
+        }
+    return percent_of_price, rate > 0
+
+def _compile_rule(rule, source: str, extra: Dict[str, Any]) -> Tuple[RuleEvaluator, bool]:
+    if rule.type != "by_reseller_type":
+        return _compile_rate(rule, source, extra)
+    by_type = {
+        reseller_type: _compile_rate(type_rule, f"{source}.rules.{reseller_type}", extra)
+        for reseller_type, type_rule in rule.rules.items()
+    }
+    default, default_pays = (
+        _compile_rate(rule.default, f"{source}.default", extra) if rule.default is not None else (_nothing, False)
+    )
+    evaluators = {reseller_type: evaluator for reseller_type, (evaluator, _) in by_type.items()}
+
+    def by_reseller_type(price: Decimal, reseller_type: Optional[str]) -> Tuple[Decimal, Dict[str, Any]]:
+        return evaluators.get(reseller_type, default)(price, reseller_type)
+    return by_reseller_type, default_pays or any(pays for _, pays in by_type.values())
+
+class CompiledCommissionRules:
+    """
+    The commission terms of one product version, ready to evaluate.
+    direct(price, seller_type) and tier(n, price, member_type), n from 1 to upline_depth,
+    return (amount, calculation_details); treat the details as read-only.
+    """
+
+    def __init__(self, direct: RuleEvaluator, tiers: List[RuleEvaluator], pays_upline: bool):
+        self.direct = direct
+        self._tiers = tiers
+        self.upline_depth = len(tiers) # Upline levels that can be paid
+        self.pays_upline = pays_upline # False if no tier can ever pay: the upline need not be fetched
+
+    def tier(self, tier: int, price: Decimal, reseller_type: Optional[str]) -> Tuple[Decimal, Dict[str, Any]]:
+        return self._tiers[tier - 1](price, reseller_type)
+
+def compile_rules(product) -> CompiledCommissionRules:
+    """
+    Compile the commission terms of `product` (a ProductPackage model or schema).
+    """
+    rules = product.commission_rules
+    if rules is not None and not isinstance(rules, CommissionRules):
+        rules = CommissionRules.model_validate(rules)
+
+    if rules is not None and rules.direct is not None:
+        direct, _ = _compile_rule(rules.direct, "commission_rules.direct", {})
+    else:
+        direct, _ = _compile_rate(
+            FixedCommissionRule(amount=product.direct_commission_rate_or_amount or 0), "direct_commission_rate_or_amount", {}
+        )
+
+    tiers, pays_upline = [], False
+    if rules is not None and rules.recruitment is not None:
+        evaluator, pays = _compile_rule(rules.recruitment, "commission_rules.recruitment", {"tier": 1})
+    else:
+        evaluator, pays = _compile_rate(
+            FixedCommissionRule(amount=product.recruitment_commission_rate_or_amount or 0),
+            "recruitment_commission_rate_or_amount", {"tier": 1},
+        )
+    tiers.append(evaluator)
+    pays_upline |= pays
+    for tier, amount in enumerate(config.UPLINE_COMMISSION_TIER_AMOUNTS, start=2):
+        evaluator, pays = _compile_rate(FixedCommissionRule(amount=amount), "UPLINE_COMMISSION_TIER_AMOUNTS", {"tier": tier})
+        tiers.append(evaluator)
+        pays_upline |= pays
+    return CompiledCommissionRules(direct, tiers, pays_upline)
+
+
+def commission_terms(product) -> Tuple[str, str, str]:
+    """
+    The fields of `product` its compiled rules depend on, as an immutable value to compare.
+    """
+    rules = product.commission_rules
+    if isinstance(rules, CommissionRules):
+        rules = rules.model_dump(mode="json", exclude_none=True)
+    return (
+        str(product.direct_commission_rate_or_amount),
+        str(product.recruitment_commission_rate_or_amount),
+        json.dumps(rules, sort_keys=True, default=str),
+    )
+
+class CommissionRulesCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[Any, CompiledCommissionRules]]" = OrderedDict()
+        # The calculator also runs in threadpool threads (run_sync), so guard with a lock.
+        self._lock = threading.Lock()
+
+    def get(self, product) -> CompiledCommissionRules:
+        """
+        The compiled rules of `product`, compiling them if its current terms are not cached.
+        """
+        version = commission_terms(product)
+        with self._lock:
+            entry = self._entries.get(product.id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(product.id)
+                metrics.inc("commission_rules_cache_hits_total")
+                return entry[1]
+        metrics.inc("commission_rules_cache_misses_total")
+        compiled = compile_rules(product)
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[product.id] = (version, compiled)
+                self._entries.move_to_end(product.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return compiled
+
+    def invalidate(self, product_id: int) -> None:
+        with self._lock:
+            if self._entries.pop(product_id, None) is not None:
+                metrics.inc("commission_rules_cache_invalidations_total")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+commission_rules_cache = CommissionRulesCache(config.COMMISSION_RULES_CACHE_MAX_SIZE)
@@ -1,59 +1,101 @@
 import logging
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal # Import Decimal for type checks if needed
+from typing import List, Optional, Union
 
 from app.models.order import Order as OrderModel
-from app.models.reseller import ResellerProfile as ResellerProfileModel
-from app.models.product import ProductPackage as ProductPackageModel
-from app.crud import crud_commission
+from app.core.commission_rules import CompiledCommissionRules, commission_rules_cache
+from app.crud import crud_commission, crud_reseller
 from app.schemas.commission import CommissionCreate
+from app.schemas.reseller import UplineMember
 
 logger = logging.getLogger(__name__)
 
-async def calculate_and_record_commissions(db: Session, order: OrderModel):
-    logger.info(f"Starting commission calculation for order ID: {order.id}")
+ORDER_STATUS_COMPLETED = "COMPLETED"
+
+async def calculate_and_record_commissions(db: Union[Session, AsyncSession], order: OrderModel):
+    """
+    Calculate and persist the commissions for a completed order.
+    Accepts either a sync Session or an AsyncSession; with an AsyncSession the
+    calculation runs via run_sync so its queries go through the async driver.
+    """
+    if isinstance(db, AsyncSession):
+        await db.run_sync(record_commissions, order)
+    else:
+        record_commissions(db, order)
 
-    # Ensure product_package and reseller are loaded.
-    # The order object passed might already have these eager-loaded.
-    # If not, explicit loading is necessary.
-    if not order.product_package:
-        logger.info(f"Order ID: {order.id} - product_package not loaded, attempting to load.")
-        # Option 1: Refresh (if order is already a persistent object from the same session)
-        # db.refresh(order, ['product_package'])
-        # Option 2: Query explicitly (safer if unsure about session state or if order is detached)
-        order = db.query(OrderModel).options(joinedload(OrderModel.product_package)).filter(OrderModel.id == order.id).first()
-        if not order: # Should not happen if order ID is valid
-            logger.error(f"Failed to reload order ID: {order.id} to get product_package.")
-            return
+def record_commissions(db: Session, order: OrderModel, *, commit: bool = True) -> List[CommissionCreate]:
+    """
+    Build the commission rows for `order` and insert them with a single bulk INSERT.
+    With commit=False the rows are only flushed, so the caller can commit them together
+    with its own changes.
+    """
+    commissions = build_commissions(db, order)
+    crud_commission.create_commissions(db, objs_in=commissions, commit=commit)
+    logger.info(f"Commission calculation finished for order ID: {order.id}, {len(commissions)} commission(s) calculated")
+    return commissions
 
-    if not order.product_package:
-        logger.error(f"Order ID: {order.id} is still missing product_package information after attempting load. Cannot calculate commissions.")
-        return
+def build_commissions(db: Session, order: OrderModel) -> List[CommissionCreate]:
+    """
+    The commissions owed for `order`, without persisting anything.
+    """
+    logger.info(f"Starting commission calculation for order ID: {order.id}")
+
+    # Ensure product_package and reseller are loaded; crud_order.get_order eager-loads both.
+    # Otherwise load them here with one query instead of two lazy loads.
+    if order.product_package is None or order.reseller is None:
+        logger.info(f"Order ID: {order.id} - product_package or reseller not loaded, attempting to load.")
+        order_id = order.id
+        order = (
+            db.query(OrderModel)
+            .options(
+                joinedload(OrderModel.product_package),
+                joinedload(OrderModel.reseller),
+            )
+            .filter(OrderModel.id == order_id)
+            .populate_existing()
+            .first()
+        )
+        if order is None or order.product_package is None or order.reseller is None:
+            logger.error(f"Order ID: {order_id} is missing product_package or reseller information after attempting load. Cannot calculate commissions.")
+            return []
     product = order.product_package
+    direct_seller = order.reseller
 
-    if not order.reseller:
-        logger.info(f"Order ID: {order.id} - reseller (direct_seller) not loaded, attempting to load.")
-        # Similar to product_package, ensure reseller is loaded
-        if not order: # Re-fetch order if not already done for product_package
-             order = db.query(OrderModel).options(joinedload(OrderModel.reseller)).filter(OrderModel.id == order.id).first()
-        else: # If order was fetched for product, try to load reseller for that instance
-             db.refresh(order, ['reseller']) # Or use selectinload if order is already loaded
+    # The whole upline comes from one recursive query, fetched only when it can be paid
+    upline: List[UplineMember] = []
+    rules = commission_rules_cache.get(product)
+    if direct_seller.is_active and direct_seller.recruiter_id and rules.pays_upline:
+        upline = crud_reseller.get_upline(db, reseller_id=direct_seller.id, max_depth=rules.upline_depth)
+    return commissions_for_order(order, upline, rules)
 
-        if not order or not order.reseller: # Check again after attempting load
-            logger.error(f"Failed to reload order ID: {order.id} or reseller for it.")
-            return
+def commissions_for_order(
+    order: OrderModel, upline: List[UplineMember], rules: Optional[CompiledCommissionRules] = None
+) -> List[CommissionCreate]:
+    """
+    The commissions owed for `order`, whose product_package and reseller must be loaded,
+    given its seller's upline (as returned by crud_reseller.get_upline; deeper members
+    than there are tiers are ignored) and its product's compiled rules, looked up if not
+    given. Does not touch the database, so batch jobs can
+    preload the orders and uplines of many orders at once (see app.core.commission_backfill).
+    """
+    product = order.product_package
     direct_seller = order.reseller
 
     if not direct_seller.is_active:
         logger.info(f"Direct seller ID: {direct_seller.id} is inactive. No commissions will be recorded for order ID: {order.id}.")
-        return
+        return []
 
-    # 1. Direct Sale Commission
-    # Ensure direct_commission_rate_or_amount is Decimal or can be converted
-    direct_commission_amount = Decimal(product.direct_commission_rate_or_amount or 0)
+    commissions: List[CommissionCreate] = []
+    if rules is None:
+        rules = commission_rules_cache.get(product) # Compiled once per product version
+    price = order.price_paid
 
+    # 1. Direct Sale Commission
+    direct_commission_amount, details = rules.direct(price, direct_seller.reseller_type)
     if direct_commission_amount > 0:
-        commission_direct_data = CommissionCreate(
+        commissions.append(CommissionCreate(
             order_id=order.id,
             reseller_id=direct_seller.id,
             commission_type="DIRECT_SALE",
@@ -62,50 +104,39 @@ async def calculate_and_record_commissions(db: Session, order: OrderModel):
             product_package_id_at_sale=product.id,
             original_order_reseller_id=direct_seller.id, # For direct sale, this is the same
             commission_status="UNPAID",
-            calculation_details={
-                "type": "fixed_amount", # Assuming it's a fixed amount, adjust if it's a rate
-                "source_field": "direct_commission_rate_or_amount",
-                "value": float(direct_commission_amount) # Store as float for JSON
-            }
-        )
-        crud_commission.create_commission(db=db, obj_in=commission_direct_data)
-        logger.info(f"Created DIRECT_SALE commission for order ID: {order.id}, reseller ID: {direct_seller.id}, amount: {direct_commission_amount}")
+            calculation_details=details
+        ))
+        logger.info(f"DIRECT_SALE commission for order ID: {order.id}, reseller ID: {direct_seller.id}, amount: {direct_commission_amount}")
     else:
         logger.info(f"No direct commission applicable or amount is zero for order ID: {order.id}, product ID: {product.id}")
 
-    # 2. Recruitment Commission (Tier 1)
-    if direct_seller.recruiter_id:
-        # Fetch the recruiter with is_active check
-        recruiter = db.query(ResellerProfileModel).filter(
-            ResellerProfileModel.id == direct_seller.recruiter_id,
-            ResellerProfileModel.is_active == True # Ensure recruiter is active
-        ).first()
-
-        if recruiter:
-            recruitment_commission_amount = Decimal(product.recruitment_commission_rate_or_amount or 0)
-            if recruitment_commission_amount > 0:
-                commission_recruitment_data = CommissionCreate(
-                    order_id=order.id,
-                    reseller_id=recruiter.id,
-                    commission_type="RECRUITMENT_TIER_1",
-                    amount=recruitment_commission_amount,
-                    currency=order.currency_paid,
-                    product_package_id_at_sale=product.id,
-                    original_order_reseller_id=direct_seller.id,
-                    commission_status="UNPAID",
-                    calculation_details={
-                        "type": "fixed_amount", # Assuming fixed amount
-                        "source_field": "recruitment_commission_rate_or_amount",
-                        "value": float(recruitment_commission_amount)
-                    }
-                )
-                crud_commission.create_commission(db=db, obj_in=commission_recruitment_data)
-                logger.info(f"Created RECRUITMENT_TIER_1 commission for order ID: {order.id}, recruiter ID: {recruiter.id}, amount: {recruitment_commission_amount}")
-            else:
-                logger.info(f"No recruitment commission applicable or amount is zero for order ID: {order.id}, product ID: {product.id}")
-        else:
-            logger.info(f"Recruiter ID: {direct_seller.recruiter_id} not found or is inactive for direct seller ID: {direct_seller.id}. No recruitment commission for order ID: {order.id}.")
-    else:
+    # 2. Upline (recruitment) commissions, tiers 1..N
+    # Inactive members are skipped without shifting the tiers above them.
+    if not direct_seller.recruiter_id:
         logger.info(f"Direct seller ID: {direct_seller.id} has no recruiter. No recruitment commission for order ID: {order.id}.")
+    elif not rules.pays_upline:
+        logger.info(f"No recruitment commission applicable or amount is zero for order ID: {order.id}, product ID: {product.id}")
+    else:
+        for member in upline:
+            if member.depth > rules.upline_depth:
+                break
+            if not member.is_active:
+                logger.info(f"Upline reseller ID: {member.id} (tier {member.depth}) is inactive. No recruitment commission for order ID: {order.id}.")
+                continue
+            tier_amount, details = rules.tier(member.depth, price, member.reseller_type)
+            if tier_amount <= 0:
+                continue
+            commissions.append(CommissionCreate(
+                order_id=order.id,
+                reseller_id=member.id,
+                commission_type=f"RECRUITMENT_TIER_{member.depth}",
+                amount=tier_amount,
+                currency=order.currency_paid,
+                product_package_id_at_sale=product.id,
+                original_order_reseller_id=direct_seller.id,
+                commission_status="UNPAID",
+                calculation_details=details
+            ))
+            logger.info(f"RECRUITMENT_TIER_{member.depth} commission for order ID: {order.id}, recruiter ID: {member.id}, amount: {tier_amount}")
 
-    logger.info(f"Commission calculation finished for order ID: {order.id}")
+    return commissions
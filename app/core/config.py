@@ -1,5 +1,7 @@
 import os
 import stripe # Import stripe
+from decimal import Decimal
+from typing import List
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,15 +9,125 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./roamstop.db")
 SQLALCHEMY_DATABASE_URI = DATABASE_URL
 
+# SQLite tuning profile, applied to every new connection (app/db/session.py).
+# Ignored for non-SQLite databases.
+SQLITE_TUNING_ENABLED: bool = os.getenv("SQLITE_TUNING_ENABLED", "true").lower() in ("1", "true", "yes")
+SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL") # Safe with WAL: only the last commits may roll back on power loss
+SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)) # bytes
+SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", -64000)) # negative = KiB, i.e. ~64MB per connection
+SQLITE_TEMP_STORE: str = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+# WAL allows many concurrent readers next to one writer, so keep a modest pool of
+# long-lived connections (each keeps its page cache and mmap) instead of reconnecting.
+SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", 8))
+SQLITE_MAX_OVERFLOW: int = int(os.getenv("SQLITE_MAX_OVERFLOW", 8))
+
 # JWT Settings
 SECRET_KEY: str = os.getenv("SECRET_KEY", "a_very_secret_key_that_should_be_in_env_file_and_much_stronger") # In a real app, use a strong, randomly generated key
 ALGORITHM: str = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+# Password hashing process pool (app/core/security.py). Each app process starts its own pool,
+# so the default shares the cores between the WEB_CONCURRENCY server workers (as read by
+# uvicorn and gunicorn); set it explicitly when the worker count is given some other way.
+WEB_CONCURRENCY: int = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))) # 0 hashes on a thread instead
+PASSWORD_HASH_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", 64)) # Jobs allowed to wait beyond the busy workers
+
+# Token -> principal cache used by get_current_user (app/core/auth_cache.py)
+AUTH_CACHE_MAX_SIZE: int = int(os.getenv("AUTH_CACHE_MAX_SIZE", 10000)) # 0 disables the cache
+AUTH_CACHE_TTL_SECONDS: int = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+
+# In-process product catalog cache (app/core/catalog_cache.py)
+CATALOG_CACHE_MAX_SIZE: int = int(os.getenv("CATALOG_CACHE_MAX_SIZE", 5000)) # Max cached products; 0 disables the cache
+CATALOG_CACHE_TTL_SECONDS: int = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", 300)) # Bounds staleness across worker processes
+
+# Orders accepted by one POST /orders/public/batch/ request
+ORDER_BATCH_MAX_SIZE: int = int(os.getenv("ORDER_BATCH_MAX_SIZE", 500))
+
+# Write-coalescing order inserts (app/core/order_writer.py): orders created through the API are
+# handed to one writer task per process, which inserts and commits them in batches, so that
+# on SQLite many orders share one commit (and fsync) instead of each taking the write lock.
+ORDER_WRITE_COALESCING_ENABLED: bool = os.getenv("ORDER_WRITE_COALESCING_ENABLED", "false").lower() in ("1", "true", "yes")
+ORDER_WRITE_BATCH_MAX_SIZE: int = int(os.getenv("ORDER_WRITE_BATCH_MAX_SIZE", 200)) # Orders per commit at most
+ORDER_WRITE_BATCH_MAX_DELAY_MS: float = float(os.getenv("ORDER_WRITE_BATCH_MAX_DELAY_MS", 5)) # How long the first order of a batch waits for others
+
+# Stale unpaid order sweeper (app/core/order_sweeper.py): cancels orders left in PENDING_PAYMENT
+# or AWAITING_PAYMENT, without a PaymentIntent, for longer than ORDER_SWEEPER_MAX_AGE_SECONDS,
+# in each app process.
+# Off unless enabled; with ORDER_SWEEPER_DRY_RUN it only counts the orders it would cancel.
+ORDER_SWEEPER_ENABLED: bool = os.getenv("ORDER_SWEEPER_ENABLED", "false").lower() in ("1", "true", "yes")
+ORDER_SWEEPER_DRY_RUN: bool = os.getenv("ORDER_SWEEPER_DRY_RUN", "false").lower() in ("1", "true", "yes")
+ORDER_SWEEPER_MAX_AGE_SECONDS: int = int(os.getenv("ORDER_SWEEPER_MAX_AGE_SECONDS", 24 * 3600)) # Unpaid orders older than this are cancelled
+ORDER_SWEEPER_INTERVAL_SECONDS: float = float(os.getenv("ORDER_SWEEPER_INTERVAL_SECONDS", 300)) # Between runs
+ORDER_SWEEPER_BATCH_SIZE: int = int(os.getenv("ORDER_SWEEPER_BATCH_SIZE", 500)) # Orders per UPDATE (and commit)
+ORDER_SWEEPER_MAX_BATCHES: int = int(os.getenv("ORDER_SWEEPER_MAX_BATCHES", 20)) # Per run; the rest waits for the next one
+
+# How long the response to an order request sent with an Idempotency-Key is kept for retries (app/core/idempotency.py)
+IDEMPOTENCY_KEY_TTL_SECONDS: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 3600))
+# Expired keys are deleted every IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS, in each app process
+IDEMPOTENCY_KEY_PURGE_ENABLED: bool = os.getenv("IDEMPOTENCY_KEY_PURGE_ENABLED", "true").lower() in ("1", "true", "yes")
+IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS: float = float(os.getenv("IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS", 3600))
+
+# Upline (recruitment) commissions. Tier 1, the seller's direct recruiter, is paid the product's
+# recruitment_commission_rate_or_amount. Tiers 2..N (the recruiter's recruiter and so on) are paid
+# these fixed amounts, comma-separated in tier order, e.g. "2.00,1.00,0.50" for tiers 2-4.
+# Empty (the default) pays tier 1 only.
+UPLINE_COMMISSION_TIER_AMOUNTS: List[Decimal] = [
+    Decimal(amount) for amount in os.getenv("UPLINE_COMMISSION_TIER_AMOUNTS", "").split(",") if amount.strip()
+]
+
+# Compiled commission rules per product version (app/core/commission_rules.py)
+COMMISSION_RULES_CACHE_MAX_SIZE: int = int(os.getenv("COMMISSION_RULES_CACHE_MAX_SIZE", 1000)) # 0 compiles on every use
+
+# Commission outbox worker (app/core/commission_outbox.py): calculates the commissions of
+# orders moved to COMPLETED in the background, in each app process.
+COMMISSION_OUTBOX_WORKER_ENABLED: bool = os.getenv("COMMISSION_OUTBOX_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+COMMISSION_OUTBOX_CONCURRENCY: int = int(os.getenv("COMMISSION_OUTBOX_CONCURRENCY", 4)) # Orders processed at once
+COMMISSION_OUTBOX_BATCH_SIZE: int = int(os.getenv("COMMISSION_OUTBOX_BATCH_SIZE", 50)) # Entries claimed per poll
+COMMISSION_OUTBOX_POLL_SECONDS: float = float(os.getenv("COMMISSION_OUTBOX_POLL_SECONDS", 5)) # Idle poll interval
+COMMISSION_OUTBOX_LEASE_SECONDS: int = int(os.getenv("COMMISSION_OUTBOX_LEASE_SECONDS", 300)) # Claimed entries return to the queue after this, e.g. if the process died
+COMMISSION_OUTBOX_RETRY_BASE_SECONDS: float = float(os.getenv("COMMISSION_OUTBOX_RETRY_BASE_SECONDS", 2)) # Doubled after each failed attempt...
+COMMISSION_OUTBOX_RETRY_MAX_SECONDS: float = float(os.getenv("COMMISSION_OUTBOX_RETRY_MAX_SECONDS", 600)) # ...up to this
+COMMISSION_OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("COMMISSION_OUTBOX_MAX_ATTEMPTS", 10)) # Then the entry is parked for manual attention
+
 # Stripe API Keys
 STRIPE_PUBLISHABLE_KEY: str = os.getenv("STRIPE_PUBLISHABLE_KEY", "pk_test_YOUR_STRIPE_PUBLISHABLE_KEY")
 STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "sk_test_YOUR_STRIPE_SECRET_KEY")
 STRIPE_WEBHOOK_SECRET: str = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_YOUR_STRIPE_WEBHOOK_SECRET")
+STRIPE_WEBHOOK_TOLERANCE_SECONDS: int = int(os.getenv("STRIPE_WEBHOOK_TOLERANCE_SECONDS", 300)) # Older signatures are rejected (replays)
+
+# Stripe API calls (app/api/endpoints/payments.py PaymentsClient), made on a pooled async HTTP client
+STRIPE_API_BASE: str = os.getenv("STRIPE_API_BASE", "") # Empty: Stripe's; e.g. a local mock server for benchmarks
+STRIPE_TIMEOUT_SECONDS: float = float(os.getenv("STRIPE_TIMEOUT_SECONDS", 10)) # Per request
+STRIPE_MAX_NETWORK_RETRIES: int = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", 2)) # Connection errors and 409/5xx, with backoff
+
+# PaymentIntents recently handed out, to reuse without a Stripe round trip (app/core/payment_intent_cache.py)
+PAYMENT_INTENT_CACHE_MAX_SIZE: int = int(os.getenv("PAYMENT_INTENT_CACHE_MAX_SIZE", 10000)) # 0 disables the cache
+PAYMENT_INTENT_CACHE_TTL_SECONDS: int = int(os.getenv("PAYMENT_INTENT_CACHE_TTL_SECONDS", 30)) # Bounds how stale a cached status can be
+
+# Stripe webhook worker (app/core/payment_webhooks.py): applies stored webhook events to
+# their orders in the background, in each app process.
+PAYMENT_WEBHOOK_WORKER_ENABLED: bool = os.getenv("PAYMENT_WEBHOOK_WORKER_ENABLED", "true").lower() in ("1", "true", "yes")
+PAYMENT_WEBHOOK_CONCURRENCY: int = int(os.getenv("PAYMENT_WEBHOOK_CONCURRENCY", 4)) # Events processed at once
+PAYMENT_WEBHOOK_BATCH_SIZE: int = int(os.getenv("PAYMENT_WEBHOOK_BATCH_SIZE", 50)) # Events claimed per poll
+PAYMENT_WEBHOOK_POLL_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_POLL_SECONDS", 5)) # Idle poll interval
+PAYMENT_WEBHOOK_LEASE_SECONDS: int = int(os.getenv("PAYMENT_WEBHOOK_LEASE_SECONDS", 120)) # Claimed events return to the queue after this
+PAYMENT_WEBHOOK_RETRY_BASE_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_RETRY_BASE_SECONDS", 2)) # Doubled after each failed attempt...
+PAYMENT_WEBHOOK_RETRY_MAX_SECONDS: float = float(os.getenv("PAYMENT_WEBHOOK_RETRY_MAX_SECONDS", 600)) # ...up to this
+PAYMENT_WEBHOOK_MAX_ATTEMPTS: int = int(os.getenv("PAYMENT_WEBHOOK_MAX_ATTEMPTS", 10)) # Then the event is parked for manual attention
+
+# Recently accepted webhook event ids, to acknowledge redeliveries without a database lookup (app/core/payment_event_dedup.py)
+PAYMENT_EVENT_DEDUP_MAX_SIZE: int = int(os.getenv("PAYMENT_EVENT_DEDUP_MAX_SIZE", 10000)) # 0 disables it
+PAYMENT_EVENT_DEDUP_TTL_SECONDS: int = int(os.getenv("PAYMENT_EVENT_DEDUP_TTL_SECONDS", 3600))
+
+# Processed webhook event ids (processed_payment_event) are kept this long, then deleted every
+# PROCESSED_PAYMENT_EVENT_PURGE_INTERVAL_SECONDS, in each app process. Never less than the three
+# days Stripe keeps redelivering an event for.
+PROCESSED_PAYMENT_EVENT_PURGE_ENABLED: bool = os.getenv("PROCESSED_PAYMENT_EVENT_PURGE_ENABLED", "true").lower() in ("1", "true", "yes")
+PROCESSED_PAYMENT_EVENT_RETENTION_SECONDS: int = int(os.getenv("PROCESSED_PAYMENT_EVENT_RETENTION_SECONDS", 7 * 24 * 3600))
+PROCESSED_PAYMENT_EVENT_PURGE_INTERVAL_SECONDS: float = float(os.getenv("PROCESSED_PAYMENT_EVENT_PURGE_INTERVAL_SECONDS", 3600))
 
 # Initialize Stripe API key
 if STRIPE_SECRET_KEY and "YOUR_STRIPE_SECRET_KEY" not in STRIPE_SECRET_KEY:
@@ -1,23 +1,30 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.crud import crud_reseller
 from app.core.config import SECRET_KEY, ALGORITHM
-from app.schemas.token import TokenData
-from app.models.reseller import ResellerProfile
+from app.schemas.token import TokenData, Principal
+from app.core.auth_cache import principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login", auto_error=False) # Set auto_error=False
 
 async def get_current_user(
-    token: Optional[str] = Depends(oauth2_scheme), db: Session = Depends(get_db) # token can be None
-) -> Optional[ResellerProfile]: # Return type can be None
+    token: Optional[str] = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db) # token can be None
+) -> Optional[Principal]: # Return type can be None
     if token is None: # If no token provided (due to auto_error=False), user is not authenticated
         return None
 
+    # Cached principals were resolved from this exact (already verified) token, and the
+    # entry never outlives the token's exp, so a hit skips both the decode and the DB lookup.
+    # The AsyncSession from get_async_db only checks out a connection on first use.
+    cached_principal = principal_cache.get(token)
+    if cached_principal is not None:
+        return cached_principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -33,15 +40,18 @@ async def get_current_user(
     except JWTError: # Catches any error during decoding (expired, invalid signature, etc.)
         raise credentials_exception
 
-    user = crud_reseller.get_reseller_by_email(db, email=token_data.email)
+    user = await crud_reseller.get_reseller_by_email_async(db, email=token_data.email)
     if user is None:
         # This means the user ID in a valid token does not exist in DB.
         raise credentials_exception
-    return user
+
+    principal = Principal.model_validate(user)
+    principal_cache.put(token, principal, token_exp=payload.get("exp"))
+    return principal
 
 async def get_current_active_user(
-    current_user: Optional[ResellerProfile] = Depends(get_current_user),
-) -> ResellerProfile: # This should still return ResellerProfile or raise
+    current_user: Optional[Principal] = Depends(get_current_user),
+) -> Principal: # This should still return a Principal or raise
     if not current_user: # If get_current_user returned None
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, # Or 403 if preferred for "not active" vs "not authenticated"
@@ -53,8 +63,8 @@ async def get_current_active_user(
     return current_user
 
 async def get_current_active_superuser(
-    current_user: ResellerProfile = Depends(get_current_active_user), # Changed dependency
-) -> ResellerProfile:
+    current_user: Principal = Depends(get_current_active_user), # Changed dependency
+) -> Principal:
     # get_current_active_user already ensures current_user is not None and is active.
     # So, we just need to check for superuser status.
     if not current_user.is_superuser:
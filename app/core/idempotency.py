@@ -0,0 +1,95 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Header, Response
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.config import IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS, IDEMPOTENCY_KEY_TTL_SECONDS
+from app.core.periodic import PeriodicJob
+from app.crud import crud_idempotency, crud_order
+from app.schemas.order import Order, OrderCreateInternal
+
+# Idempotency-Key support for order creation (POST /orders/ and /orders/public/).
+# Clients on flaky connections retry requests whose response they never got. When a
+# request carries an Idempotency-Key header, its response is stored under the key, in the
+# transaction that creates the order, for IDEMPOTENCY_KEY_TTL_SECONDS. A retry with the
+# same key gets the stored response back from one primary key lookup, with an
+# Idempotent-Replayed: true header, before any product or reseller validation runs.
+# - Keys are scoped to the caller (reseller or public endpoint): see the endpoints.
+# - A key reused with a different request body is refused (IdempotencyKeyMismatchError, 422).
+# - Of two concurrent requests with the same key, the one committing second is rolled
+#   back and answered with the first one's response.
+# - Expired keys are deleted every IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS by
+#   idempotency_key_purge, started with the app, so the table only holds live keys.
+#
+# Counters (see app.core.metrics): idempotency_replays_total, idempotency_mismatches_total,
+# and idempotency_key_purge_* (see app.core.periodic).
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+class IdempotencyKeyMismatchError(ValueError):
+    """Raised when an Idempotency-Key is reused for a different request."""
+    pass
+
+def idempotency_key_header(
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_KEY_HEADER, min_length=1, max_length=255,
+        description="Unique key of this request; retries with the same key return the first response.",
+    ),
+) -> Optional[str]:
+    return idempotency_key
+
+def request_fingerprint(request: BaseModel) -> str:
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+def _json_response(status_code: int, body: str, *, replayed: bool = False) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+async def replay(db: AsyncSession, *, scope: str, key: str, request: BaseModel) -> Optional[Response]:
+    """
+    The stored response for this key, None if there is none (yet, or any more).
+    Raises IdempotencyKeyMismatchError if the key was used for a different request.
+    """
+    stored = await crud_idempotency.get_key_async(db, scope=scope, key=key)
+    if stored is None:
+        return None
+    if stored.fingerprint != request_fingerprint(request):
+        metrics.inc("idempotency_mismatches_total")
+        raise IdempotencyKeyMismatchError(f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request")
+    metrics.inc("idempotency_replays_total")
+    return _json_response(stored.status_code, stored.response_body, replayed=True)
+
+async def create_order(
+    db: AsyncSession, *, scope: str, key: str, request: BaseModel, obj_in: OrderCreateInternal
+) -> Response:
+    """
+    Create an order and store the response under the key, in one transaction.
+    """
+    db_obj = await crud_order.create_order_async(db, obj_in=obj_in, commit=False)
+    body = Order.model_validate(db_obj).model_dump_json()
+    try:
+        await crud_idempotency.save_key_async(
+            db, scope=scope, key=key, fingerprint=request_fingerprint(request), status_code=201,
+            response_body=body, ttl_seconds=IDEMPOTENCY_KEY_TTL_SECONDS, commit=False,
+        )
+        await db.commit()
+    except IntegrityError:
+        # A concurrent request with the same key committed first: drop this order, answer with that one
+        await db.rollback()
+        replayed = await replay(db, scope=scope, key=key, request=request)
+        if replayed is None:
+            raise
+        return replayed
+    return _json_response(201, body)
+
+async def _purge_expired_keys(db: AsyncSession) -> int:
+    return await crud_idempotency.purge_expired_keys_async(db)
+
+idempotency_key_purge = PeriodicJob(
+    "idempotency_key_purge", _purge_expired_keys, interval_seconds=IDEMPOTENCY_KEY_PURGE_INTERVAL_SECONDS
+)
@@ -0,0 +1,47 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+# Minimal in-process counter registry, exposed in Prometheus text format by GET /metrics.
+# Counters are per-process; with several uvicorn workers each worker reports its own values.
+
+_lock = threading.Lock()
+_counters: Dict[str, float] = defaultdict(float)
+
+def inc(name: str, value: float = 1) -> None:
+    """
+    Increment the counter `name` by `value`.
+    """
+    with _lock:
+        _counters[name] += value
+
+def get(name: str) -> float:
+    """
+    Current value of the counter `name` (0 if it was never incremented).
+    """
+    with _lock:
+        return _counters.get(name, 0)
+
+def snapshot() -> Dict[str, float]:
+    """
+    Copy of all counters, sorted by name.
+    """
+    with _lock:
+        return dict(sorted(_counters.items()))
+
+def reset() -> None:
+    """
+    Clear all counters. Intended for tests.
+    """
+    with _lock:
+        _counters.clear()
+
+def render_prometheus() -> str:
+    """
+    Render all counters in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, value in snapshot().items():
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value:g}")
+    return "\n".join(lines) + "\n"
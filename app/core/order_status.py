@@ -0,0 +1,58 @@
+from typing import Dict, FrozenSet
+
+# The order status state machine. crud_order.update_order refuses any status change not
+# declared here (InvalidOrderStatusTransitionError); setting an order's current status
+# again is not a change and is always allowed.
+#
+#   PENDING_PAYMENT -> AWAITING_PAYMENT -> PROCESSING -> COMPLETED -> REFUNDED
+#
+# with payment failures and retries, manual completion by an admin, provisioning
+# failures, and cancellation of any order not yet completed. CANCELLED and REFUNDED
+# are final.
+
+ORDER_STATUS_PENDING_PAYMENT = "PENDING_PAYMENT"
+ORDER_STATUS_AWAITING_PAYMENT = "AWAITING_PAYMENT" # A PaymentIntent was handed out
+ORDER_STATUS_FAILED_PAYMENT = "FAILED_PAYMENT"
+ORDER_STATUS_PROCESSING = "PROCESSING" # Paid, eSIM being provisioned
+ORDER_STATUS_FAILED_PROVISIONING = "FAILED_PROVISIONING"
+ORDER_STATUS_COMPLETED = "COMPLETED"
+ORDER_STATUS_CANCELLED = "CANCELLED"
+ORDER_STATUS_REFUNDED = "REFUNDED"
+
+# Status -> the statuses an order may move to from it
+ORDER_STATUS_TRANSITIONS: Dict[str, FrozenSet[str]] = {
+    ORDER_STATUS_PENDING_PAYMENT: frozenset({
+        ORDER_STATUS_AWAITING_PAYMENT, ORDER_STATUS_FAILED_PAYMENT, ORDER_STATUS_PROCESSING,
+        ORDER_STATUS_COMPLETED, ORDER_STATUS_CANCELLED,
+    }),
+    ORDER_STATUS_AWAITING_PAYMENT: frozenset({
+        ORDER_STATUS_FAILED_PAYMENT, ORDER_STATUS_PROCESSING, ORDER_STATUS_COMPLETED, ORDER_STATUS_CANCELLED,
+    }),
+    # A PaymentIntent can still succeed after a failed attempt
+    ORDER_STATUS_FAILED_PAYMENT: frozenset({
+        ORDER_STATUS_AWAITING_PAYMENT, ORDER_STATUS_PROCESSING, ORDER_STATUS_COMPLETED, ORDER_STATUS_CANCELLED,
+    }),
+    ORDER_STATUS_PROCESSING: frozenset({
+        ORDER_STATUS_FAILED_PROVISIONING, ORDER_STATUS_COMPLETED, ORDER_STATUS_CANCELLED, ORDER_STATUS_REFUNDED,
+    }),
+    ORDER_STATUS_FAILED_PROVISIONING: frozenset({
+        ORDER_STATUS_PROCESSING, ORDER_STATUS_COMPLETED, ORDER_STATUS_CANCELLED, ORDER_STATUS_REFUNDED,
+    }),
+    ORDER_STATUS_COMPLETED: frozenset({ORDER_STATUS_REFUNDED}),
+    ORDER_STATUS_CANCELLED: frozenset(),
+    ORDER_STATUS_REFUNDED: frozenset(),
+}
+
+class InvalidOrderStatusTransitionError(ValueError):
+    """Raised when an order is moved to a status it cannot reach from its current one."""
+    pass
+
+def can_transition(from_status: str, to_status: str) -> bool:
+    return from_status == to_status or to_status in ORDER_STATUS_TRANSITIONS.get(from_status, frozenset())
+
+def check_transition(from_status: str, to_status: str) -> None:
+    """
+    Raise InvalidOrderStatusTransitionError unless an order may move from from_status to to_status.
+    """
+    if not can_transition(from_status, to_status):
+        raise InvalidOrderStatusTransitionError(f"Order status cannot change from {from_status} to {to_status}")
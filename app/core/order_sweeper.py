@@ -0,0 +1,62 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, metrics
+from app.core.periodic import PeriodicJob
+from app.crud import crud_order
+
+# Cancels orders that were never paid, enabled with ORDER_SWEEPER_ENABLED.
+# Orders from the public order endpoint are often abandoned before payment, and would
+# otherwise stay PENDING_PAYMENT/AWAITING_PAYMENT forever. Every
+# ORDER_SWEEPER_INTERVAL_SECONDS the order_sweeper job (app.core.periodic) cancels those
+# created more than max_age_seconds ago, batch_size orders per set-based UPDATE
+# (crud_order.expire_stale_orders), each committed on its own so the write lock is only
+# held briefly, and at most max_batches per run. With dry_run it only counts them (up to
+# batch_size * max_batches).
+# Orders a PaymentIntent was handed out for are never swept: the intent can still succeed
+# at any time, and a payment for a cancelled order is only reported for a refund
+# (payment_webhook_cancelled_order_paid_total), not applied.
+#
+# Counters (see app.core.metrics): order_sweeper_batches_total, order_sweeper_expired_total,
+# order_sweeper_dry_run_matched_total, plus the job's order_sweeper_runs_total,
+# order_sweeper_rows_total and order_sweeper_failed_runs_total.
+
+logger = logging.getLogger(__name__)
+
+async def sweep_stale_orders(
+    db: AsyncSession,
+    *,
+    max_age_seconds: int = config.ORDER_SWEEPER_MAX_AGE_SECONDS,
+    batch_size: int = config.ORDER_SWEEPER_BATCH_SIZE,
+    max_batches: int = config.ORDER_SWEEPER_MAX_BATCHES,
+    dry_run: bool = config.ORDER_SWEEPER_DRY_RUN,
+    now: Optional[datetime] = None,
+) -> int:
+    """
+    Cancel (or, with dry_run, count) the unpaid orders older than max_age_seconds,
+    up to max_batches batches of batch_size. Returns the number of orders.
+    """
+    batch_size, max_batches = max(1, batch_size), max(1, max_batches)
+    created_before = (now or datetime.utcnow()) - timedelta(seconds=max_age_seconds)
+    if dry_run:
+        matched = await crud_order.count_stale_orders_async(db, created_before=created_before, limit=batch_size * max_batches)
+        metrics.inc("order_sweeper_dry_run_matched_total", matched)
+        logger.info(f"Order sweeper (dry run): {matched} unpaid orders created before {created_before} would be cancelled")
+        return matched
+
+    expired = 0
+    for _ in range(max_batches):
+        count = await crud_order.expire_stale_orders_async(db, created_before=created_before, limit=batch_size)
+        expired += count
+        metrics.inc("order_sweeper_batches_total")
+        metrics.inc("order_sweeper_expired_total", count)
+        if count < batch_size:
+            break
+    if expired:
+        logger.info(f"Order sweeper: cancelled {expired} unpaid orders created before {created_before}")
+    return expired
+
+order_sweeper = PeriodicJob("order_sweeper", sweep_stale_orders, interval_seconds=config.ORDER_SWEEPER_INTERVAL_SECONDS)
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from app.core import config, metrics
+from app.core.background import BackgroundTask
+from app.crud import crud_order
+from app.schemas.order import OrderCreateInternal
+
+# Write-coalescing ("group commit") order inserts, enabled with ORDER_WRITE_COALESCING_ENABLED.
+# On SQLite each commit takes the database's single write lock and syncs the WAL, so
+# creating orders one commit each caps throughput and makes concurrent requests (and
+# uvicorn workers) queue on the lock. Instead, requests submit() their order to the
+# process's OrderWriter task and await its id: the writer collects the orders submitted
+# within max_delay_ms of the first one (or max_batch_size of them), inserts them with one
+# batched INSERT (crud_order.insert_orders) and commits once for the whole batch.
+# If a batch fails, its orders are retried one commit each, so that a bad order only
+# fails its own request.
+#
+# Counters (see app.core.metrics): order_writer_batches_total, order_writer_orders_total,
+# order_writer_failed_total.
+
+logger = logging.getLogger(__name__)
+
+_Pending = Tuple[OrderCreateInternal, asyncio.Future]
+
+class OrderWriter(BackgroundTask):
+    """
+    Inserts submitted orders in batches, on the running event loop.
+    """
+    task_name = "order-writer"
+
+    def __init__(
+        self,
+        session_factory=None,
+        *,
+        max_batch_size: int = config.ORDER_WRITE_BATCH_MAX_SIZE,
+        max_delay_ms: float = config.ORDER_WRITE_BATCH_MAX_DELAY_MS,
+    ):
+        super().__init__(session_factory)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_delay_ms = max_delay_ms
+        self._queue: Optional[asyncio.Queue] = None
+
+    def _prepare(self) -> None:
+        self._queue = asyncio.Queue()
+
+    async def _finish(self, task: asyncio.Task) -> None:
+        # Stop once the orders already submitted are written
+        self._queue.put_nowait(None)
+        await task
+
+    async def submit(self, obj_in: OrderCreateInternal) -> int:
+        """
+        Have the order inserted with the next batch and return its id once committed.
+        Raises what inserting it raised.
+        """
+        if not self.running:
+            raise RuntimeError("Order writer is not running")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((obj_in, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            pending = await self._queue.get()
+            if pending is None:
+                return
+            batch: List[_Pending] = [pending]
+            stopping = self._take_ready(batch)
+            if not stopping and len(batch) < self.max_batch_size and self.max_delay_ms > 0:
+                await asyncio.sleep(self.max_delay_ms / 1000) # Let more orders join the batch
+                stopping = self._take_ready(batch)
+            await self._write(batch)
+            if stopping:
+                return
+
+    def _take_ready(self, batch: List[_Pending]) -> bool:
+        # Add the orders already submitted to the batch, up to max_batch_size; True if stop() was called
+        while len(batch) < self.max_batch_size:
+            try:
+                pending = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if pending is None:
+                return True
+            batch.append(pending)
+        return False
+
+    async def _write(self, batch: List[_Pending]) -> None:
+        try:
+            async with self._sessions() as db:
+                order_ids = await crud_order.insert_orders_async(db, objs_in=[obj_in for obj_in, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                metrics.inc("order_writer_failed_total")
+                _resolve(batch[0][1], exception=exc)
+                return
+            logger.warning(f"Order writer: batch of {len(batch)} orders failed, writing them one by one", exc_info=True)
+            for pending in batch:
+                await self._write([pending])
+            return
+        metrics.inc("order_writer_batches_total")
+        metrics.inc("order_writer_orders_total", len(batch))
+        for (_, future), order_id in zip(batch, order_ids):
+            _resolve(future, result=order_id)
+
+def _resolve(future: asyncio.Future, *, result: Optional[int] = None, exception: Optional[BaseException] = None) -> None:
+    if future.done(): # Cancelled, e.g. the client went away; the order is created all the same
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
+
+order_writer = OrderWriter()
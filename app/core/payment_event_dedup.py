@@ -0,0 +1,62 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core import metrics
+from app.core.config import PAYMENT_EVENT_DEDUP_MAX_SIZE, PAYMENT_EVENT_DEDUP_TTL_SECONDS
+
+# Ids of the Stripe webhook events this process accepted recently, so that Stripe's
+# redeliveries are acknowledged without a database round trip.
+# - Bounded: the oldest ids are dropped beyond PAYMENT_EVENT_DEDUP_MAX_SIZE.
+# - Time-limited: an id is forgotten after PAYMENT_EVENT_DEDUP_TTL_SECONDS.
+# Forgetting is safe: the processed_payment_event table (crud_payment_event) remains the
+# record of what was processed, this only saves looking there.
+#
+# Counters (see app.core.metrics): payment_event_dedup_hits_total, payment_event_dedup_misses_total.
+
+class RecentEventIds:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Insertion order is expiry order (one TTL for all), so expired ids are always at the front
+        self._expires_at: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._expires_at:
+            event_id, expires_at = next(iter(self._expires_at.items()))
+            if expires_at > now:
+                break
+            del self._expires_at[event_id]
+
+    def seen(self, event_id: str, now: Optional[float] = None) -> bool:
+        """
+        Whether `event_id` was added within the last ttl_seconds.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(now)
+            found = event_id in self._expires_at
+        metrics.inc("payment_event_dedup_hits_total" if found else "payment_event_dedup_misses_total")
+        return found
+
+    def add(self, event_id: str, now: Optional[float] = None) -> None:
+        if self.max_size <= 0:
+            return
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expires_at.pop(event_id, None)
+            self._expires_at[event_id] = now + self.ttl_seconds
+            while len(self._expires_at) > self.max_size:
+                self._expires_at.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._expires_at.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._expires_at)
+
+recent_payment_events = RecentEventIds(PAYMENT_EVENT_DEDUP_MAX_SIZE, PAYMENT_EVENT_DEDUP_TTL_SECONDS)
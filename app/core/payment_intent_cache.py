@@ -0,0 +1,75 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import PAYMENT_INTENT_CACHE_MAX_SIZE, PAYMENT_INTENT_CACHE_TTL_SECONDS
+
+# Short-lived in-process cache of the Stripe PaymentIntents handed out by
+# /payments/create-payment-intent, so that checkout page reloads for an order that
+# already has an intent don't need a retrieve round trip to Stripe to decide whether
+# to reuse it.
+# - Holds only what that decision and the response need (status, amount, currency,
+#   client_secret), keyed by intent id.
+# - Bounded: least recently used entries are evicted beyond PAYMENT_INTENT_CACHE_MAX_SIZE.
+# - Entries expire after PAYMENT_INTENT_CACHE_TTL_SECONDS: an intent's status changes
+#   on Stripe's side when the customer pays. Payment webhooks invalidate the intent
+#   they are about (app.core.payment_webhooks); the TTL bounds staleness elsewhere.
+#
+# Counters (see app.core.metrics): payment_intent_cache_hits_total,
+# payment_intent_cache_misses_total, payment_intent_cache_invalidations_total.
+
+class CachedPaymentIntent(NamedTuple):
+    id: str
+    status: str
+    amount: int
+    currency: str
+    client_secret: Optional[str]
+
+class PaymentIntentCache:
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[CachedPaymentIntent, float]]" = OrderedDict()
+        # Guard with a lock, like the other in-process caches.
+        self._lock = threading.Lock()
+
+    def get(self, payment_intent_id: str) -> Optional[CachedPaymentIntent]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(payment_intent_id)
+            if entry is None or entry[1] <= now:
+                self._entries.pop(payment_intent_id, None)
+                metrics.inc("payment_intent_cache_misses_total")
+                return None
+            self._entries.move_to_end(payment_intent_id)
+        metrics.inc("payment_intent_cache_hits_total")
+        return entry[0]
+
+    def put(self, payment_intent) -> CachedPaymentIntent:
+        """
+        Cache a PaymentIntent (a stripe object or a CachedPaymentIntent) and return its cached form.
+        """
+        cached = CachedPaymentIntent(
+            id=payment_intent.id, status=payment_intent.status, amount=payment_intent.amount,
+            currency=payment_intent.currency, client_secret=payment_intent.client_secret,
+        )
+        if self.max_size > 0:
+            with self._lock:
+                self._entries[cached.id] = (cached, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(cached.id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, payment_intent_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(payment_intent_id, None) is not None:
+                metrics.inc("payment_intent_cache_invalidations_total")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+payment_intent_cache = PaymentIntentCache(PAYMENT_INTENT_CACHE_MAX_SIZE, PAYMENT_INTENT_CACHE_TTL_SECONDS)
@@ -0,0 +1,169 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import stripe
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config, metrics
+from app.core.commission_outbox import update_order_and_enqueue_commissions_async
+from app.core.commissions_calculator import ORDER_STATUS_COMPLETED
+from app.core.payment_intent_cache import payment_intent_cache
+from app.core.periodic import PeriodicJob
+from app.core.queue_worker import LeasedQueueWorker
+from app.crud import crud_order, crud_payment_event
+from app.models.order import Order as OrderModel
+from app.schemas.order import OrderUpdate
+from app.schemas.payment import PaymentWebhookEventEntry
+
+# Stripe webhooks, acknowledged fast and processed in the background.
+# The endpoint only verifies the Stripe-Signature header (verify_event), stores the raw
+# event (crud_payment_event) and answers; Stripe needs a 2xx within seconds and retries
+# otherwise. PaymentWebhookWorker, running on the app's event loop, then applies each
+# event to its order, found by PaymentIntent id: payment_intent.succeeded completes the
+# order, which queues its commissions (app.core.commission_outbox), and
+# payment_intent.payment_failed marks it FAILED_PAYMENT. Other event types are
+# acknowledged and dropped.
+# Stripe delivers events at least once. Redeliveries are acknowledged without being
+# stored again: recent ids are caught in memory (app.core.payment_event_dedup), older
+# ones by the processed_payment_event table. Each is counted in payment_webhook_duplicates_total.
+# Ids older than PROCESSED_PAYMENT_EVENT_RETENTION_SECONDS (at least Stripe's redelivery
+# window) are deleted by processed_payment_event_purge, started with the app.
+
+logger = logging.getLogger(__name__)
+
+ORDER_STATUS_FAILED_PAYMENT = "FAILED_PAYMENT"
+ORDER_STATUS_CANCELLED = "CANCELLED"
+# Statuses a successful payment completes; a PaymentIntent can succeed after a failed attempt
+PAYABLE_STATUSES = ("PENDING_PAYMENT", "AWAITING_PAYMENT", ORDER_STATUS_FAILED_PAYMENT)
+AWAITING_STATUSES = ("PENDING_PAYMENT", "AWAITING_PAYMENT")
+
+def verify_event(payload: bytes, signature_header: Optional[str]) -> Dict[str, Any]:
+    """
+    Check the Stripe-Signature header of a webhook request against STRIPE_WEBHOOK_SECRET
+    and return the parsed event. Raises stripe.SignatureVerificationError for a bad or
+    stale signature, ValueError for a body that is not an event.
+    """
+    stripe.WebhookSignature.verify_header(
+        payload, signature_header, config.STRIPE_WEBHOOK_SECRET, tolerance=config.STRIPE_WEBHOOK_TOLERANCE_SECONDS
+    )
+    event = json.loads(payload)
+    if not isinstance(event, dict) or not event.get("id") or not event.get("type"):
+        raise ValueError("Webhook payload is not a Stripe event")
+    return event
+
+def _amount_in_cents(order: OrderModel) -> int:
+    return int(Decimal(order.price_paid) * 100) # As charged by the create-payment-intent endpoint
+
+async def _payment_succeeded(db: AsyncSession, order: OrderModel, intent: Dict[str, Any]) -> None:
+    if order.order_status == ORDER_STATUS_CANCELLED:
+        # The customer was charged for an order that won't be fulfilled: it needs a refund
+        metrics.inc("payment_webhook_cancelled_order_paid_total")
+        logger.error(
+            f"Payment webhook: PaymentIntent {intent.get('id')} succeeded for CANCELLED order ID {order.id};"
+            f" order not completed, payment must be refunded"
+        )
+        return
+    if order.order_status not in PAYABLE_STATUSES:
+        logger.info(f"Payment webhook: order ID {order.id} is {order.order_status}, payment success ignored")
+        return
+    if intent.get("amount_received") != _amount_in_cents(order) or str(intent.get("currency", "")).lower() != order.currency_paid.lower():
+        # Paid, but not what the order costs: leave the order for someone to look into
+        logger.error(
+            f"Payment webhook: PaymentIntent {intent.get('id')} received {intent.get('amount_received')} {intent.get('currency')}"
+            f" but order ID {order.id} costs {_amount_in_cents(order)} {order.currency_paid}; order not completed"
+        )
+        return
+    await update_order_and_enqueue_commissions_async(db, db_obj=order, obj_in=OrderUpdate(order_status=ORDER_STATUS_COMPLETED))
+    logger.info(f"Payment webhook: order ID {order.id} paid and completed")
+
+async def _payment_failed(db: AsyncSession, order: OrderModel, intent: Dict[str, Any]) -> None:
+    if order.order_status not in AWAITING_STATUSES:
+        logger.info(f"Payment webhook: order ID {order.id} is {order.order_status}, payment failure ignored")
+        return
+    await crud_order.update_order_async(db, db_obj=order, obj_in=OrderUpdate(order_status=ORDER_STATUS_FAILED_PAYMENT))
+    logger.info(f"Payment webhook: payment of order ID {order.id} failed")
+
+# Event type -> handler of its PaymentIntent's order
+EVENT_HANDLERS = {
+    "payment_intent.succeeded": _payment_succeeded,
+    "payment_intent.payment_failed": _payment_failed,
+}
+
+async def process_event(db: AsyncSession, event: Dict[str, Any]) -> None:
+    """
+    Apply a verified Stripe event to its order. Handlers are idempotent: an event
+    applied twice changes the order once.
+    """
+    handler = EVENT_HANDLERS.get(event["type"])
+    if handler is None:
+        return
+    intent = event["data"]["object"]
+    payment_intent_cache.invalidate(intent["id"]) # Its status has changed
+    order = await crud_order.get_order_by_stripe_payment_intent_async(db, payment_intent_id=intent["id"])
+    if order is None:
+        logger.warning(f"Payment webhook: no order for PaymentIntent {intent['id']} ({event['type']} {event['id']}), ignored")
+        return
+    await handler(db, order, intent)
+
+
+class PaymentWebhookWorker(LeasedQueueWorker):
+    """
+    Processes stored Stripe webhook events on the running event loop, polling every
+    poll_seconds when idle or sooner when notify() is called.
+    """
+    label = "Payment webhook"
+    metrics_prefix = "payment_webhook"
+
+    def __init__(
+        self,
+        session_factory=None,
+        *,
+        concurrency: int = config.PAYMENT_WEBHOOK_CONCURRENCY,
+        batch_size: int = config.PAYMENT_WEBHOOK_BATCH_SIZE,
+        poll_seconds: float = config.PAYMENT_WEBHOOK_POLL_SECONDS,
+        lease_seconds: int = config.PAYMENT_WEBHOOK_LEASE_SECONDS,
+        retry_base_seconds: float = config.PAYMENT_WEBHOOK_RETRY_BASE_SECONDS,
+        retry_max_seconds: float = config.PAYMENT_WEBHOOK_RETRY_MAX_SECONDS,
+        max_attempts: int = config.PAYMENT_WEBHOOK_MAX_ATTEMPTS,
+    ):
+        super().__init__(
+            session_factory, concurrency=concurrency, batch_size=batch_size, poll_seconds=poll_seconds,
+            lease_seconds=lease_seconds, retry_base_seconds=retry_base_seconds,
+            retry_max_seconds=retry_max_seconds, max_attempts=max_attempts,
+        )
+
+    async def _claim(self, db: AsyncSession, *, limit: int, lease_seconds: int) -> List[PaymentWebhookEventEntry]:
+        return await crud_payment_event.claim_due_events_async(db, limit=limit, lease_seconds=lease_seconds)
+
+    async def _handle(self, db: AsyncSession, entry: PaymentWebhookEventEntry) -> None:
+        if await crud_payment_event.is_processed_async(db, event_id=entry.event_id):
+            # A redelivery stored while the first delivery was being completed
+            metrics.inc("payment_webhook_duplicates_total")
+            return
+        await process_event(db, json.loads(entry.payload))
+
+    async def _complete(self, db: AsyncSession, entry: PaymentWebhookEventEntry) -> None:
+        await crud_payment_event.complete_event_async(db, entry=entry)
+
+    async def _fail(self, db: AsyncSession, entry: PaymentWebhookEventEntry, *, error: str, retry_at: Optional[datetime]) -> None:
+        await crud_payment_event.fail_event_async(db, entry_id=entry.id, error=error, retry_at=retry_at)
+
+    def _describe(self, entry: PaymentWebhookEventEntry) -> str:
+        return f"event {entry.event_id} ({entry.event_type})"
+
+payment_webhook_worker = PaymentWebhookWorker()
+
+# Stripe stops redelivering an event three days after it was first sent
+STRIPE_REDELIVERY_WINDOW = timedelta(days=3)
+
+async def _purge_processed_events(db: AsyncSession) -> int:
+    retention = max(timedelta(seconds=config.PROCESSED_PAYMENT_EVENT_RETENTION_SECONDS), STRIPE_REDELIVERY_WINDOW)
+    return await crud_payment_event.purge_processed_events_async(db, before=datetime.utcnow() - retention)
+
+processed_payment_event_purge = PeriodicJob(
+    "processed_payment_event_purge", _purge_processed_events,
+    interval_seconds=config.PROCESSED_PAYMENT_EVENT_PURGE_INTERVAL_SECONDS,
+)
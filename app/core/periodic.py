@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.background import BackgroundTask
+
+# Housekeeping jobs run every few minutes or hours on the app's event loop, e.g. purging
+# expired rows. Each run gets its own session; a failed run is logged and the job tries
+# again at its next interval.
+#
+# Counters (see app.core.metrics): <name>_runs_total, <name>_rows_total (what the job
+# returned, e.g. rows deleted), <name>_failed_runs_total.
+
+logger = logging.getLogger(__name__)
+
+class PeriodicJob(BackgroundTask):
+    """
+    Runs `job` on a new session every interval_seconds, on the running event loop.
+    The job returns the number of rows it processed.
+    """
+    def __init__(
+        self,
+        name: str,
+        job: Callable[[AsyncSession], Awaitable[int]],
+        session_factory=None,
+        *,
+        interval_seconds: float,
+    ):
+        super().__init__(session_factory)
+        self.name = self.task_name = name # Task name and metrics prefix
+        self.job = job
+        self.interval_seconds = interval_seconds
+
+    async def run_once(self) -> int:
+        """
+        Run the job once. Returns the number of rows it processed.
+        """
+        async with self._sessions() as db:
+            rows = await self.job(db)
+        metrics.inc(f"{self.name}_runs_total")
+        metrics.inc(f"{self.name}_rows_total", rows)
+        if rows:
+            logger.info(f"{self.name}: {rows} rows")
+        return rows
+
+    async def _run(self) -> None:
+        # Run the job now, then every interval_seconds
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                metrics.inc(f"{self.name}_failed_runs_total")
+                logger.exception(f"{self.name}: run failed")
+            await asyncio.sleep(self.interval_seconds)
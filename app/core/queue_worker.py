@@ -0,0 +1,166 @@
+import abc
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import metrics
+from app.core.background import BackgroundTask
+
+# Background draining of a database-backed work queue, on the app's event loop.
+# Entries are claimed with a lease (so those of a process that died come back once it
+# expires), handled concurrently, then completed; failures are retried with exponential
+# backoff and parked after max_attempts. Subclasses supply the table specifics:
+# _claim, _handle, _complete and _fail (abstract), and optionally _describe.
+#
+# Counters (see app.core.metrics): <metrics_prefix>_processed_total,
+# <metrics_prefix>_retried_total, <metrics_prefix>_parked_total.
+
+logger = logging.getLogger(__name__)
+
+class LeasedQueueWorker(BackgroundTask):
+    """
+    Drains a queue on the running event loop: up to `concurrency` entries at a time,
+    polling every poll_seconds when idle or sooner when notify() is called.
+    """
+    label = "Queue" # Log prefix and task name
+    metrics_prefix = "queue"
+
+    def __init__(
+        self,
+        session_factory=None,
+        *,
+        concurrency: int,
+        batch_size: int,
+        poll_seconds: float,
+        lease_seconds: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+        max_attempts: int,
+    ):
+        super().__init__(session_factory)
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.max_attempts = max_attempts
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    # --- Queue specifics ---
+
+    @abc.abstractmethod
+    async def _claim(self, db: AsyncSession, *, limit: int, lease_seconds: int) -> List[Any]:
+        # Lease up to `limit` due entries (each with .id and .attempts) and commit
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _handle(self, db: AsyncSession, entry: Any) -> None:
+        # Do the entry's work; raising makes it retried
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _complete(self, db: AsyncSession, entry: Any) -> None:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    async def _fail(self, db: AsyncSession, entry: Any, *, error: str, retry_at: Optional[datetime]) -> None:
+        # Release the entry for retry_at, or park it if None
+        raise NotImplementedError
+
+    def _describe(self, entry: Any) -> str:
+        return f"entry ID {entry.id}"
+
+    # --- Running ---
+
+    # start() drains on the running event loop: entries left over from a previous run are
+    # picked up right away (or once their lease expires, if they were in progress). stop()
+    # abandons the entries in progress; they are retried after their lease.
+
+    @property
+    def task_name(self) -> str:
+        return f"{self.metrics_prefix}-worker"
+
+    def _prepare(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+    def notify(self) -> None:
+        """
+        Wake the worker to look for due entries now rather than at its next poll.
+        Safe to call from any thread, and a no-op when the worker is not running.
+        """
+        if self.running:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        Seconds to wait before the next attempt, after `attempts` failed ones.
+        """
+        return min(self.retry_max_seconds, self.retry_base_seconds * 2 ** max(0, attempts - 1))
+
+    async def run_once(self) -> int:
+        """
+        Claim one batch of due entries and process it. Returns the number claimed.
+        """
+        async with self._sessions() as db:
+            entries = await self._claim(db, limit=self.batch_size, lease_seconds=self.lease_seconds)
+        if entries:
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def bounded(entry):
+                async with semaphore:
+                    await self._process(entry)
+
+            await asyncio.gather(*(bounded(entry) for entry in entries))
+        return len(entries)
+
+    async def drain(self) -> int:
+        """
+        Process due entries until there are none left. Returns the number processed.
+        """
+        total = 0
+        while True:
+            claimed = await self.run_once()
+            total += claimed
+            if claimed == 0:
+                return total
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"{self.label}: claiming entries failed")
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue # Probably more waiting
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _process(self, entry: Any) -> None:
+        async with self._sessions() as db:
+            try:
+                await self._handle(db, entry)
+                await self._complete(db, entry)
+                metrics.inc(f"{self.metrics_prefix}_processed_total")
+            except Exception as exc:
+                await db.rollback()
+                if entry.attempts >= self.max_attempts:
+                    retry_at = None
+                    metrics.inc(f"{self.metrics_prefix}_parked_total")
+                    logger.exception(f"{self.label}: {self._describe(entry)} failed {entry.attempts} times, parked")
+                else:
+                    retry_at = datetime.utcnow() + timedelta(seconds=self.retry_delay(entry.attempts))
+                    metrics.inc(f"{self.metrics_prefix}_retried_total")
+                    logger.warning(f"{self.label}: {self._describe(entry)} failed (attempt {entry.attempts}), retrying at {retry_at}: {exc!r}")
+                await self._fail(db, entry, error=repr(exc), retry_at=retry_at)
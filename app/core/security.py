@@ -1,5 +1,11 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from passlib.context import CryptContext
 
+from app.core.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+
 # Changed default scheme to pbkdf2_sha256 to avoid bcrypt C-extension issues in test env
 pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
@@ -9,6 +15,61 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+
+# --- Async wrappers ---
+# pbkdf2 costs hundreds of ms of CPU per call; running it inline in an async endpoint
+# stalls every other request on the worker. These wrappers run it on a dedicated
+# process pool (PASSWORD_HASH_WORKERS processes). At most PASSWORD_HASH_QUEUE_LIMIT jobs
+# may wait beyond the busy workers; past that, PasswordHashingBusyError is raised
+# immediately so callers can shed load instead of queueing unboundedly.
+
+class PasswordHashingBusyError(RuntimeError):
+    """Raised when the password hashing pool and its queue are full."""
+    pass
+
+_pool = None
+_pool_lock = threading.Lock()
+_in_flight = 0
+
+def _get_pool():
+    global _pool
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None # Default thread executor
+    with _pool_lock:
+        if _pool is None:
+            # spawn rather than fork: the server process runs threads (threadpool, TestClient portal)
+            _pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+def shutdown_password_hashing_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+async def _run_in_hashing_pool(func, *args):
+    global _in_flight
+    capacity = max(PASSWORD_HASH_WORKERS, 1) + PASSWORD_HASH_QUEUE_LIMIT
+    with _pool_lock:
+        if _in_flight >= capacity:
+            raise PasswordHashingBusyError("Password hashing pool is saturated")
+        _in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), func, *args)
+    finally:
+        with _pool_lock:
+            _in_flight -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_in_hashing_pool(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_in_hashing_pool(get_password_hash, password)
+
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
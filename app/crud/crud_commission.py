@@ -1,11 +1,16 @@
+from sqlalchemy import delete, func, insert
 from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Iterable, Optional, List
 
-from app.models.commission import Commission
+from app.models.commission import Commission, COMMISSION_UNIQUE_COLUMNS
+from app.crud import crud_team_volume
 from app.models.order import Order # For relationship loading
 from app.models.reseller import ResellerProfile # For relationship loading
 from app.models.product import ProductPackage # For relationship loading
-from app.schemas.commission import CommissionCreate, CommissionUpdate
+from app.schemas.commission import CommissionCreate, CommissionUpdate, CommissionStatusTotal
+from app.utils.pagination import apply_keyset
+from app.utils.sql import dialect_insert
 # CommissionUpdate might be used if we make a generic update function later
 
 def create_commission(db: Session, *, obj_in: CommissionCreate) -> Commission:
@@ -18,6 +23,42 @@ def create_commission(db: Session, *, obj_in: CommissionCreate) -> Commission:
     db.refresh(db_obj)
     return db_obj
 
+def create_commissions(db: Session, *, objs_in: List[CommissionCreate], commit: bool = True) -> List[int]:
+    """
+    Insert several commission records with one bulk INSERT (no per-row refresh) and
+    return the ids of the rows inserted.
+    Rows that would duplicate an existing (order_id, reseller_id, commission_type) are
+    skipped by the database (ON CONFLICT DO NOTHING), so recording an order's
+    commissions twice, even concurrently, leaves a single set.
+    The inserted commissions are added to the team volume rollup (see crud_team_volume).
+    With commit=False the rows are only flushed, leaving the transaction open for the caller.
+    """
+    inserted_ids: List[int] = []
+    if objs_in:
+        stmt = dialect_insert(db, Commission)
+        if stmt is None: # No ON CONFLICT support; duplicates raise IntegrityError from the unique index
+            stmt = insert(Commission)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(COMMISSION_UNIQUE_COLUMNS))
+        result = db.execute(stmt.returning(Commission.id), [obj_in.model_dump() for obj_in in objs_in])
+        inserted_ids = [row[0] for row in result]
+        crud_team_volume.add_commissions(db, commission_ids=inserted_ids)
+    if commit:
+        db.commit()
+    return inserted_ids
+
+def delete_commissions(db: Session, *, commission_ids: List[int], commit: bool = True) -> None:
+    """
+    Delete commission records by id, taking them out of the team volume rollup.
+    Used by recalculation (see app.core.commission_backfill); paid commissions should never be deleted.
+    With commit=False the rows are only deleted in the open transaction.
+    """
+    if commission_ids:
+        crud_team_volume.add_commissions(db, commission_ids=commission_ids, sign=-1)
+        db.execute(delete(Commission).where(Commission.id.in_(commission_ids)).execution_options(synchronize_session=False))
+    if commit:
+        db.commit()
+
 def get_commission(db: Session, commission_id: int) -> Optional[Commission]:
     """
     Get a single commission by ID with related data eagerly loaded.
@@ -36,24 +77,62 @@ def get_commission(db: Session, commission_id: int) -> Optional[Commission]:
     )
 
 def get_commissions_by_reseller(
-    db: Session, *, reseller_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100
+    db: Session, *, reseller_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None
 ) -> List[Commission]:
     """
     Get commissions for a specific reseller, optionally filtered by status.
-    Eager loads order and product_package (snapshot).
+    Eager loads everything the Commission response schema nests: order, product_package
+    (snapshot), earning_reseller and triggering_reseller.
+    If a cursor (see app.utils.pagination) is given, returns the page after it and skip is ignored.
     """
     query = (
         db.query(Commission)
         .options(
             joinedload(Commission.order),
-            joinedload(Commission.product_package) # Product package snapshot
+            joinedload(Commission.product_package), # Product package snapshot
+            joinedload(Commission.earning_reseller),
+            joinedload(Commission.triggering_reseller)
         )
         .filter(Commission.reseller_id == reseller_id)
     )
     if status:
         query = query.filter(Commission.commission_status == status)
 
-    return query.order_by(Commission.created_at.desc()).offset(skip).limit(limit).all()
+    # id breaks created_at ties so the order is total, which keyset pagination relies on
+    query = query.order_by(Commission.created_at.desc(), Commission.id.desc())
+    if cursor:
+        query = apply_keyset(query, Commission, cursor)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def get_commission_totals_by_reseller(db: Session, *, reseller_id: int) -> List[CommissionStatusTotal]:
+    """
+    SUM and COUNT of a reseller's commissions grouped by commission_status and currency,
+    computed in SQL (one row per group) instead of loading the commission rows.
+    """
+    rows = (
+        db.query(
+            Commission.commission_status,
+            Commission.currency,
+            func.sum(Commission.amount).label("total_amount"),
+            func.count(Commission.id).label("count"),
+        )
+        .filter(Commission.reseller_id == reseller_id)
+        .group_by(Commission.commission_status, Commission.currency)
+        .order_by(Commission.commission_status, Commission.currency)
+        .all()
+    )
+    return [
+        CommissionStatusTotal(
+            commission_status=row.commission_status,
+            currency=row.currency,
+            total_amount=row.total_amount,
+            count=row.count,
+        )
+        for row in rows
+    ]
 
 def update_commission_status(db: Session, *, commission_id: int, status: str) -> Optional[Commission]:
     """
@@ -105,3 +184,47 @@ def get_commissions_by_order_id(db: Session, *, order_id: int) -> List[Commissio
         .filter(Commission.order_id == order_id)
         .all()
     )
+
+
+def get_commissions_by_order_ids(db: Session, *, order_ids: Iterable[int]) -> List[Commission]:
+    """
+    All commissions of the given orders, without related data: one query per batch of orders.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return []
+    return db.query(Commission).filter(Commission.order_id.in_(order_ids)).all()
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def create_commission_async(db: AsyncSession, *, obj_in: CommissionCreate) -> Commission:
+    return await db.run_sync(create_commission, obj_in=obj_in)
+
+async def create_commissions_async(db: AsyncSession, *, objs_in: List[CommissionCreate], commit: bool = True) -> List[int]:
+    return await db.run_sync(create_commissions, objs_in=objs_in, commit=commit)
+
+async def get_commission_async(db: AsyncSession, commission_id: int) -> Optional[Commission]:
+    return await db.run_sync(get_commission, commission_id)
+
+async def get_commissions_by_reseller_async(
+    db: AsyncSession, *, reseller_id: int, status: Optional[str] = None, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None
+) -> List[Commission]:
+    return await db.run_sync(
+        get_commissions_by_reseller, reseller_id=reseller_id, status=status, skip=skip, limit=limit, cursor=cursor
+    )
+
+async def get_commission_totals_by_reseller_async(db: AsyncSession, *, reseller_id: int) -> List[CommissionStatusTotal]:
+    return await db.run_sync(get_commission_totals_by_reseller, reseller_id=reseller_id)
+
+async def update_commission_status_async(db: AsyncSession, *, commission_id: int, status: str) -> Optional[Commission]:
+    return await db.run_sync(update_commission_status, commission_id=commission_id, status=status)
+
+async def get_unpaid_commissions_for_reseller_async(
+    db: AsyncSession, *, reseller_id: int, skip: int = 0, limit: int = 100
+) -> List[Commission]:
+    return await db.run_sync(get_unpaid_commissions_for_reseller, reseller_id=reseller_id, skip=skip, limit=limit)
+
+async def get_commissions_by_order_id_async(db: AsyncSession, *, order_id: int) -> List[Commission]:
+    return await db.run_sync(get_commissions_by_order_id, order_id=order_id)
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.idempotency import IdempotencyKey
+
+# Stored responses of requests sent with an Idempotency-Key header (see app.core.idempotency).
+# A key is live until its expires_at; expired keys are ignored and may be reused, and
+# purge_expired_keys removes them.
+
+def get_key(db: Session, *, scope: str, key: str, now: Optional[datetime] = None) -> Optional[IdempotencyKey]:
+    """
+    The live stored response for this key (a primary key lookup), None if there is none.
+    """
+    now = now or datetime.utcnow()
+    stored = db.get(IdempotencyKey, (scope, key))
+    if stored is None or stored.expires_at <= now:
+        return None
+    return stored
+
+def save_key(
+    db: Session, *, scope: str, key: str, fingerprint: str, status_code: int, response_body: str,
+    ttl_seconds: int, commit: bool = True,
+) -> None:
+    """
+    Store the response to the request sent with this key, replacing an expired one.
+    Raises sqlalchemy.exc.IntegrityError if the key is live, i.e. a concurrent request
+    with the same key stored its response first: call it in the transaction that makes
+    the request's changes, so those are rolled back with it.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.expires_at <= now)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(insert(IdempotencyKey).values(
+        scope=scope, key=key, fingerprint=fingerprint, status_code=status_code, response_body=response_body,
+        created_at=now, expires_at=now + timedelta(seconds=ttl_seconds),
+    ))
+    if commit:
+        db.commit()
+
+def purge_expired_keys(db: Session, *, now: Optional[datetime] = None) -> int:
+    """
+    Remove expired keys and commit. Returns the number removed.
+    """
+    now = now or datetime.utcnow()
+    result = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def get_key_async(db: AsyncSession, *, scope: str, key: str, now: Optional[datetime] = None) -> Optional[IdempotencyKey]:
+    return await db.run_sync(get_key, scope=scope, key=key, now=now)
+
+async def save_key_async(
+    db: AsyncSession, *, scope: str, key: str, fingerprint: str, status_code: int, response_body: str,
+    ttl_seconds: int, commit: bool = True,
+) -> None:
+    return await db.run_sync(
+        save_key, scope=scope, key=key, fingerprint=fingerprint, status_code=status_code,
+        response_body=response_body, ttl_seconds=ttl_seconds, commit=commit,
+    )
+
+async def purge_expired_keys_async(db: AsyncSession, *, now: Optional[datetime] = None) -> int:
+    return await db.run_sync(purge_expired_keys, now=now)
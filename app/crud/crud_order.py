@@ -1,22 +1,80 @@
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session, joinedload
-from typing import Optional, List
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Optional, List, Sequence, Tuple
 
 from app.models.order import Order
+from app.crud import crud_team_volume
+from app.core.order_status import (
+    ORDER_STATUS_AWAITING_PAYMENT, ORDER_STATUS_CANCELLED, ORDER_STATUS_PENDING_PAYMENT, check_transition,
+)
 # from app.models.product import ProductPackage # Not directly needed if OrderCreateInternal has all data
 from app.schemas.order import OrderCreateInternal, OrderUpdate
+from app.utils.pagination import apply_keyset
 # from sqlalchemy import select # Not needed for these specific queries
 
-def create_order(db: Session, *, obj_in: OrderCreateInternal) -> Order:
+class OrderVersionConflictError(Exception):
+    """Raised when an order was updated by someone else since the version an update was made from."""
+    def __init__(self, order_id: int, version: int):
+        super().__init__(f"Order {order_id} was modified since version {version}; reload it and retry")
+        self.order_id = order_id
+        self.version = version
+
+def create_order(db: Session, *, obj_in: OrderCreateInternal, commit: bool = True) -> Order:
     """
     Create a new order.
     obj_in should be of type OrderCreateInternal which includes all necessary fields.
+    With commit=False the order is only flushed, leaving the transaction open for the caller.
     """
     db_obj = Order(**obj_in.model_dump())
     db.add(db_obj)
-    db.commit()
+    if db_obj.order_status == crud_team_volume.ORDER_STATUS_COMPLETED:
+        db.flush()
+        crud_team_volume.add_orders(db, order_ids=[db_obj.id])
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     db.refresh(db_obj)
     return db_obj
 
+def create_orders(db: Session, *, objs_in: List[OrderCreateInternal]) -> List[Order]:
+    """
+    Create several orders in one transaction: the rows go out in a single batched
+    INSERT and are committed once. Returns them in the order given, with product_package
+    and reseller loaded by one query for the whole batch.
+    """
+    if not objs_in:
+        return []
+    order_ids = insert_orders(db, objs_in=objs_in)
+    loaded = {
+        order.id: order
+        for order in db.query(Order)
+        .options(joinedload(Order.product_package), joinedload(Order.reseller))
+        .filter(Order.id.in_(order_ids))
+        .populate_existing()
+    }
+    return [loaded[order_id] for order_id in order_ids]
+
+def insert_orders(db: Session, *, objs_in: List[OrderCreateInternal], commit: bool = True) -> List[int]:
+    """
+    Insert several orders with a single batched INSERT and return their ids, in the
+    order given. With commit=False the transaction is left open for the caller.
+    """
+    if not objs_in:
+        return []
+    db_objs = [Order(**obj_in.model_dump()) for obj_in in objs_in]
+    db.add_all(db_objs)
+    db.flush() # One executemany / multi-row INSERT ... RETURNING for the ids
+    order_ids = [db_obj.id for db_obj in db_objs]
+    completed_ids = [db_obj.id for db_obj in db_objs if db_obj.order_status == crud_team_volume.ORDER_STATUS_COMPLETED]
+    crud_team_volume.add_orders(db, order_ids=completed_ids)
+    if commit:
+        db.commit()
+    return order_ids
+
 def get_order(db: Session, order_id: int) -> Optional[Order]:
     """
     Get a single order by ID, with related product_package and reseller data eagerly loaded.
@@ -32,54 +90,87 @@ def get_order(db: Session, order_id: int) -> Optional[Order]:
     )
 
 def get_orders_by_reseller(
-    db: Session, *, reseller_id: int, skip: int = 0, limit: int = 100
+    db: Session, *, reseller_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
 ) -> List[Order]:
     """
     Get a list of orders for a specific reseller, ordered by creation date descending.
     Related product_package and reseller data are eagerly loaded.
+    If a cursor (see app.utils.pagination) is given, returns the page after it and skip is ignored.
     """
-    return (
+    query = (
         db.query(Order)
         .options(
             joinedload(Order.product_package),
             joinedload(Order.reseller)
         )
         .filter(Order.reseller_id == reseller_id)
-        .order_by(Order.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    return _paginate(query, skip=skip, limit=limit, cursor=cursor)
 
 def get_orders_by_customer(
-    db: Session, *, customer_email: str, skip: int = 0, limit: int = 100
+    db: Session, *, customer_email: str, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
 ) -> List[Order]:
     """
     Get a list of orders for a specific customer email, ordered by creation date descending.
     Related product_package and reseller data are eagerly loaded.
+    If a cursor (see app.utils.pagination) is given, returns the page after it and skip is ignored.
     """
-    return (
+    query = (
         db.query(Order)
         .options(
             joinedload(Order.product_package),
             joinedload(Order.reseller) # Reseller who made the sale
         )
         .filter(Order.customer_email == customer_email)
-        .order_by(Order.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
     )
+    return _paginate(query, skip=skip, limit=limit, cursor=cursor)
+
+def _paginate(query, *, skip: int, limit: int, cursor: Optional[str]) -> List[Order]:
+    # id breaks created_at ties so the order is total, which keyset pagination relies on
+    query = query.order_by(Order.created_at.desc(), Order.id.desc())
+    if cursor:
+        query = apply_keyset(query, Order, cursor)
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
 
-def update_order(db: Session, *, db_obj: Order, obj_in: OrderUpdate) -> Order:
+def update_order(db: Session, *, db_obj: Order, obj_in: OrderUpdate, commit: bool = True) -> Order:
     """
     Update an order. Primarily used for updating status, stripe_payment_intent_id,
     and esim_provisioning_status.
+    Status changes must be allowed by the order state machine (app.core.order_status),
+    from db_obj's status. The update is a single UPDATE ... WHERE id = ? AND version = ?
+    from obj_in.version, or db_obj's if not given; if the order has been updated since,
+    nothing is changed and OrderVersionConflictError is raised.
+    With commit=False the change is only made in the open transaction, left to the caller.
     """
     update_data = obj_in.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_obj, field, value)
-    db.add(db_obj)
+    expected_version = update_data.pop("version", None) or db_obj.version
+    if not update_data:
+        return db_obj
+    old_status = db_obj.order_status
+    if "order_status" in update_data:
+        check_transition(old_status, update_data["order_status"])
+
+    row = db.execute(
+        update(Order)
+        .where(Order.id == db_obj.id, Order.version == expected_version)
+        .values(**update_data, version=Order.version + 1)
+        .returning(Order.version, Order.updated_at)
+        .execution_options(synchronize_session=False)
+    ).one_or_none()
+    if row is None:
+        raise OrderVersionConflictError(db_obj.id, expected_version)
+    for field, value in dict(update_data, version=row.version, updated_at=row.updated_at).items():
+        set_committed_value(db_obj, field, value)
+
+    was_completed = old_status == crud_team_volume.ORDER_STATUS_COMPLETED
+    is_completed = db_obj.order_status == crud_team_volume.ORDER_STATUS_COMPLETED
+    if is_completed != was_completed:
+        # Keep the team volume rollup in the same transaction as the status change
+        crud_team_volume.add_orders(db, order_ids=[db_obj.id], sign=1 if is_completed else -1)
+    if not commit:
+        return db_obj
     db.commit()
     db.refresh(db_obj)
     return db_obj
@@ -101,6 +192,30 @@ def get_order_by_stripe_payment_intent(
         .first()
     )
 
+def get_completed_orders_after(db: Session, *, after_id: int, last_id: Optional[int] = None, limit: int = 500) -> List[Order]:
+    """
+    The next `limit` COMPLETED orders with after_id < id <= last_id, by id, with
+    product_package and reseller eagerly loaded. Pass the last id returned as after_id
+    to stream every completed order in chunks.
+    """
+    query = (
+        db.query(Order)
+        .options(
+            joinedload(Order.product_package),
+            joinedload(Order.reseller)
+        )
+        .filter(Order.id > after_id, Order.order_status == crud_team_volume.ORDER_STATUS_COMPLETED)
+    )
+    if last_id is not None:
+        query = query.filter(Order.id <= last_id)
+    return query.order_by(Order.id).limit(limit).all()
+
+def get_order_id_range(db: Session) -> Tuple[Optional[int], Optional[int]]:
+    """
+    The smallest and largest order ids, (None, None) if there are no orders.
+    """
+    return tuple(db.query(func.min(Order.id), func.max(Order.id)).one())
+
 def get_order_count_for_reseller(db: Session, *, reseller_id: int) -> int:
     """
     Get the total count of orders for a specific reseller.
@@ -112,3 +227,102 @@ def get_order_count_for_customer(db: Session, *, customer_email: str) -> int:
     Get the total count of orders for a specific customer email.
     """
     return db.query(Order).filter(Order.customer_email == customer_email).count()
+
+# Orders that were never paid; expire_stale_orders cancels them after a while
+UNPAID_ORDER_STATUSES = (ORDER_STATUS_PENDING_PAYMENT, ORDER_STATUS_AWAITING_PAYMENT)
+
+def _stale_orders(created_before: datetime, statuses: Sequence[str]):
+    # Orders with a PaymentIntent are left alone: Stripe intents don't expire, and one
+    # that succeeds after its order was cancelled would charge the customer for nothing
+    return [
+        Order.order_status.in_(statuses), Order.created_at < created_before,
+        Order.stripe_payment_intent_id.is_(None),
+    ]
+
+def count_stale_orders(
+    db: Session, *, created_before: datetime, limit: int, statuses: Sequence[str] = UNPAID_ORDER_STATUSES
+) -> int:
+    """
+    The number of orders in one of `statuses` created before created_before and without
+    a PaymentIntent, counting up to `limit`: what expire_stale_orders would cancel.
+    """
+    stale_ids = select(Order.id).where(*_stale_orders(created_before, statuses)).limit(limit)
+    return db.execute(select(func.count()).select_from(stale_ids.subquery())).scalar_one()
+
+def expire_stale_orders(
+    db: Session, *, created_before: datetime, limit: int, statuses: Sequence[str] = UNPAID_ORDER_STATUSES
+) -> int:
+    """
+    Cancel up to `limit` orders in one of `statuses` created before created_before and
+    without a PaymentIntent, with one set-based UPDATE (found through ix_order_order_status_created_at), and commit.
+    Their version is bumped, like any update. Returns the number cancelled.
+    """
+    for status in statuses:
+        check_transition(status, ORDER_STATUS_CANCELLED)
+    stale = _stale_orders(created_before, statuses)
+    # The conditions are repeated on the UPDATE itself, so that an order paid since
+    # the subquery read it is left alone on databases that don't lock the rows it read
+    result = db.execute(
+        update(Order)
+        .where(Order.id.in_(select(Order.id).where(*stale).limit(limit)), *stale)
+        .values(order_status=ORDER_STATUS_CANCELLED, version=Order.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+# --- Async variants ---
+# These run the sync implementations above on an AsyncSession via run_sync, so the
+# queries go through the async driver and never block the event loop. Returned
+# objects have the relationships needed by the Order response schema loaded.
+
+async def create_order_async(db: AsyncSession, *, obj_in: OrderCreateInternal, commit: bool = True) -> Order:
+    db_obj = await db.run_sync(create_order, obj_in=obj_in, commit=commit)
+    # The Order response schema nests product_package and reseller; lazy loads are not
+    # allowed outside of run_sync, so load them explicitly here.
+    await db.refresh(db_obj, ["product_package", "reseller"])
+    return db_obj
+
+async def create_orders_async(db: AsyncSession, *, objs_in: List[OrderCreateInternal]) -> List[Order]:
+    return await db.run_sync(create_orders, objs_in=objs_in)
+
+async def insert_orders_async(db: AsyncSession, *, objs_in: List[OrderCreateInternal], commit: bool = True) -> List[int]:
+    return await db.run_sync(insert_orders, objs_in=objs_in, commit=commit)
+
+async def get_order_async(db: AsyncSession, order_id: int) -> Optional[Order]:
+    return await db.run_sync(get_order, order_id)
+
+async def get_orders_by_reseller_async(
+    db: AsyncSession, *, reseller_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> List[Order]:
+    return await db.run_sync(get_orders_by_reseller, reseller_id=reseller_id, skip=skip, limit=limit, cursor=cursor)
+
+async def get_orders_by_customer_async(
+    db: AsyncSession, *, customer_email: str, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+) -> List[Order]:
+    return await db.run_sync(get_orders_by_customer, customer_email=customer_email, skip=skip, limit=limit, cursor=cursor)
+
+async def update_order_async(db: AsyncSession, *, db_obj: Order, obj_in: OrderUpdate) -> Order:
+    return await db.run_sync(update_order, db_obj=db_obj, obj_in=obj_in)
+
+async def get_order_by_stripe_payment_intent_async(
+    db: AsyncSession, *, payment_intent_id: str
+) -> Optional[Order]:
+    return await db.run_sync(get_order_by_stripe_payment_intent, payment_intent_id=payment_intent_id)
+
+async def get_order_count_for_reseller_async(db: AsyncSession, *, reseller_id: int) -> int:
+    return await db.run_sync(get_order_count_for_reseller, reseller_id=reseller_id)
+
+async def get_order_count_for_customer_async(db: AsyncSession, *, customer_email: str) -> int:
+    return await db.run_sync(get_order_count_for_customer, customer_email=customer_email)
+
+async def count_stale_orders_async(
+    db: AsyncSession, *, created_before: datetime, limit: int, statuses: Sequence[str] = UNPAID_ORDER_STATUSES
+) -> int:
+    return await db.run_sync(count_stale_orders, created_before=created_before, limit=limit, statuses=statuses)
+
+async def expire_stale_orders_async(
+    db: AsyncSession, *, created_before: datetime, limit: int, statuses: Sequence[str] = UNPAID_ORDER_STATUSES
+) -> int:
+    return await db.run_sync(expire_stale_orders, created_before=created_before, limit=limit, statuses=statuses)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.commission_outbox import CommissionOutbox
+from app.schemas.commission import CommissionOutboxEntry
+from app.utils.sql import dialect_insert
+
+# The commission outbox: orders whose commissions are to be calculated in the background
+# (see app.core.commission_outbox). Entries are claimed with a lease rather than a lock
+# held for the whole calculation, so an entry claimed by a process that then dies is
+# picked up again once its lease runs out.
+# None of these commit unless told to: enqueue belongs in the caller's transaction.
+
+def enqueue_commission_calculation(db: Session, *, order_id: int) -> None:
+    """
+    Queue the calculation of an order's commissions, in the caller's transaction.
+    An order already queued is left as is.
+    """
+    stmt = dialect_insert(db, CommissionOutbox)
+    values = dict(order_id=order_id, attempts=0, available_at=datetime.utcnow())
+    if stmt is None:
+        if db.query(CommissionOutbox.id).filter(CommissionOutbox.order_id == order_id).first() is None:
+            db.execute(insert(CommissionOutbox).values(**values))
+        return
+    db.execute(stmt.values(**values).on_conflict_do_nothing(index_elements=["order_id"]))
+
+def _due(now: datetime):
+    return (
+        CommissionOutbox.available_at <= now,
+        or_(CommissionOutbox.locked_until.is_(None), CommissionOutbox.locked_until < now),
+    )
+
+def claim_due_entries(
+    db: Session, *, limit: int, lease_seconds: int, now: Optional[datetime] = None
+) -> List[CommissionOutboxEntry]:
+    """
+    Lease up to `limit` due entries, oldest first, for lease_seconds, counting an attempt
+    on each, and commit. An entry is due once its available_at has passed and it is not
+    leased. Concurrent claimers (other processes) never get the same entry.
+    """
+    now = now or datetime.utcnow()
+    due_ids = (
+        select(CommissionOutbox.id)
+        .where(*_due(now))
+        .order_by(CommissionOutbox.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True) # PostgreSQL; SQLite serializes writers anyway
+    )
+    rows = db.execute(
+        update(CommissionOutbox)
+        .where(CommissionOutbox.id.in_(due_ids), *_due(now)) # Re-checked: the UPDATE is atomic, the subquery alone is not
+        .values(locked_until=now + timedelta(seconds=lease_seconds), attempts=CommissionOutbox.attempts + 1)
+        .returning(CommissionOutbox.id, CommissionOutbox.order_id, CommissionOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted((CommissionOutboxEntry.model_validate(row) for row in rows), key=lambda entry: entry.id)
+
+def complete_entry(db: Session, *, entry_id: int, commit: bool = True) -> None:
+    """
+    Remove a processed entry.
+    """
+    db.execute(delete(CommissionOutbox).where(CommissionOutbox.id == entry_id).execution_options(synchronize_session=False))
+    if commit:
+        db.commit()
+
+def fail_entry(db: Session, *, entry_id: int, error: str, retry_at: Optional[datetime], commit: bool = True) -> None:
+    """
+    Release a failed entry for another attempt at retry_at, or park it (retry_at=None)
+    until someone looks into last_error and re-queues it.
+    """
+    db.execute(
+        update(CommissionOutbox)
+        .where(CommissionOutbox.id == entry_id)
+        .values(locked_until=None, available_at=retry_at, last_error=error)
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        db.commit()
+
+def get_pending_count(db: Session) -> int:
+    """
+    Entries not yet processed, parked ones included.
+    """
+    return db.query(CommissionOutbox).count()
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def claim_due_entries_async(
+    db: AsyncSession, *, limit: int, lease_seconds: int, now: Optional[datetime] = None
+) -> List[CommissionOutboxEntry]:
+    return await db.run_sync(claim_due_entries, limit=limit, lease_seconds=lease_seconds, now=now)
+
+async def complete_entry_async(db: AsyncSession, *, entry_id: int, commit: bool = True) -> None:
+    return await db.run_sync(complete_entry, entry_id=entry_id, commit=commit)
+
+async def fail_entry_async(db: AsyncSession, *, entry_id: int, error: str, retry_at: Optional[datetime], commit: bool = True) -> None:
+    return await db.run_sync(fail_entry, entry_id=entry_id, error=error, retry_at=retry_at, commit=commit)
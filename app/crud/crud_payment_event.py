@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.payment_event import PaymentWebhookEvent, ProcessedPaymentEvent
+from app.schemas.payment import PaymentWebhookEventEntry
+from app.utils.sql import dialect_insert
+
+# Stripe webhook events waiting to be processed (see app.core.payment_webhooks).
+# Claimed with a lease like the commission outbox (crud_outbox), so an event claimed
+# by a process that then dies is picked up again once its lease runs out.
+# Processed events are recorded by id in processed_payment_event, which is how
+# redeliveries are recognised once their pending row is gone.
+
+def store_event(db: Session, *, event_id: str, event_type: str, payload: str) -> bool:
+    """
+    Store a verified event for processing and commit. Returns False if an event with
+    this id is already waiting or was processed (a redelivery), which is then left as is.
+    """
+    if is_processed(db, event_id=event_id):
+        return False
+    values = dict(event_id=event_id, event_type=event_type, payload=payload, attempts=0, available_at=datetime.utcnow())
+    stmt = dialect_insert(db, PaymentWebhookEvent)
+    if stmt is None:
+        if db.query(PaymentWebhookEvent.id).filter(PaymentWebhookEvent.event_id == event_id).first() is not None:
+            return False
+        db.execute(insert(PaymentWebhookEvent).values(**values))
+        stored = True
+    else:
+        result = db.execute(stmt.values(**values).on_conflict_do_nothing(index_elements=["event_id"]))
+        stored = result.rowcount == 1
+    db.commit()
+    return stored
+
+def is_processed(db: Session, *, event_id: str) -> bool:
+    """
+    Whether the event with this id was already processed (a primary key lookup).
+    """
+    return db.query(ProcessedPaymentEvent.event_id).filter(ProcessedPaymentEvent.event_id == event_id).first() is not None
+
+def _due(now: datetime):
+    return (
+        PaymentWebhookEvent.available_at <= now,
+        or_(PaymentWebhookEvent.locked_until.is_(None), PaymentWebhookEvent.locked_until < now),
+    )
+
+def claim_due_events(
+    db: Session, *, limit: int, lease_seconds: int, now: Optional[datetime] = None
+) -> List[PaymentWebhookEventEntry]:
+    """
+    Lease up to `limit` due events, oldest first, for lease_seconds, counting an attempt
+    on each, and commit. Concurrent claimers (other processes) never get the same event.
+    """
+    now = now or datetime.utcnow()
+    due_ids = (
+        select(PaymentWebhookEvent.id)
+        .where(*_due(now))
+        .order_by(PaymentWebhookEvent.available_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True) # PostgreSQL; SQLite serializes writers anyway
+    )
+    rows = db.execute(
+        update(PaymentWebhookEvent)
+        .where(PaymentWebhookEvent.id.in_(due_ids), *_due(now)) # Re-checked: the UPDATE is atomic, the subquery alone is not
+        .values(locked_until=now + timedelta(seconds=lease_seconds), attempts=PaymentWebhookEvent.attempts + 1)
+        .returning(
+            PaymentWebhookEvent.id, PaymentWebhookEvent.event_id, PaymentWebhookEvent.event_type,
+            PaymentWebhookEvent.payload, PaymentWebhookEvent.attempts,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    # Oldest first: Stripe events of one payment are applied in the order received
+    return sorted((PaymentWebhookEventEntry.model_validate(row) for row in rows), key=lambda entry: entry.id)
+
+def complete_event(db: Session, *, entry: PaymentWebhookEventEntry, commit: bool = True) -> None:
+    """
+    Remove a processed event, recording its id as processed.
+    """
+    db.execute(delete(PaymentWebhookEvent).where(PaymentWebhookEvent.id == entry.id).execution_options(synchronize_session=False))
+    values = dict(event_id=entry.event_id, event_type=entry.event_type, processed_at=datetime.utcnow())
+    stmt = dialect_insert(db, ProcessedPaymentEvent)
+    if stmt is None:
+        if not is_processed(db, event_id=entry.event_id):
+            db.execute(insert(ProcessedPaymentEvent).values(**values))
+    else:
+        db.execute(stmt.values(**values).on_conflict_do_nothing(index_elements=["event_id"]))
+    if commit:
+        db.commit()
+
+def fail_event(db: Session, *, entry_id: int, error: str, retry_at: Optional[datetime], commit: bool = True) -> None:
+    """
+    Release a failed event for another attempt at retry_at, or park it (retry_at=None)
+    until someone looks into last_error and re-queues it.
+    """
+    db.execute(
+        update(PaymentWebhookEvent)
+        .where(PaymentWebhookEvent.id == entry_id)
+        .values(locked_until=None, available_at=retry_at, last_error=error)
+        .execution_options(synchronize_session=False)
+    )
+    if commit:
+        db.commit()
+
+def purge_processed_events(db: Session, *, before: datetime) -> int:
+    """
+    Forget the ids of events processed before `before`, once Stripe no longer redelivers
+    them (it retries for up to three days), and commit. Returns the number removed.
+    """
+    result = db.execute(
+        delete(ProcessedPaymentEvent).where(ProcessedPaymentEvent.processed_at < before).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+def get_pending_count(db: Session) -> int:
+    """
+    Events not yet processed, parked ones included.
+    """
+    return db.query(PaymentWebhookEvent).count()
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def store_event_async(db: AsyncSession, *, event_id: str, event_type: str, payload: str) -> bool:
+    return await db.run_sync(store_event, event_id=event_id, event_type=event_type, payload=payload)
+
+async def is_processed_async(db: AsyncSession, *, event_id: str) -> bool:
+    return await db.run_sync(is_processed, event_id=event_id)
+
+async def claim_due_events_async(
+    db: AsyncSession, *, limit: int, lease_seconds: int, now: Optional[datetime] = None
+) -> List[PaymentWebhookEventEntry]:
+    return await db.run_sync(claim_due_events, limit=limit, lease_seconds=lease_seconds, now=now)
+
+async def complete_event_async(db: AsyncSession, *, entry: PaymentWebhookEventEntry, commit: bool = True) -> None:
+    return await db.run_sync(complete_event, entry=entry, commit=commit)
+
+async def fail_event_async(db: AsyncSession, *, entry_id: int, error: str, retry_at: Optional[datetime], commit: bool = True) -> None:
+    return await db.run_sync(fail_event, entry_id=entry_id, error=error, retry_at=retry_at, commit=commit)
+
+async def purge_processed_events_async(db: AsyncSession, *, before: datetime) -> int:
+    return await db.run_sync(purge_processed_events, before=before)
@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional, List
 
 from app.models.product import ProductPackage
 from app.schemas.product import ProductPackageCreate, ProductPackageUpdate
+from app.schemas.product import ProductPackage as ProductPackageSchema
+from app.core.catalog_cache import catalog_cache
+from app.core.commission_rules import commission_rules_cache
 
 def get_product(db: Session, product_id: int, *, show_inactive: bool = False) -> Optional[ProductPackage]:
     """
@@ -16,6 +20,19 @@ def get_product(db: Session, product_id: int, *, show_inactive: bool = False) ->
     print(f"[CRUD get_product] ID: {product_id}, show_inactive: {show_inactive}, Found: {'Yes' if result else 'No'}, Active in DB: {result.is_active if result else 'N/A'}")
     return result
 
+def get_products_by_ids(db: Session, *, product_ids: Iterable[int], show_inactive: bool = False) -> Dict[int, ProductPackage]:
+    """
+    Product packages by id, with one query for all of them. Ids not found (or not
+    active, unless show_inactive) are missing from the result.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    query = db.query(ProductPackage).filter(ProductPackage.id.in_(product_ids))
+    if not show_inactive:
+        query = query.filter(ProductPackage.is_active == True)
+    return {product.id: product for product in query}
+
 def get_products_by_country(
     db: Session, *, country_code: str, is_active: bool = True, skip: int = 0, limit: int = 100
 ) -> List[ProductPackage]:
@@ -49,6 +66,7 @@ def create_product(db: Session, *, obj_in: ProductPackageCreate) -> ProductPacka
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    catalog_cache.product_saved(ProductPackageSchema.model_validate(db_obj))
     return db_obj
 
 def update_product(
@@ -59,6 +77,7 @@ def update_product(
     """
     # Pydantic V2 uses model_dump(exclude_unset=True) for partial updates
     update_data = obj_in.model_dump(exclude_unset=True)
+    previous_country_code = db_obj.country_code
 
     for field, value in update_data.items():
         setattr(db_obj, field, value)
@@ -66,6 +85,8 @@ def update_product(
     db.add(db_obj)
     db.commit()
     db.refresh(db_obj)
+    catalog_cache.product_saved(ProductPackageSchema.model_validate(db_obj), previous_country_code)
+    commission_rules_cache.invalidate(db_obj.id)
     return db_obj
 
 def delete_product(db: Session, *, product_id: int) -> Optional[ProductPackage]:
@@ -80,6 +101,7 @@ def delete_product(db: Session, *, product_id: int) -> Optional[ProductPackage]:
             db.add(db_obj)
             db.commit()
             db.refresh(db_obj)
+            catalog_cache.product_saved(ProductPackageSchema.model_validate(db_obj))
         return db_obj # Return object whether it was active or already inactive
     return None # Product not found
 
@@ -93,6 +115,8 @@ def hard_delete_product(db: Session, *, product_id: int) -> Optional[ProductPack
     if db_obj:
         db.delete(db_obj)
         db.commit()
+        catalog_cache.product_deleted(product_id, db_obj.country_code)
+        commission_rules_cache.invalidate(product_id)
         return db_obj
     return None
 
@@ -105,3 +129,94 @@ def get_distinct_active_countries(db: Session) -> List[str]:
               .distinct()\
               .order_by(ProductPackage.country_code)
     return [row[0] for row in query.all()]
+
+
+# --- Cached catalog reads ---
+# Served from app.core.catalog_cache, going to the database only on a miss. These
+# return ProductPackage schema snapshots rather than ORM objects: use them for read
+# paths, and get_product when the object is to be modified.
+
+def _load_product_snapshot(db: Session, product_id: int) -> Optional[ProductPackageSchema]:
+    generation = catalog_cache.generation
+    db_obj = get_product(db, product_id, show_inactive=True)
+    if db_obj is None:
+        return None
+    product = ProductPackageSchema.model_validate(db_obj)
+    catalog_cache.put_product(product, generation)
+    return product
+
+def _visible(product: Optional[ProductPackageSchema], show_inactive: bool) -> Optional[ProductPackageSchema]:
+    if product is None or (not show_inactive and not product.is_active):
+        return None
+    return product
+
+def get_product_cached(db: Session, product_id: int, *, show_inactive: bool = False) -> Optional[ProductPackageSchema]:
+    """
+    Cached get_product. Only active products are returned unless show_inactive is True.
+    """
+    product = catalog_cache.get_product(product_id)
+    if product is None:
+        product = _load_product_snapshot(db, product_id)
+    return _visible(product, show_inactive)
+
+def get_active_products_by_country_cached(
+    db: Session, *, country_code: str, skip: int = 0, limit: int = 100
+) -> List[ProductPackageSchema]:
+    """
+    Cached get_products_by_country for active products, sorted by name.
+    The whole country list is cached and paged in memory.
+    """
+    products = catalog_cache.get_country(country_code)
+    if products is None:
+        generation = catalog_cache.generation
+        db_objs = get_products_by_country(db, country_code=country_code, is_active=True, limit=catalog_cache.max_size + 1)
+        if len(db_objs) > catalog_cache.max_size:
+            # Too large to cache (put_country would refuse it): page in the database
+            db_objs = get_products_by_country(db, country_code=country_code, is_active=True, skip=skip, limit=limit)
+            return [ProductPackageSchema.model_validate(obj) for obj in db_objs]
+        products = [ProductPackageSchema.model_validate(obj) for obj in db_objs]
+        catalog_cache.put_country(country_code, products, generation)
+    return products[skip:skip + limit]
+
+def get_distinct_active_countries_cached(db: Session) -> List[str]:
+    """
+    Cached get_distinct_active_countries.
+    """
+    countries = catalog_cache.get_active_countries()
+    if countries is None:
+        generation = catalog_cache.generation
+        countries = get_distinct_active_countries(db)
+        catalog_cache.put_active_countries(countries, generation)
+    return list(countries)
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def get_product_async(db: AsyncSession, product_id: int, *, show_inactive: bool = False) -> Optional[ProductPackage]:
+    return await db.run_sync(get_product, product_id, show_inactive=show_inactive)
+
+async def get_products_by_ids_async(
+    db: AsyncSession, *, product_ids: Iterable[int], show_inactive: bool = False
+) -> Dict[int, ProductPackage]:
+    return await db.run_sync(get_products_by_ids, product_ids=product_ids, show_inactive=show_inactive)
+
+async def get_products_by_country_async(
+    db: AsyncSession, *, country_code: str, is_active: bool = True, skip: int = 0, limit: int = 100
+) -> List[ProductPackage]:
+    return await db.run_sync(get_products_by_country, country_code=country_code, is_active=is_active, skip=skip, limit=limit)
+
+async def get_all_products_async(
+    db: AsyncSession, *, is_active: Optional[bool] = None, skip: int = 0, limit: int = 100
+) -> List[ProductPackage]:
+    return await db.run_sync(get_all_products, is_active=is_active, skip=skip, limit=limit)
+
+async def get_distinct_active_countries_async(db: AsyncSession) -> List[str]:
+    return await db.run_sync(get_distinct_active_countries)
+
+async def get_product_cached_async(db: AsyncSession, product_id: int, *, show_inactive: bool = False) -> Optional[ProductPackageSchema]:
+    # A cache hit returns without touching the session at all
+    product = catalog_cache.get_product(product_id)
+    if product is None:
+        product = await db.run_sync(_load_product_snapshot, product_id)
+    return _visible(product, show_inactive)
@@ -1,18 +1,44 @@
+from sqlalchemy import delete, exists, insert, literal, select, true
+from sqlalchemy.orm import aliased
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, Optional, List
 
-from app.models.reseller import ResellerProfile
-from app.schemas.reseller import ResellerCreate, ResellerUpdate
-from app.core.security import get_password_hash
+from app.models.reseller import ResellerProfile, ResellerClosure
+from app.schemas.reseller import ResellerCreate, ResellerUpdate, UplineMember, DownlineMember, Reseller as ResellerSchema
+from app.core.security import get_password_hash, get_password_hash_async
+from app.core import auth_cache
+
+# Changes to these fields alter what a cached Principal says about the reseller
+# (or, for email, which reseller a token's "sub" resolves to).
+_PRINCIPAL_FIELDS = ("email", "is_active", "is_superuser")
+
+class RecruiterCycleError(ValueError):
+    """Raised when a recruiter change would make a reseller its own (indirect) recruiter."""
+    pass
 
 def get_reseller(db: Session, reseller_id: int) -> Optional[ResellerProfile]:
     return db.query(ResellerProfile).filter(ResellerProfile.id == reseller_id).first()
 
+def get_resellers_by_ids(db: Session, *, reseller_ids: Iterable[int]) -> Dict[int, ResellerProfile]:
+    """
+    Resellers by id, with one query for all of them. Ids not found are missing from the result.
+    """
+    reseller_ids = set(reseller_ids)
+    if not reseller_ids:
+        return {}
+    return {reseller.id: reseller for reseller in db.query(ResellerProfile).filter(ResellerProfile.id.in_(reseller_ids))}
+
 def get_reseller_by_email(db: Session, email: str) -> Optional[ResellerProfile]:
     return db.query(ResellerProfile).filter(ResellerProfile.email == email).first()
 
-def create_reseller(db: Session, *, obj_in: ResellerCreate) -> ResellerProfile:
-    hashed_password = get_password_hash(obj_in.password)
+def create_reseller(db: Session, *, obj_in: ResellerCreate, hashed_password: Optional[str] = None) -> ResellerProfile:
+    """
+    Create a reseller. hashed_password may be supplied when the hash was already
+    computed off the event loop (see create_reseller_async); otherwise it is computed here.
+    """
+    if hashed_password is None:
+        hashed_password = get_password_hash(obj_in.password)
 
     db_obj = ResellerProfile(
         email=obj_in.email,
@@ -28,16 +54,21 @@ def create_reseller(db: Session, *, obj_in: ResellerCreate) -> ResellerProfile:
         is_superuser=obj_in.is_superuser
     )
     db.add(db_obj)
+    db.flush() # Assigns db_obj.id
+    _add_to_hierarchy(db, reseller_id=db_obj.id, recruiter_id=db_obj.recruiter_id)
     db.commit()
     db.refresh(db_obj)
     return db_obj
 
-def update_reseller(db: Session, *, db_obj: ResellerProfile, obj_in: ResellerUpdate) -> ResellerProfile:
+def update_reseller(
+    db: Session, *, db_obj: ResellerProfile, obj_in: ResellerUpdate, hashed_password: Optional[str] = None
+) -> ResellerProfile:
     # Pydantic V2 uses model_dump
     update_data = obj_in.model_dump(exclude_unset=True)
 
     if "password" in update_data and update_data["password"] is not None:
-        hashed_password = get_password_hash(update_data["password"])
+        if hashed_password is None: # Not precomputed by update_reseller_async
+            hashed_password = get_password_hash(update_data["password"])
         update_data["hashed_password"] = hashed_password
         del update_data["password"]
     else:
@@ -45,13 +76,194 @@ def update_reseller(db: Session, *, db_obj: ResellerProfile, obj_in: ResellerUpd
         if "password" in update_data:
             del update_data["password"]
 
+    principal_changed = any(
+        field in update_data and update_data[field] != getattr(db_obj, field)
+        for field in _PRINCIPAL_FIELDS
+    )
+    recruiter_changed = "recruiter_id" in update_data and update_data["recruiter_id"] != db_obj.recruiter_id
+    if recruiter_changed and update_data["recruiter_id"] is not None:
+        if _is_in_downline(db, ancestor_id=db_obj.id, reseller_id=update_data["recruiter_id"]):
+            raise RecruiterCycleError(
+                f"Reseller {update_data['recruiter_id']} is in the downline of reseller {db_obj.id} and cannot recruit it"
+            )
+
     for field, value in update_data.items():
         setattr(db_obj, field, value)
 
     db.add(db_obj)
+    if recruiter_changed:
+        _move_in_hierarchy(db, reseller_id=db_obj.id, recruiter_id=db_obj.recruiter_id)
     db.commit()
     db.refresh(db_obj)
+
+    if principal_changed:
+        auth_cache.invalidate_reseller(db_obj.id)
     return db_obj
 
 def get_recruited_resellers(db: Session, *, recruiter_id: int, skip: int = 0, limit: int = 100) -> List[ResellerProfile]:
     return db.query(ResellerProfile).filter(ResellerProfile.recruiter_id == recruiter_id).offset(skip).limit(limit).all()
+
+def get_downline(
+    db: Session, *, reseller_id: int, max_depth: Optional[int] = None, skip: int = 0, limit: int = 100
+) -> List[DownlineMember]:
+    """
+    Everyone recruited directly or indirectly by a reseller, nearest levels first, optionally
+    only down to max_depth levels. One query over the reseller_closure table.
+    """
+    query = (
+        db.query(ResellerProfile, ResellerClosure.depth)
+        .join(ResellerClosure, ResellerClosure.descendant_id == ResellerProfile.id)
+        .filter(ResellerClosure.ancestor_id == reseller_id, ResellerClosure.depth >= 1)
+    )
+    if max_depth is not None:
+        query = query.filter(ResellerClosure.depth <= max_depth)
+    rows = query.order_by(ResellerClosure.depth, ResellerClosure.descendant_id).offset(skip).limit(limit).all()
+    return [
+        DownlineMember(**ResellerSchema.model_validate(reseller).model_dump(), depth=depth)
+        for reseller, depth in rows
+    ]
+
+def get_upline(db: Session, *, reseller_id: int, max_depth: int) -> List[UplineMember]:
+    """
+    The recruiter chain above a reseller, nearest first, up to max_depth levels
+    (depth 1 is the direct recruiter). Inactive members are included, flagged by is_active.
+    Fetched with one recursive CTE over recruiter_id rather than one query per level;
+    max_depth also bounds the walk should the chain contain a cycle.
+    """
+    if max_depth <= 0:
+        return []
+    first_recruiter_id = (
+        select(ResellerProfile.recruiter_id).where(ResellerProfile.id == reseller_id).scalar_subquery()
+    )
+    upline = (
+        select(
+            ResellerProfile.id,
+            ResellerProfile.recruiter_id,
+            ResellerProfile.is_active,
+            ResellerProfile.reseller_type,
+            literal(1).label("depth"),
+        )
+        .where(ResellerProfile.id == first_recruiter_id)
+        .cte("upline", recursive=True)
+    )
+    upline = upline.union_all(
+        select(
+            ResellerProfile.id,
+            ResellerProfile.recruiter_id,
+            ResellerProfile.is_active,
+            ResellerProfile.reseller_type,
+            (upline.c.depth + 1).label("depth"),
+        )
+        .join(upline, ResellerProfile.id == upline.c.recruiter_id)
+        .where(upline.c.depth < max_depth)
+    )
+    rows = db.execute(select(upline.c.id, upline.c.is_active, upline.c.reseller_type, upline.c.depth)).all()
+    # At most max_depth rows: sort here rather than have the database sort the CTE output
+    return sorted((UplineMember(id=row.id, is_active=row.is_active, reseller_type=row.reseller_type, depth=row.depth) for row in rows), key=lambda m: m.depth)
+
+
+def get_uplines(db: Session, *, reseller_ids: Iterable[int], max_depth: int) -> Dict[int, List[UplineMember]]:
+    """
+    get_upline for many resellers at once, keyed by reseller id (every id present,
+    possibly with an empty list). One query over the reseller_closure table, for batch
+    jobs that would otherwise walk one chain per reseller.
+    """
+    reseller_ids = list(dict.fromkeys(reseller_ids))
+    uplines: Dict[int, List[UplineMember]] = {reseller_id: [] for reseller_id in reseller_ids}
+    if max_depth <= 0 or not reseller_ids:
+        return uplines
+    rows = db.execute(
+        select(
+            ResellerClosure.descendant_id, ResellerProfile.id, ResellerProfile.is_active, ResellerProfile.reseller_type,
+            ResellerClosure.depth,
+        )
+        .join(ResellerProfile, ResellerProfile.id == ResellerClosure.ancestor_id)
+        .where(
+            ResellerClosure.descendant_id.in_(reseller_ids),
+            ResellerClosure.depth >= 1,
+            ResellerClosure.depth <= max_depth,
+        )
+    ).all()
+    for row in sorted(rows, key=lambda row: row.depth):
+        uplines[row.descendant_id].append(UplineMember(id=row.id, is_active=row.is_active, reseller_type=row.reseller_type, depth=row.depth))
+    return uplines
+
+# --- Hierarchy (reseller_closure) maintenance ---
+# Called inside create_reseller/update_reseller, before their commit, so the closure rows
+# always change in the same transaction as recruiter_id.
+
+def _add_to_hierarchy(db: Session, *, reseller_id: int, recruiter_id: Optional[int]) -> None:
+    # A new reseller has no downline: its own row plus one row per ancestor of its recruiter
+    db.execute(insert(ResellerClosure).values(ancestor_id=reseller_id, descendant_id=reseller_id, depth=0))
+    if recruiter_id is not None:
+        db.execute(
+            insert(ResellerClosure).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(ResellerClosure.ancestor_id, literal(reseller_id), ResellerClosure.depth + 1)
+                .where(ResellerClosure.descendant_id == recruiter_id),
+            )
+        )
+
+def _is_in_downline(db: Session, *, ancestor_id: int, reseller_id: int) -> bool:
+    # True for ancestor_id itself too (its depth 0 row)
+    return db.query(
+        exists().where(ResellerClosure.ancestor_id == ancestor_id, ResellerClosure.descendant_id == reseller_id)
+    ).scalar()
+
+def _move_in_hierarchy(db: Session, *, reseller_id: int, recruiter_id: Optional[int]) -> None:
+    # Detach the reseller's subtree from its old ancestors...
+    subtree = select(ResellerClosure.descendant_id).where(ResellerClosure.ancestor_id == reseller_id)
+    db.execute(
+        delete(ResellerClosure)
+        .where(ResellerClosure.descendant_id.in_(subtree))
+        .where(ResellerClosure.ancestor_id.not_in(subtree))
+        .execution_options(synchronize_session=False)
+    )
+    if recruiter_id is None:
+        return
+    # ...and link every member of it to every ancestor of the new recruiter (itself included)
+    above, below = aliased(ResellerClosure), aliased(ResellerClosure)
+    db.execute(
+        insert(ResellerClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+            .select_from(above)
+            .join(below, true()) # Cross product of the two row sets
+            .where(above.descendant_id == recruiter_id, below.ancestor_id == reseller_id),
+        )
+    )
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def get_reseller_async(db: AsyncSession, reseller_id: int) -> Optional[ResellerProfile]:
+    return await db.run_sync(get_reseller, reseller_id)
+
+async def get_resellers_by_ids_async(db: AsyncSession, *, reseller_ids: Iterable[int]) -> Dict[int, ResellerProfile]:
+    return await db.run_sync(get_resellers_by_ids, reseller_ids=reseller_ids)
+
+async def get_reseller_by_email_async(db: AsyncSession, email: str) -> Optional[ResellerProfile]:
+    return await db.run_sync(get_reseller_by_email, email)
+
+async def create_reseller_async(db: AsyncSession, *, obj_in: ResellerCreate) -> ResellerProfile:
+    # Hash on the password hashing pool rather than inside run_sync (i.e. on the event loop)
+    hashed_password = await get_password_hash_async(obj_in.password)
+    return await db.run_sync(create_reseller, obj_in=obj_in, hashed_password=hashed_password)
+
+async def update_reseller_async(db: AsyncSession, *, db_obj: ResellerProfile, obj_in: ResellerUpdate) -> ResellerProfile:
+    hashed_password = None
+    if obj_in.password is not None:
+        hashed_password = await get_password_hash_async(obj_in.password)
+    return await db.run_sync(update_reseller, db_obj=db_obj, obj_in=obj_in, hashed_password=hashed_password)
+
+async def get_recruited_resellers_async(db: AsyncSession, *, recruiter_id: int, skip: int = 0, limit: int = 100) -> List[ResellerProfile]:
+    return await db.run_sync(get_recruited_resellers, recruiter_id=recruiter_id, skip=skip, limit=limit)
+
+async def get_upline_async(db: AsyncSession, *, reseller_id: int, max_depth: int) -> List[UplineMember]:
+    return await db.run_sync(get_upline, reseller_id=reseller_id, max_depth=max_depth)
+
+async def get_downline_async(
+    db: AsyncSession, *, reseller_id: int, max_depth: Optional[int] = None, skip: int = 0, limit: int = 100
+) -> List[DownlineMember]:
+    return await db.run_sync(get_downline, reseller_id=reseller_id, max_depth=max_depth, skip=skip, limit=limit)
@@ -0,0 +1,171 @@
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import func, literal, select, delete, insert, true, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.commission import Commission
+from app.models.order import Order
+from app.models.reseller import ResellerClosure
+from app.models.sales_rollup import ResellerSalesRollup
+from app.schemas.team_volume import TeamVolumeRow
+from app.utils.sql import dialect_insert, month_start
+
+# Team volume: sales and commission totals over a reseller's downline.
+# Reads join the reseller_closure table (whole downline in one index range) to the
+# reseller_sales_rollup table (one row per reseller, month and currency), so their cost
+# depends on team size times months, not on the number of orders or commissions.
+# The rollup is maintained incrementally, in the caller's transaction:
+# - crud_order.create_order/update_order call add_orders when an order enters or leaves COMPLETED
+# - crud_commission.create_commissions/delete_commissions call add_commissions for the rows they insert/delete
+# rebuild_sales_rollup recomputes it from scratch.
+
+ORDER_STATUS_COMPLETED = "COMPLETED"
+
+_KEY_COLUMNS = ["reseller_id", "period_start", "currency"]
+_TOTAL_COLUMNS = ["order_count", "revenue", "commission_total"]
+
+def _add_to_rollup(db: Session, rows) -> None:
+    # rows: a SELECT of (reseller_id, period_start, currency, order_count, revenue, commission_total),
+    # added onto the existing rollup rows (created when missing) with one INSERT ... ON CONFLICT DO UPDATE.
+    # SQLite needs the SELECT of an upserting INSERT to have a WHERE clause; all callers filter.
+    stmt = dialect_insert(db, ResellerSalesRollup)
+    if stmt is None:
+        _add_to_rollup_row_by_row(db, rows)
+        return
+    stmt = stmt.from_select(_KEY_COLUMNS + _TOTAL_COLUMNS, rows)
+    table = ResellerSalesRollup.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=_KEY_COLUMNS,
+        set_={column: table.c[column] + stmt.excluded[column] for column in _TOTAL_COLUMNS},
+    )
+    db.execute(stmt)
+
+def _add_to_rollup_row_by_row(db: Session, rows) -> None:
+    # Dialects without ON CONFLICT: add onto each existing rollup row, insert the missing ones.
+    # A concurrent transaction inserting the same new row makes this one fail on the primary key.
+    table = ResellerSalesRollup.__table__
+    for row in db.execute(rows).all():
+        key = dict(zip(_KEY_COLUMNS, row[:len(_KEY_COLUMNS)]))
+        totals = dict(zip(_TOTAL_COLUMNS, row[len(_KEY_COLUMNS):]))
+        result = db.execute(
+            update(table)
+            .where(*(table.c[column] == value for column, value in key.items()))
+            .values({column: table.c[column] + value for column, value in totals.items()})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(**key, **totals))
+
+def _order_rows(db: Session, *where, sign: int = 1):
+    period = month_start(db, Order.created_at)
+    return (
+        select(
+            Order.reseller_id, period, Order.currency_paid,
+            func.count(Order.id) * sign, func.sum(Order.price_paid) * sign, literal(0),
+        )
+        .where(*where)
+        .group_by(Order.reseller_id, period, Order.currency_paid)
+    )
+
+def _commission_rows(db: Session, *where, sign: int = 1):
+    period = month_start(db, Order.created_at)
+    return (
+        select(
+            Commission.reseller_id, period, Commission.currency,
+            literal(0), literal(0), func.sum(Commission.amount) * sign,
+        )
+        .join(Order, Order.id == Commission.order_id)
+        .where(*where)
+        .group_by(Commission.reseller_id, period, Commission.currency)
+    )
+
+def add_orders(db: Session, *, order_ids: List[int], sign: int = 1) -> None:
+    """
+    Count the given orders into (sign=1) or out of (sign=-1) their sellers' sales totals.
+    """
+    if order_ids:
+        _add_to_rollup(db, _order_rows(db, Order.id.in_(order_ids), sign=sign))
+
+def add_commissions(db: Session, *, commission_ids: List[int], sign: int = 1) -> None:
+    """
+    Add the given, newly recorded, commissions to (sign=1) or take commissions about to be
+    deleted out of (sign=-1) their earners' commission totals.
+    """
+    if commission_ids:
+        _add_to_rollup(db, _commission_rows(db, Commission.id.in_(commission_ids), sign=sign))
+
+def rebuild_sales_rollup(db: Session) -> None:
+    """
+    Recompute the whole rollup from the order and commission tables, in one transaction.
+    """
+    db.execute(delete(ResellerSalesRollup))
+    _add_to_rollup(db, _order_rows(db, Order.order_status == ORDER_STATUS_COMPLETED))
+    _add_to_rollup(db, _commission_rows(db, true()))
+    db.commit()
+
+def get_team_volume(
+    db: Session,
+    *,
+    reseller_id: int,
+    max_depth: Optional[int] = None,
+    include_self: bool = True,
+    period_from: Optional[date] = None,
+    period_to: Optional[date] = None,
+    by_depth: bool = True,
+    by_period: bool = True,
+) -> List[TeamVolumeRow]:
+    """
+    Order count, revenue and commissions of a reseller's team (its downline, down to
+    max_depth levels, plus itself unless include_self is False), per currency and
+    optionally per depth and/or month. period_from/period_to bound the months, inclusive.
+    """
+    rollup = ResellerSalesRollup
+    group_columns = []
+    if by_depth:
+        group_columns.append(ResellerClosure.depth)
+    if by_period:
+        group_columns.append(rollup.period_start)
+    group_columns.append(rollup.currency)
+
+    query = (
+        select(
+            *group_columns,
+            func.sum(rollup.order_count).label("order_count"),
+            func.sum(rollup.revenue).label("revenue"),
+            func.sum(rollup.commission_total).label("commission_total"),
+        )
+        .select_from(ResellerClosure)
+        .join(rollup, rollup.reseller_id == ResellerClosure.descendant_id)
+        .where(ResellerClosure.ancestor_id == reseller_id)
+    )
+    if not include_self:
+        query = query.where(ResellerClosure.depth >= 1)
+    if max_depth is not None:
+        query = query.where(ResellerClosure.depth <= max_depth)
+    if period_from is not None:
+        query = query.where(rollup.period_start >= period_from.replace(day=1))
+    if period_to is not None:
+        query = query.where(rollup.period_start <= period_to)
+    rows = db.execute(query.group_by(*group_columns).order_by(*group_columns)).mappings().all()
+    return [TeamVolumeRow(**row) for row in rows]
+
+
+# --- Async variants ---
+# Run the sync implementations above on an AsyncSession via run_sync (see crud_order).
+
+async def get_team_volume_async(
+    db: AsyncSession,
+    *,
+    reseller_id: int,
+    max_depth: Optional[int] = None,
+    include_self: bool = True,
+    period_from: Optional[date] = None,
+    period_to: Optional[date] = None,
+    by_depth: bool = True,
+    by_period: bool = True,
+) -> List[TeamVolumeRow]:
+    return await db.run_sync(
+        get_team_volume, reseller_id=reseller_id, max_depth=max_depth, include_self=include_self,
+        period_from=period_from, period_to=period_to, by_depth=by_depth, by_period=by_period,
+    )
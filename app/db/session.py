@@ -1,15 +1,55 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.core import config
 from app.core.config import SQLALCHEMY_DATABASE_URI
 
 # Determine if we are using SQLite
 is_sqlite = SQLALCHEMY_DATABASE_URI.startswith("sqlite")
+is_sqlite_memory = is_sqlite and (":memory:" in SQLALCHEMY_DATABASE_URI or SQLALCHEMY_DATABASE_URI.rstrip("/") == "sqlite:")
 
 connect_args = {}
+engine_kwargs = {"pool_pre_ping": True}
 if is_sqlite:
     connect_args = {"check_same_thread": False}
+    if config.SQLITE_TUNING_ENABLED and not is_sqlite_memory:
+        # Local file: no network hop to ping through, and connections are worth keeping.
+        engine_kwargs = {"pool_size": config.SQLITE_POOL_SIZE, "max_overflow": config.SQLITE_MAX_OVERFLOW}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URI, pool_pre_ping=True, connect_args=connect_args)
+
+def sqlite_pragmas() -> dict:
+    """
+    The SQLite tuning profile from config, as PRAGMA name -> value, in the order applied.
+    """
+    return {
+        "journal_mode": config.SQLITE_JOURNAL_MODE,
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "cache_size": config.SQLITE_CACHE_SIZE,
+        "temp_store": config.SQLITE_TEMP_STORE,
+    }
+
+def install_sqlite_pragmas(target_engine: Engine) -> None:
+    """
+    Apply sqlite_pragmas() to every new DBAPI connection of target_engine.
+    For an AsyncEngine pass its .sync_engine; the aiosqlite adapter runs the cursor
+    calls through the async driver.
+    """
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(target_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URI, connect_args=connect_args, **engine_kwargs)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
@@ -18,3 +58,32 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def to_async_database_uri(uri: str) -> str:
+    """
+    Map a sync SQLAlchemy URL onto its asyncio driver:
+    sqlite -> sqlite+aiosqlite, postgresql/psycopg2 -> postgresql+asyncpg.
+    URLs that already name a driver other than the sync defaults are left untouched.
+    """
+    scheme, sep, rest = uri.partition("://")
+    if scheme == "sqlite":
+        scheme = "sqlite+aiosqlite"
+    elif scheme in ("postgresql", "postgresql+psycopg2", "postgres"):
+        scheme = "postgresql+asyncpg"
+    return f"{scheme}{sep}{rest}"
+
+ASYNC_SQLALCHEMY_DATABASE_URI = to_async_database_uri(SQLALCHEMY_DATABASE_URI)
+
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URI, connect_args=connect_args, **engine_kwargs)
+# expire_on_commit=False: attributes must stay loaded after commit, since
+# lazy refreshes cannot be emitted implicitly outside of an awaited call.
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+if is_sqlite and config.SQLITE_TUNING_ENABLED:
+    install_sqlite_pragmas(engine)
+    install_sqlite_pragmas(async_engine.sync_engine)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -3,8 +3,9 @@ from fastapi.staticfiles import StaticFiles
 from fastapi import FastAPI, Request, Query # Query might be needed if error_message was a Query param, but it's a path param here. No, it's a query param.
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse # Import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse # Import HTMLResponse
 from typing import Optional # Import Optional
+from contextlib import asynccontextmanager
 
 from app.api.endpoints import resellers as resellers_api
 from app.api.endpoints import auth as auth_api
@@ -12,10 +13,55 @@ from app.api.endpoints import products as products_api
 from app.api.endpoints import orders as orders_api
 from app.api.endpoints import payments as payments_api
 from app.core.config import STRIPE_PUBLISHABLE_KEY # Import Stripe key
+from app.core import config, metrics
+from app.core.commission_outbox import commission_outbox_worker
+from app.core.payment_webhooks import payment_webhook_worker, processed_payment_event_purge
+from app.core.order_writer import order_writer
+from app.core.order_sweeper import order_sweeper
+from app.core.security import PasswordHashingBusyError, shutdown_password_hashing_pool
+from app.core.idempotency import IdempotencyKeyMismatchError, idempotency_key_purge
+from app.core.order_status import InvalidOrderStatusTransitionError
+from app.utils.pagination import InvalidCursorError
+from app.crud.crud_reseller import RecruiterCycleError
+from app.crud.crud_order import OrderVersionConflictError
+import asyncio
 import datetime
 import logging
 
-app = FastAPI(title="RoamStop API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background commission calculation (app/core/commission_outbox.py), one worker per process
+    if config.COMMISSION_OUTBOX_WORKER_ENABLED:
+        await commission_outbox_worker.start()
+    # Stripe webhook events stored by /api/v1/payments/webhook (app/core/payment_webhooks.py)
+    if config.PAYMENT_WEBHOOK_WORKER_ENABLED:
+        await payment_webhook_worker.start()
+    # Batched order inserts (app/core/order_writer.py), off unless enabled
+    if config.ORDER_WRITE_COALESCING_ENABLED:
+        await order_writer.start()
+    # Cancelling orders left unpaid (app/core/order_sweeper.py), off unless enabled
+    if config.ORDER_SWEEPER_ENABLED:
+        await order_sweeper.start()
+    # Deleting expired Idempotency-Keys (app/core/idempotency.py)
+    if config.IDEMPOTENCY_KEY_PURGE_ENABLED:
+        await idempotency_key_purge.start()
+    # Forgetting webhook event ids Stripe no longer redelivers (app/core/payment_webhooks.py)
+    if config.PROCESSED_PAYMENT_EVENT_PURGE_ENABLED:
+        await processed_payment_event_purge.start()
+    try:
+        yield
+    finally:
+        await processed_payment_event_purge.stop()
+        await idempotency_key_purge.stop()
+        await order_sweeper.stop()
+        await order_writer.stop()
+        await payment_webhook_worker.stop()
+        await commission_outbox_worker.stop()
+        await payments_api.payments_client.aclose()
+        # Waits for hashes in progress, so off the event loop
+        await asyncio.to_thread(shutdown_password_hashing_pool)
+
+app = FastAPI(title="RoamStop API", version="0.1.0", lifespan=lifespan)
 
 # Basic logging configuration
 logging.basicConfig(level=logging.INFO)
@@ -34,10 +80,47 @@ app.include_router(products_api.router, prefix="/api/v1/products", tags=["Produc
 app.include_router(orders_api.router, prefix="/api/v1/orders", tags=["Orders"])
 app.include_router(payments_api.router, prefix="/api/v1/payments", tags=["Payments"]) # Include payments router
 
+@app.exception_handler(PasswordHashingBusyError)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusyError):
+    # The password hashing pool and its queue are full: shed load rather than queue further
+    metrics.inc("password_hashing_rejected_total")
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Authentication service is busy, please retry shortly."},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(InvalidCursorError)
+async def invalid_cursor_handler(request: Request, exc: InvalidCursorError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+@app.exception_handler(IdempotencyKeyMismatchError)
+async def idempotency_key_mismatch_handler(request: Request, exc: IdempotencyKeyMismatchError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+@app.exception_handler(InvalidOrderStatusTransitionError)
+async def invalid_order_status_transition_handler(request: Request, exc: InvalidOrderStatusTransitionError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(OrderVersionConflictError)
+async def order_version_conflict_handler(request: Request, exc: OrderVersionConflictError):
+    # Another update got there first: the client should re-read the order and decide again
+    metrics.inc("order_version_conflicts_total")
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+@app.exception_handler(RecruiterCycleError)
+async def recruiter_cycle_handler(request: Request, exc: RecruiterCycleError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 @app.get("/ping", tags=["Health Check"])
 async def ping():
     return {"message": "pong"}
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Health Check"])
+async def read_metrics():
+    # In-process counters (cache hits/misses etc.) in Prometheus text format
+    return metrics.render_prometheus()
+
 # Simple test endpoint for rendering index.html
 @app.get("/", response_class=HTMLResponse, tags=["Frontend"])
 async def read_root(request: Request):
@@ -1,14 +1,25 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
+# An order pays a given reseller at most one commission of each type
+COMMISSION_UNIQUE_COLUMNS = ("order_id", "reseller_id", "commission_type")
+
 class Commission(Base):
     __tablename__ = "commission"
+    __table_args__ = (
+        Index("uq_commission_order_id_reseller_id_commission_type", *COMMISSION_UNIQUE_COLUMNS, unique=True),
+        # A reseller's commissions, optionally filtered by status, newest first
+        Index("ix_commission_reseller_id_created_at", "reseller_id", "created_at", "id"),
+        Index("ix_commission_reseller_id_status_created_at", "reseller_id", "commission_status", "created_at", "id"),
+        # Covers the per-status/currency totals (crud_commission.get_commission_totals_by_reseller)
+        Index("ix_commission_reseller_id_status_currency_amount", "reseller_id", "commission_status", "currency", "amount"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    order_id = Column(Integer, ForeignKey("order.id"), nullable=False, index=True)
-    reseller_id = Column(Integer, ForeignKey("reseller_profile.id"), nullable=False, index=True) # Reseller who earned this commission
+    order_id = Column(Integer, ForeignKey("order.id"), nullable=False) # Indexed via the unique index above
+    reseller_id = Column(Integer, ForeignKey("reseller_profile.id"), nullable=False) # Reseller who earned this commission; indexed via the composites below
 
     commission_type = Column(String(50), nullable=False, index=True) # E.g., "DIRECT_SALE", "RECRUITMENT_TIER_1"
     amount = Column(Numeric(10, 2), nullable=False) # Calculated commission amount
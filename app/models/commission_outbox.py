@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class CommissionOutbox(Base):
+    """
+    Orders whose commissions are still to be calculated. A row is written in the same
+    transaction as the order's move to COMPLETED and deleted once the commissions are
+    recorded by app.core.commission_outbox's worker, so the work survives crashes and restarts.
+    """
+    __tablename__ = "commission_outbox"
+    __table_args__ = (
+        # Due entries, oldest first (crud_outbox.claim_due_entries)
+        Index("ix_commission_outbox_available_at", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(Integer, ForeignKey("order.id", ondelete="CASCADE"), nullable=False, unique=True) # One pending entry per order
+
+    attempts = Column(Integer, nullable=False, default=0) # Claims so far
+    available_at = Column(DateTime, nullable=True) # Next attempt not before; NULL once given up on (see last_error)
+    locked_until = Column(DateTime, nullable=True) # Lease of the worker processing it; free again once past
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<CommissionOutbox(id={self.id}, order_id={self.order_id}, attempts={self.attempts})>"
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class IdempotencyKey(Base):
+    """
+    The response given to a request sent with an Idempotency-Key header, so that a
+    retry of the request (same key, same caller) gets the same response without being
+    run again. Kept until expires_at (see app.core.idempotency).
+    """
+    __tablename__ = "idempotency_key"
+
+    # The caller the key belongs to, e.g. "orders:reseller:42"; keys of different callers never collide
+    scope = Column(String(100), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    fingerprint = Column(String(64), nullable=False) # SHA-256 of the request body: a key reused for another request is refused
+
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False) # JSON, as first returned
+
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True) # For purging expired keys
+
+    def __repr__(self):
+        return f"<IdempotencyKey(scope='{self.scope}', key='{self.key}', status_code={self.status_code})>"
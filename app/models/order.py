@@ -1,13 +1,20 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
 class Order(Base):
     __tablename__ = "order"
+    __table_args__ = (
+        # Listings filter by reseller or customer and page by (created_at DESC, id DESC)
+        Index("ix_order_reseller_id_created_at", "reseller_id", "created_at", "id"),
+        Index("ix_order_customer_email_created_at", "customer_email", "created_at", "id"),
+        # The sweeper's search for stale unpaid orders (order_status IN (...) AND created_at < ?)
+        Index("ix_order_order_status_created_at", "order_status", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    customer_email = Column(String(255), nullable=False, index=True)
+    customer_email = Column(String(255), nullable=False) # Indexed via ix_order_customer_email_created_at
     customer_name = Column(String(255), nullable=True)
 
     product_package_id = Column(Integer, ForeignKey("product_package.id"), nullable=False)
@@ -18,7 +25,7 @@ class Order(Base):
     duration_days_at_purchase = Column(Integer, nullable=False)
     country_code_at_purchase = Column(String(2), nullable=False)
 
-    order_status = Column(String(50), nullable=False, default="PENDING_PAYMENT", index=True)
+    order_status = Column(String(50), nullable=False, default="PENDING_PAYMENT", index=True) # Its (status, id) order serves get_completed_orders_after
     # e.g., PENDING_PAYMENT, PROCESSING, COMPLETED, FAILED_PAYMENT, FAILED_PROVISIONING, CANCELLED, REFUNDED
 
     stripe_payment_intent_id = Column(String(255), nullable=True, index=True, unique=True)
@@ -27,10 +34,15 @@ class Order(Base):
 
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Bumped by every update; updates only apply to the version they were made from (crud_order.update_order)
+    version = Column(Integer, nullable=False, server_default="1")
 
     # Relationships
     product_package = relationship("ProductPackage")
     reseller = relationship("ResellerProfile")
 
+    # ORM flushes of an Order are version-checked too
+    __mapper_args__ = {"version_id_col": version}
+
     def __repr__(self):
         return f"<Order(id={self.id}, customer_email='{self.customer_email}', product_package_id={self.product_package_id}, status='{self.order_status}')>"
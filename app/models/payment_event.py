@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.base_class import Base
+
+class PaymentWebhookEvent(Base):
+    """
+    A verified Stripe webhook event not yet processed. The webhook endpoint stores the raw
+    payload and acknowledges; app.core.payment_webhooks' worker applies the event to its
+    order and deletes the row, so events survive crashes and restarts.
+    """
+    __tablename__ = "payment_webhook_event"
+    __table_args__ = (
+        # Due events, oldest first (crud_payment_event.claim_due_events)
+        Index("ix_payment_webhook_event_available_at", "available_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    event_id = Column(String(255), nullable=False, unique=True) # Stripe's evt_...; a redelivery while pending is stored once
+    event_type = Column(String(100), nullable=False) # e.g. payment_intent.succeeded
+    payload = Column(Text, nullable=False) # The request body as signed by Stripe
+
+    attempts = Column(Integer, nullable=False, default=0) # Claims so far
+    available_at = Column(DateTime, nullable=True) # Next attempt not before; NULL once given up on (see last_error)
+    locked_until = Column(DateTime, nullable=True) # Lease of the worker processing it; free again once past
+    last_error = Column(Text, nullable=True)
+
+    received_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<PaymentWebhookEvent(id={self.id}, event_id='{self.event_id}', event_type='{self.event_type}')>"
+
+
+class ProcessedPaymentEvent(Base):
+    """
+    Stripe webhook events already applied, by event id, so that redeliveries (Stripe
+    retries for days) are recognised after their PaymentWebhookEvent row is gone.
+    Written in the same transaction that removes that row.
+    """
+    __tablename__ = "processed_payment_event"
+
+    event_id = Column(String(255), primary_key=True)
+    event_type = Column(String(100), nullable=False)
+    processed_at = Column(DateTime, server_default=func.now(), nullable=False, index=True) # For purging old ids
+
+    def __repr__(self):
+        return f"<ProcessedPaymentEvent(event_id='{self.event_id}', event_type='{self.event_type}')>"
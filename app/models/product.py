@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Numeric, ForeignKey, Index, JSON
 from sqlalchemy.sql import func
 from app.db.base_class import Base
 
 class ProductPackage(Base):
     __tablename__ = "product_package"
+    __table_args__ = (
+        # Catalog by country: active products sorted by name
+        Index("ix_product_package_country_code_is_active_name", "country_code", "is_active", "name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     name = Column(String(255), nullable=False, index=True)
@@ -13,6 +17,7 @@ class ProductPackage(Base):
     price = Column(Numeric(10, 2), nullable=False)
     direct_commission_rate_or_amount = Column(Numeric(10, 2), nullable=False)
     recruitment_commission_rate_or_amount = Column(Numeric(10, 2), nullable=False)
+    commission_rules = Column(JSON, nullable=True) # schemas.product.CommissionRules; overrides the two fields above
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
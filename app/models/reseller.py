@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, func
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, func
 from sqlalchemy.orm import relationship
 from app.db.base_class import Base # Adjusted import path
 
@@ -9,7 +9,7 @@ class ResellerProfile(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=True)
     reseller_type = Column(String, nullable=False) # e.g., "MOBILE_FIELD", "VENUE_PARTNER"
-    recruiter_id = Column(Integer, ForeignKey("reseller_profile.id"), nullable=True)
+    recruiter_id = Column(Integer, ForeignKey("reseller_profile.id"), nullable=True, index=True)
     business_name = Column(String, nullable=True)
     shipping_address = Column(String, nullable=True)
     promotion_details = Column(Text, nullable=True)
@@ -30,3 +30,26 @@ class ResellerProfile(Base):
 
     def __repr__(self):
         return f"<ResellerProfile(id={self.id}, email='{self.email}', type='{self.reseller_type}')>"
+
+
+class ResellerClosure(Base):
+    """
+    Transitive closure of the recruiter hierarchy: one row per (ancestor, descendant) pair,
+    depth being the number of recruitment steps between them, plus a (self, self, 0) row
+    per reseller. Lets a whole downline (or upline) be read with one indexed query.
+    Maintained by crud_reseller.create_reseller and update_reseller.
+    """
+    __tablename__ = "reseller_closure"
+    __table_args__ = (
+        # Downline of a reseller, nearest levels first
+        Index("ix_reseller_closure_ancestor_id_depth", "ancestor_id", "depth", "descendant_id"),
+        # Upline of a reseller; also used when moving a subtree
+        Index("ix_reseller_closure_descendant_id_depth", "descendant_id", "depth", "ancestor_id"),
+    )
+
+    ancestor_id = Column(Integer, ForeignKey("reseller_profile.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("reseller_profile.id", ondelete="CASCADE"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ResellerClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})>"
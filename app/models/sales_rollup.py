@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, ForeignKey
+from app.db.base_class import Base
+
+class ResellerSalesRollup(Base):
+    """
+    Per-reseller, per-month sales and commission totals, maintained incrementally by
+    app.crud.crud_team_volume as orders complete and commissions are recorded.
+    Months are those of the order's created_at, for both the sales and the commissions
+    paid on them. Amounts are per currency.
+    """
+    __tablename__ = "reseller_sales_rollup"
+
+    reseller_id = Column(Integer, ForeignKey("reseller_profile.id", ondelete="CASCADE"), primary_key=True)
+    period_start = Column(Date, primary_key=True) # First day of the month
+    currency = Column(String(3), primary_key=True)
+
+    order_count = Column(Integer, nullable=False, default=0) # COMPLETED orders sold by the reseller
+    revenue = Column(Numeric(14, 2), nullable=False, default=0) # Their price_paid total
+    commission_total = Column(Numeric(14, 2), nullable=False, default=0) # Commissions earned by the reseller
+
+    def __repr__(self):
+        return f"<ResellerSalesRollup(reseller_id={self.reseller_id}, period_start={self.period_start}, currency='{self.currency}')>"
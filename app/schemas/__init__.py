@@ -1,4 +1,4 @@
-from .token import Token, TokenData
+from .token import Token, TokenData, Principal
 from .reseller import (
     ResellerBase,
     ResellerCreate,
@@ -6,7 +6,9 @@ from .reseller import (
     ResellerInDBBase,
     Reseller,
     ResellerWithRecruits,
-    ResellerPromotionUpdate
+    ResellerPromotionUpdate,
+    UplineMember,
+    DownlineMember
 )
 from .product import (
     ProductPackageBase,
@@ -21,7 +23,10 @@ from .order import (
     OrderCreatePublic,
     OrderCreateInternal,
     OrderUpdate,
-    Order
+    Order,
+    OrderBatchCreate,
+    OrderBatchItemResult,
+    OrderBatchResult
 )
 from .commission import (
     CommissionBase,
@@ -30,8 +35,12 @@ from .commission import (
     Commission as CommissionSchema, # Alias to avoid clash if Commission model is also imported directly
     CommissionNestedOrder, # Moved from order.py import
     CommissionNestedReseller, # Moved from order.py import
-    CommissionNestedProductPackage # Moved from order.py import
+    CommissionNestedProductPackage, # Moved from order.py import
+    CommissionStatusTotal,
+    CommissionSummary,
+    CommissionOutboxEntry
 )
+from .team_volume import TeamVolumeRow, TeamVolume
 
 # Optional: Define __all__ if you want to control `from app.schemas import *`
 # __all__ = [
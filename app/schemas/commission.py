@@ -68,3 +68,25 @@ class Commission(CommissionBase):
 
     class Config:
         from_attributes = True
+
+
+class CommissionStatusTotal(BaseModel):
+    """Aggregate of a reseller's commissions for one (status, currency) pair."""
+    commission_status: str
+    currency: str
+    total_amount: Decimal
+    count: int
+
+class CommissionSummary(BaseModel):
+    """Commission totals for a reseller, grouped by status and currency."""
+    reseller_id: int
+    totals: List[CommissionStatusTotal] = []
+
+class CommissionOutboxEntry(BaseModel):
+    """An order claimed from the commission outbox for calculation."""
+    id: int
+    order_id: int
+    attempts: int # Including the current one
+
+    class Config:
+        from_attributes = True
@@ -1,10 +1,11 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
 from app.schemas.product import ProductPackage  # For nesting in Order schema
 from app.schemas.reseller import Reseller     # For nesting in Order schema
+from app.core.config import ORDER_BATCH_MAX_SIZE
 
 class OrderBase(BaseModel):
     customer_email: EmailStr
@@ -44,6 +45,8 @@ class OrderUpdate(BaseModel):
     order_status: Optional[str] = Field(default=None, max_length=50)
     stripe_payment_intent_id: Optional[str] = Field(default=None, max_length=255)
     esim_provisioning_status: Optional[str] = Field(default=None, max_length=50)
+    # The order's version the update was made from, as last read; an order updated since is not changed (409)
+    version: Optional[int] = Field(default=None, ge=1)
 
 
 class Order(OrderBase): # Full schema for returning order data to the client
@@ -58,9 +61,32 @@ class Order(OrderBase): # Full schema for returning order data to the client
     esim_provisioning_status: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    version: int
 
     product_package: ProductPackage  # Nested product details
     reseller: Reseller               # Nested reseller details
 
     class Config:
         from_attributes = True
+
+
+class OrderBatchCreate(BaseModel):
+    """
+    Orders submitted together, e.g. a group booking, of up to ORDER_BATCH_MAX_SIZE.
+    """
+    orders: List[OrderCreatePublic] = Field(min_length=1, max_length=ORDER_BATCH_MAX_SIZE)
+
+class OrderBatchItemResult(BaseModel):
+    """
+    Outcome of one order of a batch: the created order (status_code 201), or why it
+    was not created (detail, with the status_code the single-order endpoint would give).
+    """
+    index: int # Position of the order in the request
+    status_code: int
+    order: Optional[Order] = None
+    detail: Optional[str] = None
+
+class OrderBatchResult(BaseModel):
+    created: int
+    failed: int
+    results: List[OrderBatchItemResult]
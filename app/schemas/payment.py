@@ -8,3 +8,14 @@ class PaymentIntentCreateResponse(BaseModel):
     client_secret: str
     order_id: int
     payment_intent_id: str
+
+class PaymentWebhookEventEntry(BaseModel):
+    """A stored Stripe webhook event claimed for processing."""
+    id: int
+    event_id: str
+    event_type: str
+    payload: str # Raw JSON, as received
+    attempts: int # Including the current one
+
+    class Config:
+        from_attributes = True
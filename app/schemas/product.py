@@ -1,8 +1,31 @@
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_serializer
+from typing import Dict, Literal, Optional, Union
 from datetime import datetime
 from decimal import Decimal
 
+# Commission rules (see app.core.commission_rules). A product without rules pays its
+# *_rate_or_amount fields as fixed amounts; rules given for a commission kind replace them.
+
+class FixedCommissionRule(BaseModel):
+    type: Literal["fixed"] = "fixed"
+    amount: Decimal = Field(..., ge=0)
+
+class PercentCommissionRule(BaseModel):
+    type: Literal["percent"] = "percent"
+    percent: Decimal = Field(..., ge=0, le=100) # Of the order's price_paid, rounded to the cent
+
+class ResellerTypeCommissionRule(BaseModel):
+    """Pick a rule by the earning reseller's reseller_type; `default` (else nothing) for other types."""
+    type: Literal["by_reseller_type"] = "by_reseller_type"
+    rules: Dict[str, Union[FixedCommissionRule, PercentCommissionRule]]
+    default: Optional[Union[FixedCommissionRule, PercentCommissionRule]] = None
+
+CommissionRule = Union[FixedCommissionRule, PercentCommissionRule, ResellerTypeCommissionRule]
+
+class CommissionRules(BaseModel):
+    direct: Optional[CommissionRule] = Field(default=None, discriminator="type") # Replaces direct_commission_rate_or_amount
+    recruitment: Optional[CommissionRule] = Field(default=None, discriminator="type") # Replaces recruitment_commission_rate_or_amount (upline tier 1)
+
 class ProductPackageBase(BaseModel):
     name: str = Field(..., max_length=255)
     description: Optional[str] = None
@@ -11,8 +34,14 @@ class ProductPackageBase(BaseModel):
     price: Decimal = Field(..., gt=0) # Price must be positive
     direct_commission_rate_or_amount: Decimal = Field(..., ge=0) # Commission can be 0
     recruitment_commission_rate_or_amount: Decimal = Field(..., ge=0) # Commission can be 0
+    commission_rules: Optional[CommissionRules] = None
     is_active: bool = True
 
+    @field_serializer("commission_rules")
+    def _serialize_commission_rules(self, rules: Optional[CommissionRules]):
+        # Stored in a JSON column: no Decimal objects
+        return rules.model_dump(mode="json", exclude_none=True) if rules is not None else None
+
 class ProductPackageCreate(ProductPackageBase):
     pass
 
@@ -24,8 +53,13 @@ class ProductPackageUpdate(BaseModel):
     price: Optional[Decimal] = Field(default=None, gt=0)
     direct_commission_rate_or_amount: Optional[Decimal] = Field(default=None, ge=0)
     recruitment_commission_rate_or_amount: Optional[Decimal] = Field(default=None, ge=0)
+    commission_rules: Optional[CommissionRules] = None
     is_active: Optional[bool] = None
 
+    @field_serializer("commission_rules")
+    def _serialize_commission_rules(self, rules: Optional[CommissionRules]):
+        return rules.model_dump(mode="json", exclude_none=True) if rules is not None else None
+
 class ProductPackageInDBBase(ProductPackageBase):
     id: int
     created_at: datetime
@@ -50,5 +50,15 @@ class ResellerWithRecruits(Reseller):
     recruited_resellers: List[Reseller] = []
     # is_superuser will be available here
 
+class DownlineMember(Reseller):
+    depth: int # 1 for direct recruits, 2 for their recruits, and so on
+
 class ResellerPromotionUpdate(BaseModel):
     promotion_details: Optional[str] = None
+
+class UplineMember(BaseModel):
+    """A reseller in another reseller's recruiter chain; depth 1 is the direct recruiter."""
+    id: int
+    is_active: bool
+    reseller_type: Optional[str] = None # For reseller-type commission rules
+    depth: int
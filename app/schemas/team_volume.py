@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import date
+from decimal import Decimal
+
+class TeamVolumeRow(BaseModel):
+    """
+    Totals for one group of a team: depth and/or month (when grouped by them) and currency.
+    depth 0 is the reseller itself, 1 its direct recruits, and so on.
+    """
+    depth: Optional[int] = None
+    period_start: Optional[date] = None # First day of the month
+    currency: str
+    order_count: int
+    revenue: Decimal
+    commission_total: Decimal
+
+class TeamVolume(BaseModel):
+    reseller_id: int
+    rows: List[TeamVolumeRow] = []
@@ -7,3 +7,17 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+
+class Principal(BaseModel):
+    """
+    Lightweight authenticated identity returned by get_current_user.
+    Endpoints that need the full reseller profile load it by id.
+    """
+    id: int
+    email: str
+    is_active: bool
+    is_superuser: bool
+
+    class Config:
+        from_attributes = True
+        frozen = True
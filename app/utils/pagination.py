@@ -0,0 +1,74 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Response
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query
+
+# Keyset (cursor) pagination for listings ordered by (created_at DESC, id DESC).
+# A cursor is an opaque url-safe token encoding the (created_at, id) of the last row
+# of the previous page; the next page is everything strictly after it in that order.
+# Unlike OFFSET this costs the same on every page and doesn't skip or repeat rows
+# when new rows are inserted while a client is paging.
+
+# List endpoints accept either skip/limit or a cursor; the cursor for the following
+# page is returned in this response header (absent on the last page).
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+CURSOR_DESCRIPTION = f"Keyset cursor from the {NEXT_CURSOR_HEADER} header of the previous page. Overrides skip."
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+    pass
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at_str, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at_str), int(row_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+def next_cursor(items: Sequence, limit: int) -> Optional[str]:
+    """
+    Cursor for the page after `items`, or None if this was the last page.
+    """
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
+
+def set_next_cursor_header(response: Response, items: Sequence, limit: int) -> Sequence:
+    """
+    Set NEXT_CURSOR_HEADER on `response` when there may be a further page; returns `items`.
+    """
+    cursor = next_cursor(items, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return items
+
+def apply_keyset(query: Query, model, cursor: str) -> Query:
+    """
+    Restrict `query` (ordered by model.created_at DESC, model.id DESC) to rows after `cursor`.
+    """
+    created_at, row_id = decode_cursor(cursor)
+    # Compare against created_at as stored for the anchor row rather than the decoded
+    # value: SQLite keeps server-default timestamps as text without microseconds, so a
+    # re-bound datetime would not compare equal to it. The cursor's own value is the
+    # fallback if the anchor row no longer exists.
+    anchor_created_at = func.coalesce(
+        select(model.created_at).where(model.id == row_id).scalar_subquery(),
+        created_at,
+    )
+    return query.filter(
+        or_(
+            model.created_at < anchor_created_at,
+            and_(model.created_at == anchor_created_at, model.id < row_id),
+        )
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import Date, cast, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+# Dialect-specific SQL shared by the crud modules. The app runs on SQLite (default)
+# or PostgreSQL; both support INSERT ... ON CONFLICT, which other dialects may not.
+
+def dialect_insert(db: Session, model):
+    """
+    insert(model) for the session's dialect, supporting on_conflict_do_nothing() and
+    on_conflict_do_update(); None for dialects without ON CONFLICT.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite_insert(model)
+    if dialect == "postgresql":
+        return postgresql_insert(model)
+    return None
+
+def month_start(db: Session, column):
+    """
+    SQL expression for the first day of the month of a datetime column, as a date.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(func.date_trunc("month", column), Date)
+    return func.date(column, "start of month", type_=Date)
@@ -0,0 +1,41 @@
+"""
+Shared helpers for the scripts in benchmarks/.
+
+Each benchmark runs the FastAPI app in-process against a throwaway SQLite file,
+so import this module (and call setup_database_env) before importing anything from app.
+"""
+import os
+import statistics
+import tempfile
+from typing import Dict, List
+
+def setup_database_env(name: str) -> str:
+    """
+    Point DATABASE_URL at a fresh temporary SQLite file and return its path.
+    Must run before app.core.config is imported.
+    """
+    path = os.path.join(tempfile.mkdtemp(prefix="roamstop_bench_"), f"{name}.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    return path
+
+def create_schema() -> None:
+    from app.db.base_class import Base
+    from app.db.session import engine
+    from app.models import reseller, product, order, commission, sales_rollup, commission_outbox, payment_event, idempotency # noqa: F401 - register tables
+    Base.metadata.create_all(bind=engine)
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def latency_summary(samples_ms: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples_ms),
+        "p50_ms": round(percentile(samples_ms, 50), 2),
+        "p99_ms": round(percentile(samples_ms, 99), 2),
+        "max_ms": round(max(samples_ms), 2) if samples_ms else 0.0,
+        "mean_ms": round(statistics.mean(samples_ms), 2) if samples_ms else 0.0,
+    }
@@ -0,0 +1,90 @@
+"""
+Order creation throughput of POST /api/v1/orders/public/batch/ against one
+POST /api/v1/orders/public/ per order.
+
+    python -m benchmarks.bench_bulk_orders --orders 2000 --batch-size 100 --concurrency 8
+
+Both runs create the same number of orders against the in-process app, with
+--concurrency requests in flight: single orders one per request, batched ones
+--batch-size per request. Latencies are per request.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("bulk_orders")
+
+import httpx # noqa: E402
+
+from app.main import app # noqa: E402
+from app.db.session import SessionLocal # noqa: E402
+from app.crud import crud_product, crud_reseller # noqa: E402
+from app.schemas.product import ProductPackageCreate # noqa: E402
+from app.schemas.reseller import ResellerCreate # noqa: E402
+
+async def _run(client: httpx.AsyncClient, path: str, bodies: list, orders_per_body: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failed = [], 0
+
+    async def post(body):
+        nonlocal failed
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json=body)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code not in (200, 201):
+                failed += orders_per_body
+            elif "failed" in response.json():
+                failed += response.json()["failed"]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(post(body) for body in bodies))
+    elapsed = time.perf_counter() - start
+    return {
+        "orders_per_sec": round(len(bodies) * orders_per_body / elapsed, 1),
+        "errors": failed,
+        "request_latency": latency_summary(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    create_schema()
+    with SessionLocal() as db:
+        reseller = crud_reseller.create_reseller(db, obj_in=ResellerCreate(
+            email="bench_bulk@example.com", password="password", reseller_type="BENCH"
+        ))
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        orders = [
+            {"customer_email": f"c{i}@example.com", "product_package_id": product.id, "reseller_id": reseller.id}
+            for i in range(args.orders)
+        ]
+    batches = [{"orders": orders[i:i + args.batch_size]} for i in range(0, len(orders), args.batch_size)]
+
+    async def both():
+        # One event loop for both runs: the async engine's connection pool is bound to it
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            single = await _run(client, "/api/v1/orders/public/", orders, 1, args.concurrency)
+            batched = await _run(client, "/api/v1/orders/public/batch/", batches, args.batch_size, args.concurrency)
+        return single, batched
+
+    single, batched = asyncio.run(both())
+    print(f"orders={args.orders} batch_size={args.batch_size} concurrency={args.concurrency}")
+    print(f"single : {single}")
+    print(f"batched: {batched}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Login storm benchmark: logins/sec and latency of an unrelated endpoint while
+many logins are in flight.
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 32
+
+Runs twice against the in-process app: once with pbkdf2 verification inline on
+the event loop (the previous behaviour) and once on the password hashing pool
+(app.core.security.verify_password_async). While the logins run, a probe task
+requests GET /ping every 10ms and records its latency.
+"""
+import argparse
+import asyncio
+import logging
+import time
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("login_storm")
+
+import httpx # noqa: E402
+
+from app.main import app # noqa: E402
+from app.api.endpoints import auth as auth_endpoints # noqa: E402
+from app.core import security # noqa: E402
+from app.db.session import SessionLocal # noqa: E402
+from app.crud import crud_reseller # noqa: E402
+from app.schemas.reseller import ResellerCreate # noqa: E402
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password-123"
+
+async def _verify_inline(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+async def _run(logins: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+
+        async def login():
+            async with semaphore:
+                response = await client.post("/api/v1/auth/login", data={"username": EMAIL, "password": PASSWORD})
+                statuses.append(response.status_code)
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/ping")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return {
+        "logins_per_sec": round(logins / elapsed, 1),
+        "login_errors": sum(1 for s in statuses if s != 200),
+        "ping": latency_summary(probe_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    create_schema()
+    with SessionLocal() as db:
+        crud_reseller.create_reseller(db, obj_in=ResellerCreate(email=EMAIL, password=PASSWORD, reseller_type="BENCH"))
+
+    async def both():
+        # One event loop for both runs: the async engine's connection pool is bound to it
+        pooled_verify = auth_endpoints.verify_password_async
+        auth_endpoints.verify_password_async = _verify_inline
+        inline = await _run(args.logins, args.concurrency)
+        auth_endpoints.verify_password_async = pooled_verify
+        await security.get_password_hash_async("warm-up") # Start the worker processes outside the timing
+        pooled = await _run(args.logins, args.concurrency)
+        return inline, pooled
+
+    inline, pooled = asyncio.run(both())
+    security.shutdown_password_hashing_pool()
+
+    print(f"workers={security.PASSWORD_HASH_WORKERS} queue_limit={security.PASSWORD_HASH_QUEUE_LIMIT}")
+    print(f"inline : {inline}")
+    print(f"pooled : {pooled}")
+
+if __name__ == "__main__":
+    main()
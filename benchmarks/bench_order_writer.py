@@ -0,0 +1,90 @@
+"""
+POST /api/v1/orders/public/ throughput and latency with orders committed one by one
+(the direct path) and with the write-coalescing OrderWriter (app/core/order_writer.py).
+
+    python -m benchmarks.bench_order_writer --orders 2000 --concurrency 64 --max-delay-ms 5
+
+Both runs post the same number of orders against the in-process app, with
+--concurrency requests in flight, on the same SQLite file (tuning profile on).
+"""
+import argparse
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("order_writer")
+
+import httpx # noqa: E402
+
+from app.main import app # noqa: E402
+from app.core import metrics # noqa: E402
+from app.core.order_writer import order_writer # noqa: E402
+from app.db.session import SessionLocal # noqa: E402
+from app.crud import crud_product, crud_reseller # noqa: E402
+from app.schemas.product import ProductPackageCreate # noqa: E402
+from app.schemas.reseller import ResellerCreate # noqa: E402
+
+async def _run(client: httpx.AsyncClient, payload: dict, orders: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], []
+
+    async def post_one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/v1/orders/public/", json=payload)
+            latencies.append((time.perf_counter() - start) * 1000)
+            statuses.append(response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(post_one() for _ in range(orders)))
+    elapsed = time.perf_counter() - start
+    return {
+        "orders_per_sec": round(orders / elapsed, 1),
+        "errors": sum(1 for s in statuses if s != 201),
+        "latency": latency_summary(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    create_schema()
+    with SessionLocal() as db:
+        reseller = crud_reseller.create_reseller(db, obj_in=ResellerCreate(
+            email="bench_writer@example.com", password="password", reseller_type="BENCH"
+        ))
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        payload = {"customer_email": "bench_customer@example.com", "product_package_id": product.id, "reseller_id": reseller.id}
+    order_writer.max_batch_size = args.max_batch_size
+    order_writer.max_delay_ms = args.max_delay_ms
+
+    async def both():
+        # One event loop for both runs: the async engine's connection pool is bound to it
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            direct = await _run(client, payload, args.orders, args.concurrency)
+            await order_writer.start()
+            batches = metrics.get("order_writer_batches_total")
+            coalesced = await _run(client, payload, args.orders, args.concurrency)
+            coalesced["batches"] = int(metrics.get("order_writer_batches_total") - batches)
+            await order_writer.stop()
+        return direct, coalesced
+
+    direct, coalesced = asyncio.run(both())
+    print(f"orders={args.orders} concurrency={args.concurrency} max_delay_ms={args.max_delay_ms} max_batch_size={args.max_batch_size}")
+    print(f"direct   : {direct}")
+    print(f"coalesced: {coalesced}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+POST /api/v1/payments/create-payment-intent throughput against a local mock of the
+Stripe API (tests/mock_stripe.py) answering after --latency-ms, like the real one
+would over the network.
+
+    python -m benchmarks.bench_payment_intents --orders 200 --concurrency 32 --latency-ms 50
+
+Runs twice against the in-process app: once with the blocking stripe.PaymentIntent
+calls made on the event loop (the previous behaviour) and once with PaymentsClient's
+async calls on its pooled httpx client. Each run creates one PaymentIntent per order,
+for fresh orders. While it runs, a probe task requests GET /ping every 10ms and
+records its latency.
+"""
+import argparse
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("payment_intents")
+
+import httpx # noqa: E402
+import stripe # noqa: E402
+
+from app.main import app # noqa: E402
+from app.api.endpoints.payments import PaymentsClient, get_payments_client # noqa: E402
+from app.core.security import create_access_token # noqa: E402
+from app.db.session import SessionLocal # noqa: E402
+from app.crud import crud_order, crud_product, crud_reseller # noqa: E402
+from app.schemas.order import OrderCreateInternal # noqa: E402
+from app.schemas.product import ProductPackageCreate # noqa: E402
+from app.schemas.reseller import ResellerCreate # noqa: E402
+from tests.mock_stripe import MockStripeServer # noqa: E402
+
+EMAIL = "bench_payments@example.com"
+
+class BlockingPaymentsClient(PaymentsClient):
+    # The stripe module's synchronous calls, as the endpoint used to make them
+    async def retrieve_payment_intent(self, payment_intent_id):
+        return stripe.PaymentIntent.retrieve(payment_intent_id, api_key=self.api_key)
+
+    async def create_payment_intent(self, params, *, idempotency_key=None):
+        return stripe.PaymentIntent.create(api_key=self.api_key, idempotency_key=idempotency_key, **params)
+
+def _seed_orders(reseller_id: int, product, count: int):
+    with SessionLocal() as db:
+        return [
+            crud_order.create_order(db, obj_in=OrderCreateInternal(
+                customer_email=f"c{i}@example.com", product_package_id=product.id, reseller_id=reseller_id,
+                price_paid=product.price, currency_paid="USD", duration_days_at_purchase=product.duration_days,
+                country_code_at_purchase=product.country_code,
+            )).id
+            for i in range(count)
+        ]
+
+async def _run(order_ids, concurrency: int, headers: dict) -> dict:
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        semaphore = asyncio.Semaphore(concurrency)
+        statuses = []
+
+        async def create(order_id: int):
+            async with semaphore:
+                response = await client.post("/api/v1/payments/create-payment-intent", json={"order_id": order_id}, headers=headers)
+                statuses.append(response.status_code)
+
+        probe_latencies = []
+        done = asyncio.Event()
+
+        async def probe():
+            while not done.is_set():
+                start = time.perf_counter()
+                await client.get("/ping")
+                probe_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.01)
+
+        probe_task = asyncio.create_task(probe())
+        start = time.perf_counter()
+        await asyncio.gather(*(create(order_id) for order_id in order_ids))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await probe_task
+
+    return {
+        "intents_per_sec": round(len(order_ids) / elapsed, 1),
+        "errors": sum(1 for s in statuses if s != 200),
+        "ping": latency_summary(probe_latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    create_schema()
+    with SessionLocal() as db:
+        reseller = crud_reseller.create_reseller(db, obj_in=ResellerCreate(email=EMAIL, password="password", reseller_type="BENCH"))
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        reseller_id = reseller.id
+    headers = {"Authorization": f"Bearer {create_access_token(data={'sub': EMAIL})}"}
+
+    with MockStripeServer(latency_ms=args.latency_ms) as mock:
+        stripe.api_base = mock.url # For the blocking calls
+        blocking_client = BlockingPaymentsClient(api_key="sk_test_bench", api_base=mock.url)
+        pooled_client = PaymentsClient(api_key="sk_test_bench", api_base=mock.url)
+
+        async def both():
+            # One event loop for both runs: the async engine's connection pool is bound to it
+            app.dependency_overrides[get_payments_client] = lambda: blocking_client
+            blocking = await _run(_seed_orders(reseller_id, product, args.orders), args.concurrency, headers)
+            app.dependency_overrides[get_payments_client] = lambda: pooled_client
+            pooled = await _run(_seed_orders(reseller_id, product, args.orders), args.concurrency, headers)
+            await pooled_client.aclose()
+            return blocking, pooled
+
+        blocking, pooled = asyncio.run(both())
+
+    print(f"stripe latency={args.latency_ms}ms orders={args.orders} concurrency={args.concurrency}")
+    print(f"blocking: {blocking}")
+    print(f"pooled  : {pooled}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Concurrent POST /api/v1/orders/public/ throughput, with and without the SQLite
+tuning profile (WAL, synchronous=NORMAL, busy_timeout, mmap, cache, temp_store
+and the WAL pool sizing from app/db/session.py).
+
+    python -m benchmarks.bench_public_orders --orders 500 --concurrency 32 --processes 2
+
+Each profile runs in fresh child processes (the engines are configured at import
+time, from SQLITE_TUNING_ENABLED). With --processes > 1 several processes write to
+the same database file at once, like several uvicorn workers would.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks._common import latency_summary
+
+def _seed(db_path: str) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    from decimal import Decimal
+    from benchmarks._common import create_schema
+    from app.db.session import SessionLocal
+    from app.crud import crud_reseller, crud_product
+    from app.schemas.reseller import ResellerCreate
+    from app.schemas.product import ProductPackageCreate
+
+    create_schema()
+    with SessionLocal() as db:
+        reseller = crud_reseller.create_reseller(db, obj_in=ResellerCreate(
+            email="bench_orders@example.com", password="password", reseller_type="BENCH"
+        ))
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        return {"reseller_id": reseller.id, "product_id": product.id}
+
+async def _post_orders(orders: int, concurrency: int, ids: dict) -> dict:
+    import httpx
+    from app.main import app
+
+    payload = {
+        "customer_email": "bench_customer@example.com",
+        "product_package_id": ids["product_id"],
+        "reseller_id": ids["reseller_id"],
+    }
+    latencies, statuses = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def post_one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post("/api/v1/orders/public/", json=payload)
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(post_one() for _ in range(orders)))
+        elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "latencies": latencies, "errors": sum(1 for s in statuses if s != 201)}
+
+def _child(args) -> None:
+    logging.disable(logging.CRITICAL)
+    os.environ["DATABASE_URL"] = f"sqlite:///{args.db}"
+    result = asyncio.run(_post_orders(args.orders, args.concurrency, json.loads(args.ids)))
+    print(json.dumps(result))
+
+def _run_profile(tuned: bool, args) -> dict:
+    from benchmarks._common import setup_database_env
+    db_path = setup_database_env("tuned" if tuned else "default")
+    env = dict(os.environ, SQLITE_TUNING_ENABLED="true" if tuned else "false")
+    seed = subprocess.run(
+        [sys.executable, "-c", f"import json; from benchmarks.bench_public_orders import _seed; print(json.dumps(_seed({db_path!r})))"],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    ids = seed.stdout.strip().splitlines()[-1]
+
+    per_process = args.orders // args.processes
+    children = [
+        subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.bench_public_orders", "--child", "--db", db_path, "--ids", ids,
+             "--orders", str(per_process), "--concurrency", str(args.concurrency)],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        for _ in range(args.processes)
+    ]
+    results = [json.loads(child.communicate()[0].strip().splitlines()[-1]) for child in children]
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    wall = max(result["elapsed"] for result in results)
+    return {
+        "orders_per_sec": round(len(latencies) / wall, 1),
+        "errors": sum(result["errors"] for result in results),
+        "latency": latency_summary(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    parser.add_argument("--ids", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args)
+        return
+
+    print(f"default: {_run_profile(False, args)}")
+    print(f"tuned  : {_run_profile(True, args)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Team volume of the root of a large recruiter tree: crud_team_volume.get_team_volume
+(closure table joined to the monthly sales rollup) against walking the tree with
+get_recruited_resellers and counting each member's orders, one query per person.
+
+    python -m benchmarks.bench_team_volume --members 10000 --fanout 5 --orders-per-member 5
+
+The tree and orders are bulk-loaded, then the rollup is built with
+rebuild_sales_rollup. Orders are spread over --months months. Each read runs in a
+fresh session, like one request.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("team_volume")
+
+def _seed(members: int, fanout: int, orders_per_member: int, months: int) -> int:
+    from app.db.session import SessionLocal
+    from app.crud import crud_product, crud_team_volume
+    from app.models.reseller import ResellerProfile, ResellerClosure
+    from app.models.order import Order
+    from app.schemas.product import ProductPackageCreate
+
+    create_schema()
+    with SessionLocal() as db:
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        # Reseller i (1-based) is recruited by (i - 2) // fanout + 1: a complete fanout-ary tree
+        resellers, closure, ancestors = [], [], {}
+        for i in range(1, members + 1):
+            recruiter_id = (i - 2) // fanout + 1 if i > 1 else None
+            resellers.append(dict(
+                id=i, email=f"member{i}@example.com", hashed_password="not-a-real-hash", reseller_type="BENCH",
+                is_active=True, is_superuser=False, recruiter_id=recruiter_id,
+            ))
+            ancestors[i] = [i] + (ancestors[recruiter_id] if recruiter_id else [])
+            closure.extend(dict(ancestor_id=a, descendant_id=i, depth=d) for d, a in enumerate(ancestors[i]))
+        db.bulk_insert_mappings(ResellerProfile, resellers)
+        db.bulk_insert_mappings(ResellerClosure, closure)
+        start = datetime(2026, 1, 1)
+        db.bulk_insert_mappings(Order, [
+            dict(
+                customer_email=f"c{i}@example.com", product_package_id=product.id, reseller_id=i,
+                price_paid=Decimal("10.00"), currency_paid="USD", duration_days_at_purchase=7,
+                country_code_at_purchase="US", order_status="COMPLETED",
+                created_at=start + timedelta(days=31 * ((i + n) % months)),
+            )
+            for i in range(1, members + 1) for n in range(orders_per_member)
+        ])
+        db.commit()
+        crud_team_volume.rebuild_sales_rollup(db)
+    return 1
+
+def _walk_per_member(db, reseller_id: int) -> int:
+    # The previous approach: page through each member's recruits and count orders per person
+    from app.crud import crud_reseller, crud_order
+    total, pending = 0, [reseller_id]
+    while pending:
+        member_id = pending.pop()
+        total += crud_order.get_order_count_for_reseller(db, reseller_id=member_id)
+        pending.extend(r.id for r in crud_reseller.get_recruited_resellers(db, recruiter_id=member_id, limit=10_000))
+    return total
+
+def _team_volume(db, reseller_id: int) -> int:
+    from app.crud import crud_team_volume
+    rows = crud_team_volume.get_team_volume(db, reseller_id=reseller_id)
+    return sum(row.order_count for row in rows)
+
+def _measure(reseller_id: int, runs: int, read) -> dict:
+    from app.db.session import SessionLocal
+    latencies, result = [], None
+    for _ in range(runs):
+        with SessionLocal() as db:
+            start = time.perf_counter()
+            result = read(db, reseller_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return {"orders": result, **latency_summary(latencies)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--members", type=int, default=10000)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--orders-per-member", type=int, default=5)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    root_id = _seed(args.members, args.fanout, args.orders_per_member, args.months)
+
+    per_member = _measure(root_id, args.runs, _walk_per_member)
+    rollup = _measure(root_id, args.runs, _team_volume)
+
+    print(f"members={args.members} fanout={args.fanout} orders={args.members * args.orders_per_member} months={args.months}")
+    print(f"per-member walk : {per_member}")
+    print(f"closure + rollup: {rollup}")
+
+if __name__ == "__main__":
+    main()
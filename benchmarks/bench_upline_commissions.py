@@ -0,0 +1,113 @@
+"""
+Upline commission calculation on a 10-deep recruiter hierarchy: one recursive CTE
+(crud_reseller.get_upline, used by app.core.commissions_calculator) against walking
+the chain with one recruiter query per level.
+
+    python -m benchmarks.bench_upline_commissions --orders 500 --depth 10
+
+The seller at the bottom of the chain sells --orders orders; every upline tier is
+paid (UPLINE_COMMISSION_TIER_AMOUNTS is set for tiers 2..depth). Each calculation
+runs in a fresh session, like one request, and reports SQL statements per order
+and latency.
+"""
+import argparse
+import os
+import time
+from decimal import Decimal
+
+from benchmarks._common import setup_database_env, create_schema, latency_summary
+
+setup_database_env("upline_commissions")
+
+def _tier_amounts(depth: int) -> str:
+    return ",".join("0.10" for _ in range(depth - 1))
+
+def _seed(depth: int, orders: int):
+    from app.db.session import SessionLocal
+    from app.crud import crud_reseller, crud_product, crud_order
+    from app.schemas.reseller import ResellerCreate
+    from app.schemas.product import ProductPackageCreate
+    from app.schemas.order import OrderCreateInternal
+
+    create_schema()
+    with SessionLocal() as db:
+        recruiter_id = None
+        # depth upline members plus the seller at the bottom
+        for level in range(depth + 1):
+            reseller = crud_reseller.create_reseller(db, obj_in=ResellerCreate(
+                email=f"level{level}@example.com", password="password", reseller_type="BENCH", recruiter_id=recruiter_id
+            ), hashed_password="not-a-real-hash")
+            recruiter_id = reseller.id
+        seller_id = recruiter_id
+        product = crud_product.create_product(db, obj_in=ProductPackageCreate(
+            name="Bench Product", duration_days=7, country_code="US", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+        order_ids = [
+            crud_order.create_order(db, obj_in=OrderCreateInternal(
+                customer_email=f"c{i}@example.com", product_package_id=product.id, reseller_id=seller_id,
+                price_paid=product.price, currency_paid="USD", duration_days_at_purchase=7, country_code_at_purchase="US",
+                order_status="COMPLETED"
+            )).id
+            for i in range(orders)
+        ]
+    return order_ids
+
+def _walk_per_level(db, order, max_depth: int) -> int:
+    # The previous approach: one recruiter lookup per tier
+    from app.models.reseller import ResellerProfile
+    paid = 0
+    recruiter_id = order.reseller.recruiter_id
+    for _ in range(max_depth):
+        if recruiter_id is None:
+            break
+        recruiter = db.query(ResellerProfile).filter(ResellerProfile.id == recruiter_id).first()
+        if recruiter is None:
+            break
+        paid += recruiter.is_active
+        recruiter_id = recruiter.recruiter_id
+    return paid
+
+def _measure(order_ids, calculate) -> dict:
+    from sqlalchemy import event
+    from app.db.session import SessionLocal, engine
+    from app.crud import crud_order
+
+    statements = 0
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        nonlocal statements
+        statements += 1
+
+    latencies = []
+    for order_id in order_ids:
+        with SessionLocal() as db:
+            order = crud_order.get_order(db, order_id)
+            event.listen(engine, "before_cursor_execute", count)
+            start = time.perf_counter()
+            calculate(db, order)
+            latencies.append((time.perf_counter() - start) * 1000)
+            event.remove(engine, "before_cursor_execute", count)
+    return {"statements_per_order": round(statements / len(order_ids), 2), **latency_summary(latencies)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=10)
+    args = parser.parse_args()
+
+    # Must be set before app.core.config is imported
+    os.environ["UPLINE_COMMISSION_TIER_AMOUNTS"] = _tier_amounts(args.depth)
+    order_ids = _seed(args.depth, args.orders)
+
+    from app.core.commissions_calculator import build_commissions
+
+    per_level = _measure(order_ids, lambda db, order: _walk_per_level(db, order, args.depth))
+    cte = _measure(order_ids, build_commissions)
+
+    print(f"depth={args.depth} orders={args.orders}")
+    print(f"per-level walk : {per_level}")
+    print(f"recursive CTE  : {cte}")
+
+if __name__ == "__main__":
+    main()
@@ -88,6 +88,45 @@ def test_read_my_commissions_unauthenticated(client: TestClient):
     response = client.get("/api/v1/resellers/me/commissions")
     assert response.status_code == 401 # or 403 if auto_error=False and endpoint expects user
 
+def test_read_my_commissions_summary(
+    client: TestClient, db_session: Session,
+    normal_user_token_headers: tuple,
+    test_normal_user: ResellerModel
+):
+    headers, _ = normal_user_token_headers
+    product = crud_product.create_product(db_session, obj_in=ProductPackageCreate(
+        name=f"P-{uuid.uuid4().hex[:4]}", duration_days=30, country_code="US", price=Decimal("100"),
+        direct_commission_rate_or_amount=Decimal("10"), recruitment_commission_rate_or_amount=Decimal("5")
+    ))
+    order = crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email="cust@example.com", product_package_id=product.id, reseller_id=test_normal_user.id,
+        price_paid=product.price, currency_paid="USD", duration_days_at_purchase=product.duration_days,
+        country_code_at_purchase=product.country_code, order_status="COMPLETED"
+    ))
+    for amount, status, commission_type in (
+        (Decimal("10.00"), "UNPAID", "DIRECT_SALE"), (Decimal("2.50"), "UNPAID", "BONUS"), (Decimal("4.00"), "PAID", "RECRUITMENT_TIER_1")
+    ):
+        crud_commission.create_commission(db_session, obj_in=CommissionCreate(
+            order_id=order.id, reseller_id=test_normal_user.id, commission_type=commission_type,
+            amount=amount, currency="USD", product_package_id_at_sale=product.id,
+            commission_status=status
+        ))
+
+    response = client.get("/api/v1/resellers/me/commissions/summary", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["reseller_id"] == test_normal_user.id
+    totals = {(row["commission_status"], row["currency"]): row for row in data["totals"]}
+    assert set(totals) == {("PAID", "USD"), ("UNPAID", "USD")}
+    assert Decimal(totals[("UNPAID", "USD")]["total_amount"]) == Decimal("12.50")
+    assert totals[("UNPAID", "USD")]["count"] == 2
+    assert Decimal(totals[("PAID", "USD")]["total_amount"]) == Decimal("4.00")
+    assert totals[("PAID", "USD")]["count"] == 1
+
+def test_read_my_commissions_summary_unauthenticated(client: TestClient):
+    response = client.get("/api/v1/resellers/me/commissions/summary")
+    assert response.status_code == 401
+
 # The endpoint for reseller commissions is /api/v1/resellers/me/commissions, not /api/v1/commissions
 # No other commission-specific API endpoints were defined in the original plan for this step
 # other than those implicitly tested by order updates.
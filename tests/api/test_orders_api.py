@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 import uuid
@@ -195,6 +196,7 @@ def test_order_update_to_completed_triggers_commission(
     superuser_token_headers: tuple, # For updating order status
     test_normal_user: ResellerModel, # This will be reseller B (direct seller)
     test_product: ProductPackage, # Use a product with known commission rates
+    outbox_worker,
 ):
     # Setup: Reseller A (recruiter) and Reseller B (recruited by A)
     reseller_a_in = ResellerCreate(email=f"recruiter_comm_test_{uuid.uuid4().hex[:4]}@example.com", password="password", reseller_type="RECRUITER_A")
@@ -242,6 +244,10 @@ def test_order_update_to_completed_triggers_commission(
     assert response_update.status_code == 200
     assert response_update.json()["order_status"] == "COMPLETED"
 
+    # Commissions are calculated by the outbox worker, not in the request
+    assert crud_commission.get_commissions_by_order_id(db=db_session, order_id=order.id) == []
+    assert asyncio.run(outbox_worker.drain()) == 1
+
     # Verify commissions
     commissions = crud_commission.get_commissions_by_order_id(db=db_session, order_id=order.id)
     assert len(commissions) == 2, "Should create direct and recruitment commissions"
@@ -264,7 +270,8 @@ def test_order_update_to_completed_idempotency(
     client: TestClient, db_session: Session,
     superuser_token_headers: tuple,
     test_normal_user: ResellerModel, # Direct seller
-    test_product: ProductPackage # Ensure this product has commission values
+    test_product: ProductPackage, # Ensure this product has commission values
+    outbox_worker,
 ):
     # Ensure product has commission values
     if test_product.direct_commission_rate_or_amount == 0:
@@ -290,12 +297,14 @@ def test_order_update_to_completed_idempotency(
     # First update to COMPLETED
     response_update1 = client.patch(f"/api/v1/orders/{order.id}", json=update_payload.model_dump(), headers=su_headers)
     assert response_update1.status_code == 200
+    asyncio.run(outbox_worker.drain())
     commissions1 = crud_commission.get_commissions_by_order_id(db=db_session, order_id=order.id)
     assert len(commissions1) >= 1 # At least direct commission
 
     # Second update to COMPLETED
     response_update2 = client.patch(f"/api/v1/orders/{order.id}", json=update_payload.model_dump(), headers=su_headers)
     assert response_update2.status_code == 200
+    assert asyncio.run(outbox_worker.drain()) == 0 # Already COMPLETED: nothing queued
     commissions2 = crud_commission.get_commissions_by_order_id(db=db_session, order_id=order.id)
     assert len(commissions2) == len(commissions1), "Commission records should not be duplicated"
 
@@ -342,3 +351,147 @@ def test_admin_read_orders_by_customer_failure_normal_user(client: TestClient, n
     customer_email_to_search = created_order_data["customer_email"]
     response = client.get(f"/api/v1/orders/admin/by-customer/?customer_email={customer_email_to_search}", headers=headers)
     assert response.status_code == 403
+
+
+# --- Cursor pagination ---
+def test_read_my_sales_cursor_pagination(client: TestClient, normal_user_token_headers: tuple, test_product: ProductPackage):
+    headers, _ = normal_user_token_headers
+    created_ids = []
+    for _ in range(3):
+        response = client.post("/api/v1/orders/", json={
+            "customer_email": f"cursor_{uuid.uuid4().hex[:6]}@example.com", "product_package_id": test_product.id
+        }, headers=headers)
+        created_ids.append(response.json()["id"])
+
+    page1 = client.get("/api/v1/orders/my-sales/?limit=2", headers=headers)
+    assert page1.status_code == 200
+    cursor = page1.headers["X-Next-Cursor"]
+
+    page2 = client.get(f"/api/v1/orders/my-sales/?limit=2&cursor={cursor}", headers=headers)
+    assert page2.status_code == 200
+    assert "X-Next-Cursor" not in page2.headers
+    assert [o["id"] for o in page1.json() + page2.json()] == list(reversed(created_ids))
+
+def test_read_my_sales_invalid_cursor(client: TestClient, normal_user_token_headers: tuple):
+    headers, _ = normal_user_token_headers
+    response = client.get("/api/v1/orders/my-sales/?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+
+# --- Batch Public Order Creation (POST /orders/public/batch/) ---
+def test_create_public_orders_batch(
+    client: TestClient, db_session: Session, test_normal_user: ResellerModel, test_product: ProductPackage
+):
+    orders = [
+        {"customer_email": f"group_{i}@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id}
+        for i in range(3)
+    ]
+    response = client.post("/api/v1/orders/public/batch/", json={"orders": orders})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["created"] == 3 and data["failed"] == 0
+    assert [r["index"] for r in data["results"]] == [0, 1, 2]
+    for i, result in enumerate(data["results"]):
+        assert result["status_code"] == 201
+        assert result["order"]["customer_email"] == f"group_{i}@example.com"
+        assert result["order"]["order_status"] == "PENDING_PAYMENT"
+        assert Decimal(result["order"]["price_paid"]) == test_product.price
+        assert result["order"]["product_package"]["id"] == test_product.id
+        assert result["order"]["reseller"]["id"] == test_normal_user.id
+    assert crud_order.get_order_count_for_reseller(db_session, reseller_id=test_normal_user.id) == 3
+
+def test_create_public_orders_batch_reports_invalid_items(
+    client: TestClient, db_session: Session, test_normal_user: ResellerModel, test_product: ProductPackage
+):
+    inactive = crud_product.create_product(db_session, obj_in=ProductPackageCreate(
+        name=f"Inactive {uuid.uuid4().hex[:6]}", duration_days=7, country_code="US", price=Decimal("5.00"),
+        direct_commission_rate_or_amount=Decimal("0.50"), recruitment_commission_rate_or_amount=Decimal("0.10"), is_active=False
+    ))
+    orders = [
+        {"customer_email": "ok_1@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id},
+        {"customer_email": "bad_reseller@example.com", "product_package_id": test_product.id, "reseller_id": 99999},
+        {"customer_email": "bad_product@example.com", "product_package_id": inactive.id, "reseller_id": test_normal_user.id},
+        {"customer_email": "ok_2@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id},
+    ]
+    response = client.post("/api/v1/orders/public/batch/", json={"orders": orders})
+    assert response.status_code == 200, response.text
+    data = response.json()
+    assert data["created"] == 2 and data["failed"] == 2
+    statuses = [(r["index"], r["status_code"], r["detail"]) for r in data["results"]]
+    assert statuses == [
+        (0, 201, None),
+        (1, 404, "Reseller not found or not active"),
+        (2, 404, "Product not found or not active"),
+        (3, 201, None),
+    ]
+    assert [r["order"]["customer_email"] for r in data["results"] if r["order"]] == ["ok_1@example.com", "ok_2@example.com"]
+    assert crud_order.get_order_count_for_reseller(db_session, reseller_id=test_normal_user.id) == 2
+
+def test_create_public_orders_batch_size_limits(client: TestClient, test_normal_user: ResellerModel, test_product: ProductPackage):
+    from app.core.config import ORDER_BATCH_MAX_SIZE
+    order = {"customer_email": "limit@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id}
+    assert client.post("/api/v1/orders/public/batch/", json={"orders": []}).status_code == 422
+    response = client.post("/api/v1/orders/public/batch/", json={"orders": [order] * (ORDER_BATCH_MAX_SIZE + 1)})
+    assert response.status_code == 422
+
+# --- Idempotency-Key on order creation ---
+def test_create_public_order_idempotency_key_replays_first_order(
+    client: TestClient, db_session: Session, test_normal_user: ResellerModel, test_product: ProductPackage
+):
+    order_data = {"customer_email": "flaky@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id}
+    headers = {"Idempotency-Key": "order-attempt-1"}
+    first = client.post("/api/v1/orders/public/", json=order_data, headers=headers)
+    assert first.status_code == 201, first.text
+    assert "Idempotent-Replayed" not in first.headers
+
+    # The retry is answered from the stored response, even though the product has since been deactivated
+    crud_product.update_product(db_session, db_obj=test_product, obj_in=ProductPackageUpdate(is_active=False))
+    retry = client.post("/api/v1/orders/public/", json=order_data, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert crud_order.get_order_count_for_customer(db_session, customer_email="flaky@example.com") == 1
+
+    # Another key is another order (refused here: the product is inactive now)
+    assert client.post("/api/v1/orders/public/", json=order_data, headers={"Idempotency-Key": "order-attempt-2"}).status_code == 404
+
+def test_create_order_idempotency_key_is_per_reseller_and_request(
+    client: TestClient, db_session: Session, normal_user_token_headers: tuple, superuser_token_headers: tuple, test_product: ProductPackage
+):
+    headers, _ = normal_user_token_headers
+    other_headers, _ = superuser_token_headers
+    order_data = {"customer_email": "keyed@example.com", "product_package_id": test_product.id}
+
+    first = client.post("/api/v1/orders/", json=order_data, headers={**headers, "Idempotency-Key": "k"})
+    retry = client.post("/api/v1/orders/", json=order_data, headers={**headers, "Idempotency-Key": "k"})
+    assert first.status_code == retry.status_code == 201
+    assert retry.json()["id"] == first.json()["id"]
+
+    # Same key from another reseller: its own order
+    other = client.post("/api/v1/orders/", json=order_data, headers={**other_headers, "Idempotency-Key": "k"})
+    assert other.status_code == 201 and other.json()["id"] != first.json()["id"]
+
+    # Same key, different request: refused
+    changed = client.post("/api/v1/orders/", json={**order_data, "customer_name": "Someone Else"}, headers={**headers, "Idempotency-Key": "k"})
+    assert changed.status_code == 422
+    assert crud_order.get_order_count_for_customer(db_session, customer_email="keyed@example.com") == 2
+
+# --- Order status updates: state machine and versions ---
+def test_update_order_status_conflicts(client: TestClient, superuser_token_headers: tuple, created_order_for_normal_user):
+    order, _ = created_order_for_normal_user
+    su_headers, _ = superuser_token_headers
+    assert order["version"] == 1
+
+    response = client.patch(f"/api/v1/orders/{order['id']}", json={"order_status": "AWAITING_PAYMENT", "version": 1}, headers=su_headers)
+    assert response.status_code == 200
+    assert response.json()["version"] == 2
+
+    # Made from the version read before that update: refused, the order is unchanged
+    stale = client.patch(f"/api/v1/orders/{order['id']}", json={"order_status": "CANCELLED", "version": 1}, headers=su_headers)
+    assert stale.status_code == 409
+    assert "modified" in stale.json()["detail"]
+
+    # Not a move the state machine allows
+    client.patch(f"/api/v1/orders/{order['id']}", json={"order_status": "CANCELLED"}, headers=su_headers)
+    invalid = client.patch(f"/api/v1/orders/{order['id']}", json={"order_status": "COMPLETED"}, headers=su_headers)
+    assert invalid.status_code == 409
+    assert invalid.json()["detail"] == "Order status cannot change from CANCELLED to COMPLETED"
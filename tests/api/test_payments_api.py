@@ -0,0 +1,178 @@
+import asyncio
+import httpx
+import pytest
+import time
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from app.core import metrics
+from app.core.payment_event_dedup import recent_payment_events
+from app.core.payment_intent_cache import payment_intent_cache
+from app.api.endpoints.payments import PaymentsClient, get_payments_client
+from app.crud import crud_order, crud_payment_event
+from app.main import app
+from app.schemas.order import OrderCreateInternal, OrderUpdate
+from app.models.order import Order
+from app.models.payment_event import PaymentWebhookEvent
+from tests.conftest import signed_stripe_event
+
+pytestmark = pytest.mark.api
+
+def _event(event_type: str = "payment_intent.succeeded") -> dict:
+    return {"id": f"evt_{uuid.uuid4().hex}", "type": event_type, "data": {"object": {"id": "pi_123", "amount_received": 1999, "currency": "usd"}}}
+
+def test_webhook_stores_verified_event(client: TestClient, db_session):
+    event = _event()
+    body, headers = signed_stripe_event(event)
+    response = client.post("/api/v1/payments/webhook", content=body, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"received": True}
+
+    [stored] = db_session.query(PaymentWebhookEvent).all()
+    assert (stored.event_id, stored.event_type, stored.payload) == (event["id"], event["type"], body)
+
+    # A redelivery while it is still pending is acknowledged and stored once
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 200
+    assert crud_payment_event.get_pending_count(db_session) == 1
+
+def test_webhook_rejects_bad_signatures(client: TestClient, db_session):
+    body, headers = signed_stripe_event(_event(), secret="whsec_someone_else")
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 400
+
+    body, headers = signed_stripe_event(_event(), timestamp=int(time.time()) - 3600) # Replayed
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 400
+
+    assert client.post("/api/v1/payments/webhook", content=body).status_code == 400 # Unsigned
+    assert crud_payment_event.get_pending_count(db_session) == 0
+
+def test_webhook_acknowledges_unhandled_event_types_without_storing(client: TestClient, db_session):
+    body, headers = signed_stripe_event(_event("customer.created"))
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 200
+    assert crud_payment_event.get_pending_count(db_session) == 0
+
+def test_webhook_redeliveries_are_acknowledged_without_storing(client: TestClient, db_session, webhook_worker):
+    body, headers = signed_stripe_event(_event())
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 200
+    asyncio.run(webhook_worker.drain()) # Processed: the pending row is gone
+    duplicates = metrics.get("payment_webhook_duplicates_total")
+
+    # Recent ids are caught in memory...
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 200
+    # ...older ones by the processed events table
+    recent_payment_events.clear()
+    assert client.post("/api/v1/payments/webhook", content=body, headers=headers).status_code == 200
+
+    assert crud_payment_event.get_pending_count(db_session) == 0
+    assert metrics.get("payment_webhook_duplicates_total") == duplicates + 2
+
+# --- Payment intents (POST /payments/create-payment-intent) ---
+def _order_for(db_session, reseller, product, **fields):
+    return crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email=f"cust_{uuid.uuid4().hex[:6]}@example.com", product_package_id=product.id, reseller_id=reseller.id,
+        price_paid=product.price, currency_paid="USD", duration_days_at_purchase=product.duration_days,
+        country_code_at_purchase=product.country_code, **fields
+    ))
+
+def test_create_payment_intent(client: TestClient, db_session, normal_user_token_headers, test_product, mock_stripe):
+    headers, user = normal_user_token_headers
+    order = _order_for(db_session, user, test_product)
+
+    response = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["payment_intent_id"] == "pi_mock_1" and data["client_secret"] == "pi_mock_1_secret_mock"
+    [request] = mock_stripe.requests
+    assert request["params"]["amount"] == "1999" and request["params"]["metadata[roamstop_order_id]"] == str(order.id)
+
+    db_session.expire_all()
+    updated = crud_order.get_order(db_session, order.id)
+    assert (updated.order_status, updated.stripe_payment_intent_id) == ("AWAITING_PAYMENT", "pi_mock_1")
+
+    assert request["idempotency_key"] == f"create-payment-intent:order-{order.id}:1999:usd:replacing-none"
+
+    # Asking again reuses the PaymentIntent, which is still awaiting payment: known
+    # from a moment ago, then checked with Stripe once the cached copy is gone
+    for _ in range(2):
+        response = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+        assert response.json()["payment_intent_id"] == "pi_mock_1"
+    assert [r["method"] for r in mock_stripe.requests] == ["POST"]
+    payment_intent_cache.clear()
+    response = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+    assert response.json()["payment_intent_id"] == "pi_mock_1"
+    assert [r["method"] for r in mock_stripe.requests] == ["POST", "GET"]
+
+def test_create_payment_intent_retries_and_replacements(client: TestClient, db_session, normal_user_token_headers, test_product, mock_stripe):
+    headers, user = normal_user_token_headers
+    order = _order_for(db_session, user, test_product)
+    first = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers).json()
+
+    # A retry whose first attempt never saved the intent on the order gets that same intent back from Stripe
+    db_session.expire_all()
+    crud_order.update_order(db_session, db_obj=crud_order.get_order(db_session, order.id), obj_in=OrderUpdate(stripe_payment_intent_id=None))
+    retried = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers).json()
+    assert retried["payment_intent_id"] == first["payment_intent_id"]
+    assert mock_stripe.created == 1
+
+    # An intent that can no longer be paid is replaced, under a new key
+    mock_stripe.payment_intents[first["payment_intent_id"]]["status"] = "canceled"
+    payment_intent_cache.clear()
+    replaced = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers).json()
+    assert replaced["payment_intent_id"] != first["payment_intent_id"]
+    assert mock_stripe.requests[-1]["idempotency_key"].endswith(f"replacing-{first['payment_intent_id']}")
+
+def test_create_payment_intent_order_changed_meanwhile(client: TestClient, db_session, normal_user_token_headers, test_product, mock_stripe, monkeypatch):
+    headers, user = normal_user_token_headers
+    order = _order_for(db_session, user, test_product)
+    get_order_async = crud_order.get_order_async
+
+    async def get_then_update(db, order_id):
+        # Another request updates the order while this one talks to Stripe
+        loaded = await get_order_async(db, order_id=order_id)
+        await db.execute(
+            update(Order).where(Order.id == order_id).values(version=Order.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        return loaded
+
+    monkeypatch.setattr(crud_order, "get_order_async", get_then_update)
+    response = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+    assert response.status_code == 409
+
+    db_session.expire_all()
+    assert crud_order.get_order(db_session, order.id).stripe_payment_intent_id is None
+
+def test_create_payment_intent_gateway_unreachable(client: TestClient, db_session, normal_user_token_headers, test_product):
+    from tests.mock_stripe import MockStripeServer
+    headers, user = normal_user_token_headers
+    order = _order_for(db_session, user, test_product)
+    with MockStripeServer() as server:
+        closed_url = server.url # Nothing listens there once the server is closed
+    app.dependency_overrides[get_payments_client] = lambda: PaymentsClient(
+        api_key="sk_test_mock", api_base=closed_url, max_network_retries=0, timeout_seconds=2
+    )
+    try:
+        response = client.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+    finally:
+        del app.dependency_overrides[get_payments_client]
+    assert response.status_code == 500
+    assert response.json()["detail"].startswith("Payment gateway error")
+
+def test_stripe_calls_do_not_block_the_event_loop(db_session, normal_user_token_headers, test_product, mock_stripe):
+    headers, user = normal_user_token_headers
+    orders = [_order_for(db_session, user, test_product) for _ in range(5)]
+    mock_stripe.latency_ms = 300
+
+    async def create_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(
+                http.post("/api/v1/payments/create-payment-intent", json={"order_id": order.id}, headers=headers)
+                for order in orders
+            ))
+
+    start = time.perf_counter()
+    responses = asyncio.run(create_all())
+    elapsed = time.perf_counter() - start
+    assert [r.status_code for r in responses] == [200] * 5
+    assert elapsed < 5 * 0.3 # The round trips overlap instead of queueing behind each other
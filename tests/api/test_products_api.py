@@ -123,6 +123,19 @@ def test_update_product_success_superuser(client: TestClient, test_product: Prod
     assert data["name"] == "Super Updated Name"
     assert data["price"] == "30.50"
 
+def test_public_reads_reflect_admin_update(client: TestClient, test_product: ProductPackageModel, superuser_token_headers: tuple):
+    headers, _ = superuser_token_headers
+    # Warm the catalog cache through the public endpoints
+    assert client.get(f"/api/v1/products/{test_product.id}").json()["name"] == test_product.name
+    assert client.get("/api/v1/products/countries/").json() == ["US"]
+
+    response = client.put(f"/api/v1/products/{test_product.id}", json={"name": "Renamed", "country_code": "DE"}, headers=headers)
+    assert response.status_code == 200
+
+    assert client.get(f"/api/v1/products/{test_product.id}").json()["name"] == "Renamed"
+    assert client.get("/api/v1/products/countries/").json() == ["DE"]
+    assert client.get("/api/v1/products/", params={"country_code": "US"}).json() == []
+
 def test_update_product_failure_normal_user(client: TestClient, test_product: ProductPackageModel, normal_user_token_headers: tuple):
     headers, _ = normal_user_token_headers
     update_data = {"name": "Normal User Update Fail"}
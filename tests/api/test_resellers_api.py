@@ -1,6 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
 import uuid
+from decimal import Decimal
+
+from app.crud import crud_order, crud_reseller
+from app.schemas.order import OrderCreateInternal
+from tests.conftest import create_recruited_reseller
 
 # from app.schemas.reseller import ResellerCreate # Not directly used if constructing dicts
 # from app.crud import crud_reseller # For pre-populating data if needed via CRUD
@@ -128,3 +133,80 @@ def test_register_reseller_with_nonexistent_recruiter(client: TestClient, db_ses
     response_recruit = client.post("/api/v1/resellers/register", json=recruit_data)
     assert response_recruit.status_code == 404 # As per current endpoint logic
     assert response_recruit.json()["detail"] == f"Recruiter with id {non_existent_recruiter_id} not found."
+
+
+def test_deactivating_reseller_invalidates_cached_principal(client: TestClient, db_session, normal_user_token_headers: tuple):
+    from app.crud import crud_reseller
+    from app.schemas.reseller import ResellerUpdate
+
+    headers, user = normal_user_token_headers
+    # First request resolves and caches the principal, the second is served from the cache
+    assert client.get("/api/v1/resellers/me", headers=headers).status_code == 200
+    assert client.get("/api/v1/resellers/me", headers=headers).status_code == 200
+
+    crud_reseller.update_reseller(db_session, db_obj=user, obj_in=ResellerUpdate(is_active=False))
+
+    response = client.get("/api/v1/resellers/me", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inactive user"
+
+def test_metrics_exposes_auth_cache_counters(client: TestClient, normal_user_token_headers: tuple):
+    headers, _ = normal_user_token_headers
+    client.get("/api/v1/resellers/me", headers=headers)
+    client.get("/api/v1/resellers/me", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "auth_cache_hits_total" in response.text
+    assert "auth_cache_misses_total" in response.text
+
+def test_read_my_downline(client: TestClient, normal_user_token_headers: tuple):
+    headers, me = normal_user_token_headers
+
+    def register(recruiter_id: int) -> int:
+        response = client.post("/api/v1/resellers/register", json={
+            "email": f"down_{uuid.uuid4().hex[:8]}@example.com", "password": "password123",
+            "reseller_type": "MOBILE_FIELD", "recruiter_id": recruiter_id
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    level1 = register(me.id)
+    level2 = register(level1)
+    level3 = register(level2)
+
+    response = client.get("/api/v1/resellers/me/downline", headers=headers)
+    assert response.status_code == 200
+    assert [(m["id"], m["depth"]) for m in response.json()] == [(level1, 1), (level2, 2), (level3, 3)]
+
+    response = client.get("/api/v1/resellers/me/downline", params={"max_depth": 2}, headers=headers)
+    assert [m["id"] for m in response.json()] == [level1, level2]
+
+def test_read_my_downline_unauthenticated(client: TestClient):
+    assert client.get("/api/v1/resellers/me/downline").status_code == 401
+
+def test_read_my_team_volume(client: TestClient, db_session, normal_user_token_headers: tuple, test_product):
+    headers, me = normal_user_token_headers
+    recruit = create_recruited_reseller(db_session, crud_reseller.get_reseller(db_session, me.id))
+    for seller, price in ((me, "19.99"), (recruit, "10.00"), (recruit, "5.00")):
+        crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+            customer_email="c@example.com", product_package_id=test_product.id, reseller_id=seller.id,
+            price_paid=Decimal(price), currency_paid="USD", duration_days_at_purchase=30,
+            country_code_at_purchase="US", order_status="COMPLETED"
+        ))
+
+    response = client.get("/api/v1/resellers/me/team-volume", params={"by_period": False}, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["reseller_id"] == me.id
+    assert [(r["depth"], r["order_count"], Decimal(r["revenue"])) for r in data["rows"]] == [
+        (0, 1, Decimal("19.99")), (1, 2, Decimal("15.00"))
+    ]
+
+    response = client.get(
+        "/api/v1/resellers/me/team-volume", params={"include_self": False, "by_depth": False}, headers=headers
+    )
+    assert [(r["depth"], r["order_count"]) for r in response.json()["rows"]] == [(None, 2)]
+
+def test_read_my_team_volume_unauthenticated(client: TestClient):
+    assert client.get("/api/v1/resellers/me/team-volume").status_code == 401
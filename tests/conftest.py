@@ -1,6 +1,9 @@
 import pytest
+import pytest_asyncio
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 import os
 
@@ -10,8 +13,14 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 
 from app.main import app
+from app.core import config, security
 from app.db.base_class import Base
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db, to_async_database_uri
+from app.core.auth_cache import principal_cache
+from app.core.catalog_cache import catalog_cache
+from app.core.commission_rules import commission_rules_cache
+from app.core.payment_event_dedup import recent_payment_events
+from app.core.payment_intent_cache import payment_intent_cache
 # We will use the actual DATABASE_URL from config for now,
 # but ideally, this should point to a separate test database.
 # For simplicity in this exercise, we use a file-based SQLite DB.
@@ -26,6 +35,13 @@ engine = create_engine(
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine on the same test database for the AsyncSession-based endpoints.
+# NullPool: each TestClient runs its own event loop, so connections must not be reused across tests.
+async_engine = create_async_engine(
+    to_async_database_uri(TEST_SQLALCHEMY_DATABASE_URL), connect_args={"check_same_thread": False}, poolclass=NullPool
+)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 
 # Apply migrations to the test database (or create all tables)
 # This ensures the test DB has the latest schema
@@ -39,7 +55,40 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+
+# The outbox worker would run against the app's database: tests drain the outbox
+# explicitly instead (see outbox_worker)
+config.COMMISSION_OUTBOX_WORKER_ENABLED = False
+# Likewise the Stripe webhook worker (see webhook_worker); webhooks are signed with this test secret
+config.PAYMENT_WEBHOOK_WORKER_ENABLED = False
+config.STRIPE_WEBHOOK_SECRET = "whsec_test_secret"
+# Nor purge the app database's expired rows (see test_idempotency, test_payment_webhooks)
+config.IDEMPOTENCY_KEY_PURGE_ENABLED = False
+config.PROCESSED_PAYMENT_EVENT_PURGE_ENABLED = False
+# Each TestClient's shutdown stops the password hashing pool, and a new one would be spawned
+# for the next test: hash on threads instead (test_security covers the pool)
+security.PASSWORD_HASH_WORKERS = 0
+
+@pytest.fixture(autouse=True)
+def clear_in_process_caches():
+    # Ids are reused once tables are recreated, so never carry cached principals or products across tests
+    principal_cache.clear()
+    catalog_cache.clear()
+    commission_rules_cache.clear()
+    recent_payment_events.clear()
+    payment_intent_cache.clear()
+    yield
+    principal_cache.clear()
+    catalog_cache.clear()
+    commission_rules_cache.clear()
+    recent_payment_events.clear()
+    payment_intent_cache.clear()
 
 @pytest.fixture(scope="session")
 def test_engine():
@@ -72,6 +121,54 @@ def db_session(test_engine):
     # The drop_all() at the beginning of the fixture ensures isolation between tests.
 
 
+@pytest_asyncio.fixture(scope="function")
+async def async_db_session(db_session: Session):
+    """
+    AsyncSession on the test database, for exercising the async CRUD variants.
+    Depends on db_session so the tables are freshly recreated for the test.
+    """
+    async with TestingAsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def outbox_worker():
+    # Commission outbox worker on the test database; call `await outbox_worker.drain()`
+    from app.core.commission_outbox import CommissionOutboxWorker
+    return CommissionOutboxWorker(TestingAsyncSessionLocal, retry_base_seconds=0)
+
+@pytest.fixture
+def webhook_worker():
+    # Stripe webhook worker on the test database; call `await webhook_worker.drain()`
+    from app.core.payment_webhooks import PaymentWebhookWorker
+    return PaymentWebhookWorker(TestingAsyncSessionLocal, retry_base_seconds=0)
+
+@pytest.fixture
+def mock_stripe():
+    """
+    A local mock of the Stripe API (tests/mock_stripe.py) that the payment endpoints
+    call instead of Stripe's. Set mock_stripe.latency_ms to slow it down.
+    """
+    from app.api.endpoints.payments import PaymentsClient, get_payments_client
+    from tests.mock_stripe import MockStripeServer
+    with MockStripeServer() as server:
+        payments = PaymentsClient(api_key="sk_test_mock", api_base=server.url, max_network_retries=0)
+        app.dependency_overrides[get_payments_client] = lambda: payments
+        try:
+            yield server
+        finally:
+            del app.dependency_overrides[get_payments_client]
+
+def signed_stripe_event(event: dict, *, secret: str = None, timestamp: int = None):
+    """
+    Body and headers of a webhook request for `event`, signed the way Stripe signs them.
+    """
+    import json, stripe, time
+    body = json.dumps(event)
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    signature = stripe.WebhookSignature._compute_signature(f"{timestamp}.{body}", secret or config.STRIPE_WEBHOOK_SECRET)
+    return body, {"Stripe-Signature": f"t={timestamp},v1={signature}", "Content-Type": "application/json"}
+
 @pytest.fixture(scope="function") # Changed client to function scope for better isolation
 def client():
     # The TestClient uses the app with the overridden get_db dependency
@@ -0,0 +1,54 @@
+import time
+import pytest
+
+from app.core import metrics
+from app.core.auth_cache import PrincipalCache
+from app.schemas.token import Principal
+
+def _principal(reseller_id: int = 1, is_active: bool = True) -> Principal:
+    return Principal(id=reseller_id, email=f"user{reseller_id}@example.com", is_active=is_active, is_superuser=False)
+
+def test_get_put_counts_hits_and_misses():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    hits, misses = metrics.get("auth_cache_hits_total"), metrics.get("auth_cache_misses_total")
+
+    assert cache.get("token-a") is None
+    cache.put("token-a", _principal())
+    assert cache.get("token-a") == _principal()
+
+    assert metrics.get("auth_cache_hits_total") == hits + 1
+    assert metrics.get("auth_cache_misses_total") == misses + 1
+
+def test_lru_eviction_beyond_max_size():
+    cache = PrincipalCache(max_size=2, ttl_seconds=60)
+    cache.put("t1", _principal(1))
+    cache.put("t2", _principal(2))
+    cache.get("t1") # t1 is now most recently used
+    cache.put("t3", _principal(3))
+
+    assert len(cache) == 2
+    assert cache.get("t2") is None
+    assert cache.get("t1") is not None
+    assert cache.get("t3") is not None
+
+def test_entry_never_outlives_token_exp():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.put("expired", _principal(), token_exp=time.time() - 1)
+    assert cache.get("expired") is None
+
+    cache.put("short", _principal(), token_exp=time.time() + 0.05)
+    assert cache.get("short") is not None
+    time.sleep(0.1)
+    assert cache.get("short") is None
+
+def test_invalidate_reseller_drops_all_its_tokens():
+    cache = PrincipalCache(max_size=10, ttl_seconds=60)
+    cache.put("a1", _principal(1))
+    cache.put("a2", _principal(1))
+    cache.put("b1", _principal(2))
+
+    cache.invalidate_reseller(1)
+
+    assert cache.get("a1") is None
+    assert cache.get("a2") is None
+    assert cache.get("b1") is not None
@@ -0,0 +1,99 @@
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from app.core import metrics
+from app.core.catalog_cache import ProductCatalogCache
+from app.schemas.product import ProductPackage
+
+def _product(product_id: int = 1, country_code: str = "US", is_active: bool = True, name: str = "P") -> ProductPackage:
+    return ProductPackage(
+        id=product_id, name=f"{name}{product_id}", duration_days=30, country_code=country_code,
+        price=Decimal("10.00"), direct_commission_rate_or_amount=Decimal("1.00"),
+        recruitment_commission_rate_or_amount=Decimal("0.50"), is_active=is_active,
+        created_at=datetime(2024, 1, 1), updated_at=datetime(2024, 1, 1),
+    )
+
+def test_get_put_counts_hits_and_misses():
+    cache = ProductCatalogCache(max_size=10, ttl_seconds=60)
+    hits, misses = metrics.get("catalog_cache_hits_total"), metrics.get("catalog_cache_misses_total")
+
+    assert cache.get_product(1) is None
+    cache.put_product(_product(1), cache.generation)
+    assert cache.get_product(1) == _product(1)
+
+    assert metrics.get("catalog_cache_hits_total") == hits + 1
+    assert metrics.get("catalog_cache_misses_total") == misses + 1
+
+def test_lru_eviction_beyond_max_size():
+    cache = ProductCatalogCache(max_size=2, ttl_seconds=60)
+    for product_id in (1, 2):
+        cache.put_product(_product(product_id), cache.generation)
+    cache.get_product(1) # 1 is now most recently used
+    cache.put_product(_product(3), cache.generation)
+
+    assert len(cache) == 2
+    assert cache.get_product(2) is None
+    assert cache.get_product(1) is not None
+
+def test_country_list_longer_than_max_size_is_not_cached():
+    cache = ProductCatalogCache(max_size=2, ttl_seconds=60)
+    cache.put_country("us", [_product(i) for i in range(3)], cache.generation)
+    assert cache.get_country("US") is None
+
+def test_country_lists_share_max_size():
+    cache = ProductCatalogCache(max_size=4, ttl_seconds=60)
+    cache.put_country("us", [_product(1), _product(2)], cache.generation)
+    cache.put_country("fr", [_product(3, "FR")], cache.generation)
+    cache.put_country("zz", [], cache.generation) # Counts as one
+    assert cache.get_country("US") is not None # Most recently used
+
+    cache.put_country("de", [_product(4, "DE"), _product(5, "DE")], cache.generation)
+    assert cache.get_country("FR") is None and cache.get_country("ZZ") is None
+    assert cache.get_country("US") is not None and cache.get_country("DE") is not None
+
+def test_entries_expire_after_ttl():
+    cache = ProductCatalogCache(max_size=10, ttl_seconds=0.05)
+    cache.put_product(_product(1), cache.generation)
+    cache.put_active_countries(["US"], cache.generation)
+    time.sleep(0.1)
+    assert cache.get_product(1) is None
+    assert cache.get_active_countries() is None
+
+def test_product_saved_replaces_snapshot_and_drops_views():
+    cache = ProductCatalogCache(max_size=10, ttl_seconds=60)
+    cache.put_product(_product(1, "US"), cache.generation)
+    cache.put_country("US", [_product(1, "US")], cache.generation)
+    cache.put_country("CA", [_product(2, "CA")], cache.generation)
+    cache.put_active_countries(["CA", "US"], cache.generation)
+
+    cache.product_saved(_product(1, "GB"), previous_country_code="US")
+
+    assert cache.get_product(1).country_code == "GB"
+    assert cache.get_country("US") is None
+    assert cache.get_country("CA") is not None
+    assert cache.get_active_countries() is None
+
+def test_product_deleted_drops_snapshot():
+    cache = ProductCatalogCache(max_size=10, ttl_seconds=60)
+    cache.put_product(_product(1), cache.generation)
+    cache.put_country("US", [_product(1)], cache.generation)
+    cache.product_deleted(1, "US")
+    assert cache.get_product(1) is None
+    assert cache.get_country("US") is None
+
+def test_put_after_concurrent_write_is_discarded():
+    cache = ProductCatalogCache(max_size=10, ttl_seconds=60)
+    generation = cache.generation # reader starts its database read
+    cache.product_deleted(1, "US") # a write lands meanwhile
+    cache.put_product(_product(1), generation)
+    cache.put_country("US", [_product(1)], generation)
+    assert cache.get_product(1) is None
+    assert cache.get_country("US") is None
+
+def test_zero_max_size_disables_cache():
+    cache = ProductCatalogCache(max_size=0, ttl_seconds=60)
+    cache.put_product(_product(1), cache.generation)
+    cache.put_active_countries(["US"], cache.generation)
+    assert cache.get_product(1) is None
+    assert cache.get_active_countries() is None
@@ -0,0 +1,142 @@
+import pytest
+import uuid
+from decimal import Decimal
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from app.core import config
+from app.core.commission_backfill import backfill_range, run_backfill, split_id_range
+from app.core.commissions_calculator import build_commissions
+from app.crud import crud_commission, crud_order, crud_product, crud_reseller, crud_team_volume
+from app.models.commission import Commission as CommissionModel
+from app.models.order import Order as OrderModel
+from app.models.sales_rollup import ResellerSalesRollup
+from app.schemas.order import OrderCreateInternal
+from app.schemas.product import ProductPackageUpdate
+from app.schemas.reseller import ResellerCreate
+from tests.conftest import TEST_SQLALCHEMY_DATABASE_URL
+
+pytestmark = pytest.mark.crud
+
+@pytest.fixture
+def completed_orders(db_session: Session, test_product):
+    # Three-level chain, the bottom seller with 5 completed orders and no commissions recorded
+    top = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"top_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A"
+    ))
+    middle = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"mid_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A", recruiter_id=top.id
+    ))
+    seller = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"sel_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A", recruiter_id=middle.id
+    ))
+    orders = [
+        crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+            customer_email=f"c{i}@example.com", product_package_id=test_product.id, reseller_id=seller.id,
+            price_paid=test_product.price, currency_paid="USD", duration_days_at_purchase=30,
+            country_code_at_purchase="US", order_status=status
+        ))
+        for i, status in enumerate(["COMPLETED", "COMPLETED", "PENDING_PAYMENT", "COMPLETED", "COMPLETED", "COMPLETED"])
+    ]
+    return [order for order in orders if order.order_status == "COMPLETED"]
+
+def _recorded(db_session: Session) -> set:
+    db_session.expire_all()
+    return {
+        (c.order_id, c.reseller_id, c.commission_type, c.amount, c.commission_status)
+        for c in db_session.query(CommissionModel).all()
+    }
+
+def _expected(db_session: Session, orders) -> set:
+    return {
+        (c.order_id, c.reseller_id, c.commission_type, c.amount, c.commission_status)
+        for order in orders for c in build_commissions(db_session, crud_order.get_order(db_session, order.id))
+    }
+
+def test_backfill_records_what_the_live_calculator_would(db_session: Session, completed_orders, monkeypatch):
+    monkeypatch.setattr(config, "UPLINE_COMMISSION_TIER_AMOUNTS", [Decimal("0.25")])
+    statements = []
+    engine = db_session.get_bind()
+    count = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        report = backfill_range(db_session, chunk_size=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+    # 5 orders, each: DIRECT_SALE, RECRUITMENT_TIER_1 and RECRUITMENT_TIER_2
+    assert (report.orders, report.missing, report.inserted) == (5, 15, 15)
+    assert _recorded(db_session) == _expected(db_session, completed_orders)
+    # Chunks of 2 orders -> 3 chunks plus the final empty read, whatever the chunk size
+    assert sum(s.lstrip().upper().startswith(("SELECT", "WITH")) for s in statements) <= 4 * 3 + 1
+
+    # Idempotent
+    again = backfill_range(db_session)
+    assert (again.missing, again.inserted, again.changed, again.stale) == (0, 0, 0, 0)
+
+def test_backfill_dry_run_reports_diff_and_writes_nothing(db_session: Session, completed_orders, test_product):
+    backfill_range(db_session)
+    crud_product.update_product(db_session, db_obj=test_product, obj_in=ProductPackageUpdate(
+        direct_commission_rate_or_amount=Decimal("3.00")
+    ))
+    before = _recorded(db_session)
+
+    report = backfill_range(db_session, first_id=completed_orders[1].id, dry_run=True, replace_unpaid=True)
+    assert report.orders == 4
+    assert report.changed == 4 and report.missing == 0 and report.inserted == 0
+    assert {d.kind for d in report.diffs} == {"changed"}
+    assert report.diffs[0].calculated == (Decimal("3.00"), "USD")
+    assert _recorded(db_session) == before
+
+def test_backfill_replaces_only_unpaid_commissions(db_session: Session, completed_orders, test_product):
+    backfill_range(db_session)
+    paid = crud_commission.get_commissions_by_order_ids(db_session, order_ids=[completed_orders[0].id])
+    for commission in paid:
+        crud_commission.update_commission_status(db_session, commission_id=commission.id, status="PAID")
+    crud_product.update_product(db_session, db_obj=test_product, obj_in=ProductPackageUpdate(
+        direct_commission_rate_or_amount=Decimal("3.00")
+    ))
+
+    report = backfill_range(db_session, replace_unpaid=True)
+    assert (report.changed, report.locked, report.deleted, report.inserted) == (5, 1, 4, 4)
+    amounts = {
+        (c[0], c[2]): c[3] for c in _recorded(db_session) if c[2] == "DIRECT_SALE"
+    }
+    assert amounts.pop((completed_orders[0].id, "DIRECT_SALE")) == Decimal("2.50") # Paid: untouched
+    assert set(amounts.values()) == {Decimal("3.00")}
+
+    # The team volume rollup followed the deletes and inserts
+    rollup = {(r.reseller_id, r.commission_total) for r in db_session.query(ResellerSalesRollup).all()}
+    crud_team_volume.rebuild_sales_rollup(db_session)
+    db_session.expire_all()
+    assert {(r.reseller_id, r.commission_total) for r in db_session.query(ResellerSalesRollup).all()} == rollup
+
+def test_backfill_skips_orders_whose_product_is_gone(db_session: Session, completed_orders):
+    # First order of the chunk: its product was hard-deleted (order.product_package_id has no ondelete)
+    db_session.execute(update(OrderModel).where(OrderModel.id == completed_orders[0].id).values(product_package_id=999999))
+    db_session.commit()
+    report = backfill_range(db_session, chunk_size=100)
+    assert report.orders == len(completed_orders)
+    assert {c.order_id for c in db_session.query(CommissionModel).all()} == {o.id for o in completed_orders[1:]}
+
+def test_backfill_keeps_the_commissions_of_skipped_orders(db_session: Session, completed_orders):
+    backfill_range(db_session)
+    recorded = _recorded(db_session)
+    skipped = completed_orders[0]
+    assert {c[4] for c in recorded if c[0] == skipped.id} == {"UNPAID"}
+    # Its product was hard-deleted after the commissions were recorded
+    db_session.execute(update(OrderModel).where(OrderModel.id == skipped.id).values(product_package_id=999999))
+    db_session.commit()
+
+    report = backfill_range(db_session, replace_unpaid=True)
+    assert (report.stale, report.deleted, report.inserted) == (0, 0, 0)
+    assert _recorded(db_session) == recorded
+
+def test_split_id_range():
+    assert split_id_range(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+    assert split_id_range(5, 6, 4) == [(5, 5), (6, 6)]
+
+def test_run_backfill_across_worker_processes(db_session: Session, completed_orders):
+    report = run_backfill(workers=2, chunk_size=2, database_url=TEST_SQLALCHEMY_DATABASE_URL)
+    assert (report.orders, report.inserted) == (5, 10)
+    assert _recorded(db_session) == _expected(db_session, completed_orders)
@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+from app.core import commission_outbox, metrics
+from app.core.commission_outbox import update_order_and_enqueue_commissions
+from app.crud import crud_commission, crud_order, crud_outbox
+from app.models.commission_outbox import CommissionOutbox
+from app.schemas.order import OrderCreateInternal, OrderUpdate
+from tests.conftest import create_recruited_reseller
+
+pytestmark = pytest.mark.crud
+
+@pytest.fixture
+def pending_order(db_session: Session, test_normal_user, test_product):
+    seller = create_recruited_reseller(db_session, recruiter=test_normal_user)
+    return crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email=f"cust_{uuid.uuid4().hex[:4]}@example.com", product_package_id=test_product.id,
+        reseller_id=seller.id, price_paid=test_product.price, currency_paid="USD",
+        duration_days_at_purchase=test_product.duration_days, country_code_at_purchase=test_product.country_code,
+    ))
+
+def _complete(db_session: Session, order):
+    return update_order_and_enqueue_commissions(db_session, db_obj=order, obj_in=OrderUpdate(order_status="COMPLETED"))
+
+def _entries(db_session: Session):
+    db_session.expire_all()
+    return db_session.query(CommissionOutbox).all()
+
+def test_completion_enqueues_in_the_same_transaction(db_session: Session, pending_order):
+    _complete(db_session, pending_order)
+    assert [entry.order_id for entry in _entries(db_session)] == [pending_order.id]
+    assert crud_commission.get_commissions_by_order_id(db_session, order_id=pending_order.id) == []
+
+    # Completing again, or other status changes, queue nothing more
+    update_order_and_enqueue_commissions(db_session, db_obj=pending_order, obj_in=OrderUpdate(esim_provisioning_status="DONE"))
+    assert len(_entries(db_session)) == 1
+
+def test_failed_enqueue_rolls_back_status_change(db_session: Session, pending_order, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("outbox unavailable")
+    monkeypatch.setattr(crud_outbox, "enqueue_commission_calculation", fail)
+    with pytest.raises(RuntimeError):
+        _complete(db_session, pending_order)
+    db_session.expire_all()
+    assert crud_order.get_order(db_session, pending_order.id).order_status == "PENDING_PAYMENT"
+    assert _entries(db_session) == []
+
+@pytest.mark.asyncio
+async def test_worker_records_commissions_and_clears_entry(db_session: Session, pending_order, outbox_worker):
+    _complete(db_session, pending_order)
+    processed_before = metrics.get("commission_outbox_processed_total")
+
+    assert await outbox_worker.drain() == 1
+    commissions = crud_commission.get_commissions_by_order_id(db_session, order_id=pending_order.id)
+    assert {c.commission_type for c in commissions} == {"DIRECT_SALE", "RECRUITMENT_TIER_1"}
+    assert _entries(db_session) == []
+    assert metrics.get("commission_outbox_processed_total") == processed_before + 1
+
+@pytest.mark.asyncio
+async def test_worker_retries_failures_with_backoff(db_session: Session, pending_order, outbox_worker, monkeypatch):
+    _complete(db_session, pending_order)
+    real = commission_outbox.calculate_and_record_commissions
+    calls = []
+
+    async def flaky(db, order):
+        calls.append(order.id)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        await real(db, order)
+    monkeypatch.setattr(commission_outbox, "calculate_and_record_commissions", flaky)
+
+    # retry_base_seconds=0: the failed entry is due again straight away
+    assert await outbox_worker.drain() == 2
+    assert calls == [pending_order.id, pending_order.id]
+    assert len(crud_commission.get_commissions_by_order_id(db_session, order_id=pending_order.id)) == 2
+    assert _entries(db_session) == []
+
+    outbox_worker.retry_base_seconds, outbox_worker.retry_max_seconds = 2, 30
+    assert [outbox_worker.retry_delay(attempts) for attempts in (1, 2, 3, 10)] == [2, 4, 8, 30]
+
+@pytest.mark.asyncio
+async def test_worker_parks_entry_after_max_attempts(db_session: Session, pending_order, outbox_worker, monkeypatch):
+    _complete(db_session, pending_order)
+
+    async def broken(db, order):
+        raise RuntimeError("permanent")
+    monkeypatch.setattr(commission_outbox, "calculate_and_record_commissions", broken)
+    outbox_worker.max_attempts = 3
+
+    assert await outbox_worker.drain() == 3
+    [entry] = _entries(db_session)
+    assert (entry.attempts, entry.available_at, entry.locked_until) == (3, None, None)
+    assert "permanent" in entry.last_error
+
+@pytest.mark.asyncio
+async def test_entries_of_a_crashed_worker_resume_after_lease(db_session: Session, pending_order, outbox_worker):
+    _complete(db_session, pending_order)
+    # A worker claims the entry, then dies before processing it
+    [claimed] = crud_outbox.claim_due_entries(db_session, limit=10, lease_seconds=60)
+    assert claimed.order_id == pending_order.id and claimed.attempts == 1
+
+    assert await outbox_worker.run_once() == 0 # Still leased
+    [resumed] = crud_outbox.claim_due_entries(db_session, limit=10, lease_seconds=60, now=datetime.utcnow() + timedelta(seconds=61))
+    assert (resumed.id, resumed.attempts) == (claimed.id, 2)
+
+@pytest.mark.asyncio
+async def test_running_worker_is_woken_by_notify(db_session: Session, pending_order, outbox_worker):
+    outbox_worker.poll_seconds = 60 # Only notify() can make it look again in time
+    await outbox_worker.start()
+    try:
+        await asyncio.sleep(0.05) # First, empty, poll
+        _complete(db_session, pending_order)
+        outbox_worker.notify()
+        for _ in range(100):
+            if not _entries(db_session):
+                break
+            await asyncio.sleep(0.02)
+        assert _entries(db_session) == []
+        assert crud_commission.get_commissions_by_order_id(db_session, order_id=pending_order.id) != []
+    finally:
+        await outbox_worker.stop()
+    assert not outbox_worker.running
@@ -0,0 +1,108 @@
+import pytest
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from sqlalchemy.orm import Session
+
+from app.core import config, metrics
+from app.core.commission_backfill import backfill_range
+from app.core.commission_rules import commission_rules_cache, compile_rules
+from app.core.commissions_calculator import build_commissions
+from app.crud import crud_commission, crud_order, crud_product, crud_reseller
+from app.schemas.order import OrderCreateInternal
+from app.schemas.product import ProductPackageCreate, ProductPackageUpdate
+from app.schemas.reseller import ResellerCreate
+
+def _product(**fields):
+    defaults = dict(
+        id=1, updated_at=datetime(2026, 1, 1), commission_rules=None,
+        direct_commission_rate_or_amount=Decimal("2.50"), recruitment_commission_rate_or_amount=Decimal("1.00"),
+    )
+    return SimpleNamespace(**{**defaults, **fields})
+
+def test_legacy_fields_compile_to_fixed_amounts(monkeypatch):
+    monkeypatch.setattr(config, "UPLINE_COMMISSION_TIER_AMOUNTS", [Decimal("0.50")])
+    rules = compile_rules(_product())
+    assert rules.direct(Decimal("100"), "ANY") == (
+        Decimal("2.50"), {"type": "fixed_amount", "source_field": "direct_commission_rate_or_amount", "value": 2.5}
+    )
+    assert rules.upline_depth == 2 and rules.pays_upline
+    assert rules.tier(1, Decimal("100"), "ANY") == (
+        Decimal("1.00"), {"type": "fixed_amount", "source_field": "recruitment_commission_rate_or_amount", "tier": 1, "value": 1.0}
+    )
+    assert rules.tier(2, Decimal("100"), "ANY")[0] == Decimal("0.50")
+
+def test_percent_and_reseller_type_rules():
+    rules = compile_rules(_product(commission_rules={
+        "direct": {"type": "percent", "percent": "12.5"},
+        "recruitment": {
+            "type": "by_reseller_type",
+            "rules": {"VENUE_PARTNER": {"type": "percent", "percent": "5"}, "MOBILE_FIELD": {"type": "fixed", "amount": "3"}},
+        },
+    }))
+    amount, details = rules.direct(Decimal("19.99"), "MOBILE_FIELD")
+    assert amount == Decimal("2.50") # 2.49875 rounded half up to the cent
+    assert details["type"] == "percent_of_price" and details["base_amount"] == 19.99
+    assert rules.tier(1, Decimal("19.99"), "VENUE_PARTNER")[0] == Decimal("1.00")
+    assert rules.tier(1, Decimal("19.99"), "MOBILE_FIELD")[0] == Decimal("3")
+    assert rules.tier(1, Decimal("19.99"), "OTHER") == (Decimal(0), {}) # No default: nothing
+    assert rules.pays_upline
+
+    nothing = compile_rules(_product(
+        recruitment_commission_rate_or_amount=Decimal("0"),
+        commission_rules={"recruitment": {"type": "by_reseller_type", "rules": {}, "default": {"type": "fixed", "amount": "0"}}},
+    ))
+    assert not nothing.pays_upline
+
+def test_cache_compiles_once_per_product_version():
+    product = _product()
+    misses = metrics.get("commission_rules_cache_misses_total")
+    first = commission_rules_cache.get(product)
+    assert commission_rules_cache.get(product) is first
+    assert metrics.get("commission_rules_cache_misses_total") == misses + 1
+
+    # Terms changed by another process are recompiled, even within the same updated_at second
+    product.direct_commission_rate_or_amount = Decimal("4.00")
+    assert commission_rules_cache.get(product).direct(Decimal("10"), None)[0] == Decimal("4.00")
+    product.commission_rules = {"direct": {"type": "percent", "percent": "10"}}
+    assert commission_rules_cache.get(product).direct(Decimal("50"), None)[0] == Decimal("5.00")
+    assert commission_rules_cache.get(product) is commission_rules_cache.get(product)
+
+def test_product_update_invalidates_compiled_rules(db_session: Session, test_product):
+    assert commission_rules_cache.get(test_product).direct(test_product.price, None)[0] == Decimal("2.50")
+    crud_product.update_product(db_session, db_obj=test_product, obj_in=ProductPackageUpdate(
+        commission_rules={"direct": {"type": "percent", "percent": "10"}}
+    ))
+    assert commission_rules_cache.get(test_product).direct(Decimal("19.99"), None)[0] == Decimal("2.00")
+
+def test_live_and_batch_paths_apply_the_rules(db_session: Session):
+    recruiter = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"rec_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="VENUE_PARTNER"
+    ))
+    seller = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"sel_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="MOBILE_FIELD", recruiter_id=recruiter.id
+    ))
+    product = crud_product.create_product(db_session, obj_in=ProductPackageCreate(
+        name="Rules Product", duration_days=30, country_code="US", price=Decimal("40.00"),
+        direct_commission_rate_or_amount=Decimal("0"), recruitment_commission_rate_or_amount=Decimal("0"),
+        commission_rules={
+            "direct": {"type": "percent", "percent": "10"},
+            "recruitment": {"type": "by_reseller_type", "rules": {"VENUE_PARTNER": {"type": "fixed", "amount": "1.50"}}},
+        },
+    ))
+    order = crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email="c@example.com", product_package_id=product.id, reseller_id=seller.id, price_paid=product.price,
+        currency_paid="USD", duration_days_at_purchase=30, country_code_at_purchase="US", order_status="COMPLETED"
+    ))
+
+    loaded = crud_order.get_order(db_session, order.id)
+    lookups = metrics.get("commission_rules_cache_hits_total") + metrics.get("commission_rules_cache_misses_total")
+    live = {(c.commission_type, c.amount) for c in build_commissions(db_session, loaded)}
+    # One lookup of the compiled rules per order
+    assert metrics.get("commission_rules_cache_hits_total") + metrics.get("commission_rules_cache_misses_total") == lookups + 1
+    assert live == {("DIRECT_SALE", Decimal("4.00")), ("RECRUITMENT_TIER_1", Decimal("1.50"))}
+
+    backfill_range(db_session)
+    recorded = crud_commission.get_commissions_by_order_ids(db_session, order_ids=[order.id])
+    assert {(c.commission_type, c.amount) for c in recorded} == live
@@ -1,9 +1,12 @@
 import pytest
+from sqlalchemy import event
 from sqlalchemy.orm import Session, joinedload
 from decimal import Decimal
 import uuid
 
-from app.core.commissions_calculator import calculate_and_record_commissions
+from app.core import config
+from app.core.commission_outbox import update_order_and_enqueue_commissions
+from app.core.commissions_calculator import build_commissions, calculate_and_record_commissions
 from app.models.order import Order as OrderModel
 from app.models.reseller import ResellerProfile as ResellerProfileModel
 from app.models.product import ProductPackage as ProductPackageModel
@@ -11,8 +14,8 @@ from app.models.commission import Commission as CommissionModel
 from app.crud import crud_reseller, crud_product, crud_order, crud_commission
 from app.schemas.reseller import ResellerCreate
 from app.schemas.product import ProductPackageCreate
-from app.schemas.order import OrderCreateInternal
-from tests.conftest import create_recruited_reseller # Helper from conftest
+from app.schemas.order import OrderCreateInternal, OrderUpdate
+from tests.conftest import async_engine, create_recruited_reseller # Helper from conftest
 
 pytestmark = pytest.mark.crud # Or pytest.mark.core
 
@@ -190,3 +193,65 @@ async def test_commission_calculator_loads_product_and_reseller_if_not_eager(db_
     assert direct_comm.reseller_id == reseller_a.id
     assert direct_comm.commission_type == "DIRECT_SALE"
     assert direct_comm.amount == product_direct_commission.direct_commission_rate_or_amount
+
+def _pending_order(db: Session, seller: ResellerProfileModel, product: ProductPackageModel) -> OrderModel:
+    order = crud_order.create_order(db=db, obj_in=OrderCreateInternal(
+        customer_email=f"cust_{uuid.uuid4().hex[:4]}@example.com", product_package_id=product.id,
+        reseller_id=seller.id, price_paid=product.price, currency_paid="USD",
+        duration_days_at_purchase=product.duration_days, country_code_at_purchase=product.country_code,
+        order_status="PENDING_PAYMENT"
+    ))
+    return crud_order.get_order(db, order.id)
+
+@pytest.mark.asyncio
+async def test_commissions_inserted_with_one_statement(db_session: Session, reseller_b_recruited_by_a: ResellerProfileModel, product_both_commissions: ProductPackageModel, outbox_worker):
+    order = _pending_order(db_session, reseller_b_recruited_by_a, product_both_commissions)
+    updated = update_order_and_enqueue_commissions(db_session, db_obj=order, obj_in=OrderUpdate(order_status="COMPLETED"))
+    assert updated.order_status == "COMPLETED"
+    inserts = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO COMMISSION ("):
+            inserts.append(statement)
+
+    # The outbox worker records them, on the async engine
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        assert await outbox_worker.drain() == 1
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+
+    assert len(inserts) == 1
+    assert len(crud_commission.get_commissions_by_order_id(db_session, order_id=order.id)) == 2
+
+def test_upline_tiers_paid_from_one_query(db_session: Session, product_both_commissions: ProductPackageModel, monkeypatch):
+    monkeypatch.setattr(config, "UPLINE_COMMISSION_TIER_AMOUNTS", [Decimal("2.00"), Decimal("1.00"), Decimal("0.50")])
+    chain = [crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"tier_top_{uuid.uuid4().hex[:4]}@example.com", password="password", reseller_type="TYPE_A"
+    ))]
+    for _ in range(4):
+        chain.append(create_recruited_reseller(db_session, recruiter=chain[-1]))
+    seller, tier1, tier2, tier3, tier4 = reversed(chain)
+    tier2.is_active = False # Skipped without shifting the tiers above it
+    db_session.commit()
+
+    order = _pending_order(db_session, seller, product_both_commissions)
+    selects = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            selects.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", capture)
+    try:
+        commissions = build_commissions(db_session, order)
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", capture)
+
+    assert len(selects) == 1
+    assert [(c.reseller_id, c.commission_type, c.amount) for c in commissions] == [
+        (seller.id, "DIRECT_SALE", product_both_commissions.direct_commission_rate_or_amount),
+        (tier1.id, "RECRUITMENT_TIER_1", product_both_commissions.recruitment_commission_rate_or_amount),
+        (tier3.id, "RECRUITMENT_TIER_3", Decimal("1.00")),
+        (tier4.id, "RECRUITMENT_TIER_4", Decimal("0.50")),
+    ]
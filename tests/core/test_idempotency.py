@@ -0,0 +1,66 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core import config, idempotency, metrics
+from app.crud import crud_idempotency, crud_order
+from app.main import app
+from app.schemas.order import OrderCreateInternal, OrderCreatePublic
+from tests.conftest import TestingAsyncSessionLocal
+
+def _order_in(product, reseller) -> OrderCreateInternal:
+    return OrderCreateInternal(
+        customer_email="retry@example.com", product_package_id=product.id, reseller_id=reseller.id,
+        price_paid=product.price, duration_days_at_purchase=product.duration_days, country_code_at_purchase=product.country_code,
+    )
+
+@pytest.mark.asyncio
+async def test_concurrent_request_with_same_key_gets_first_response(async_db_session, db_session: Session, test_product, test_normal_user):
+    request = OrderCreatePublic(customer_email="retry@example.com", product_package_id=test_product.id, reseller_id=test_normal_user.id)
+    first = await idempotency.create_order(
+        async_db_session, scope="orders:public", key="k1", request=request, obj_in=_order_in(test_product, test_normal_user)
+    )
+    # As if the second request had checked for a stored response before the first committed
+    second = await idempotency.create_order(
+        async_db_session, scope="orders:public", key="k1", request=request, obj_in=_order_in(test_product, test_normal_user)
+    )
+    assert first.status_code == second.status_code == 201
+    assert second.headers[idempotency.REPLAYED_HEADER] == "true"
+    assert json.loads(second.body) == json.loads(first.body)
+    assert crud_order.get_order_count_for_customer(db_session, customer_email="retry@example.com") == 1
+
+def test_expired_keys_are_ignored_replaced_and_purged(db_session: Session):
+    values = dict(scope="orders:public", key="k1", fingerprint="f" * 64, status_code=201, response_body="{}")
+    crud_idempotency.save_key(db_session, ttl_seconds=60, **values)
+    assert crud_idempotency.get_key(db_session, scope="orders:public", key="k1") is not None
+    assert crud_idempotency.get_key(db_session, scope="orders:reseller:1", key="k1") is None
+
+    later = datetime.utcnow() + timedelta(seconds=61)
+    assert crud_idempotency.get_key(db_session, scope="orders:public", key="k1", now=later) is None
+    assert crud_idempotency.purge_expired_keys(db_session, now=later) == 1
+
+    crud_idempotency.save_key(db_session, ttl_seconds=0, **values) # Expires at once...
+    crud_idempotency.save_key(db_session, ttl_seconds=60, **dict(values, response_body='{"id": 2}')) # ...so the key can be reused
+    assert crud_idempotency.get_key(db_session, scope="orders:public", key="k1").response_body == '{"id": 2}'
+
+def test_expired_keys_are_purged_while_the_app_runs(db_session: Session, monkeypatch):
+    from fastapi.testclient import TestClient
+    monkeypatch.setattr(config, "IDEMPOTENCY_KEY_PURGE_ENABLED", True)
+    monkeypatch.setattr(idempotency.idempotency_key_purge, "_session_factory", TestingAsyncSessionLocal)
+    values = dict(scope="orders:public", fingerprint="f" * 64, status_code=201, response_body="{}")
+    crud_idempotency.save_key(db_session, key="expired", ttl_seconds=0, **values)
+    crud_idempotency.save_key(db_session, key="live", ttl_seconds=60, **values)
+    runs = metrics.get("idempotency_key_purge_runs_total")
+    purged = metrics.get("idempotency_key_purge_rows_total")
+
+    with TestClient(app):
+        assert idempotency.idempotency_key_purge.running
+        deadline = time.monotonic() + 5
+        while metrics.get("idempotency_key_purge_runs_total") == runs and time.monotonic() < deadline:
+            time.sleep(0.01) # The first run starts with the app
+    assert not idempotency.idempotency_key_purge.running
+    assert metrics.get("idempotency_key_purge_rows_total") == purged + 1
+    assert crud_idempotency.purge_expired_keys(db_session, now=datetime.utcnow() + timedelta(seconds=61)) == 1 # Only "live" was left
@@ -0,0 +1,21 @@
+import pytest
+
+from app.core.order_status import (
+    ORDER_STATUS_TRANSITIONS, InvalidOrderStatusTransitionError, can_transition, check_transition,
+)
+
+def test_declared_transitions():
+    assert can_transition("PENDING_PAYMENT", "AWAITING_PAYMENT")
+    assert can_transition("AWAITING_PAYMENT", "COMPLETED")
+    assert can_transition("FAILED_PAYMENT", "COMPLETED")
+    assert can_transition("COMPLETED", "REFUNDED")
+    assert can_transition("COMPLETED", "COMPLETED") # Not a change
+    assert not can_transition("COMPLETED", "AWAITING_PAYMENT")
+    assert not can_transition("PENDING_PAYMENT", "REFUNDED")
+    assert not can_transition("PENDING_PAYMENT", "NOT_A_STATUS")
+    assert not any(ORDER_STATUS_TRANSITIONS[final] for final in ("CANCELLED", "REFUNDED"))
+    # Every target is itself a declared status
+    assert set().union(*ORDER_STATUS_TRANSITIONS.values()) <= set(ORDER_STATUS_TRANSITIONS)
+
+    with pytest.raises(InvalidOrderStatusTransitionError, match="from CANCELLED to PROCESSING"):
+        check_transition("CANCELLED", "PROCESSING")
@@ -0,0 +1,83 @@
+import functools
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core import metrics
+from app.core.order_sweeper import sweep_stale_orders
+from app.core.periodic import PeriodicJob
+from app.crud import crud_order
+from app.models.order import Order
+from app.schemas.order import OrderCreateInternal
+from tests.conftest import TestingAsyncSessionLocal
+
+def _create_orders(
+    db: Session, product, reseller, count: int, *, status: str = "PENDING_PAYMENT", age: timedelta = timedelta(0), with_intent: bool = False
+):
+    order_ids = crud_order.insert_orders(db, objs_in=[
+        OrderCreateInternal(
+            customer_email=f"sweep_{uuid.uuid4().hex[:6]}@example.com", product_package_id=product.id,
+            reseller_id=reseller.id, price_paid=product.price, duration_days_at_purchase=product.duration_days,
+            country_code_at_purchase=product.country_code, order_status=status,
+            stripe_payment_intent_id=f"pi_{uuid.uuid4().hex}" if with_intent else None,
+        )
+        for _ in range(count)
+    ])
+    db.execute(update(Order).where(Order.id.in_(order_ids)).values(created_at=datetime.utcnow() - age))
+    db.commit()
+    return order_ids
+
+async def _sweep(**options) -> int:
+    async with TestingAsyncSessionLocal() as db:
+        return await sweep_stale_orders(db, max_age_seconds=24 * 3600, **options)
+
+def _statuses(db: Session, order_ids):
+    db.expire_all()
+    return {crud_order.get_order(db, order_id).order_status for order_id in order_ids}
+
+@pytest.mark.asyncio
+async def test_stale_unpaid_orders_are_cancelled_in_batches(db_session: Session, test_product, test_normal_user):
+    old = timedelta(days=2)
+    pending = _create_orders(db_session, test_product, test_normal_user, 5, age=old)
+    awaiting = _create_orders(db_session, test_product, test_normal_user, 2, status="AWAITING_PAYMENT", age=old)
+    completed = _create_orders(db_session, test_product, test_normal_user, 1, status="COMPLETED", age=old)
+    # Its PaymentIntent could still succeed
+    with_intent = _create_orders(db_session, test_product, test_normal_user, 1, status="AWAITING_PAYMENT", age=old, with_intent=True)
+    recent = _create_orders(db_session, test_product, test_normal_user, 1)
+    sweeper = PeriodicJob(
+        "order_sweeper", functools.partial(sweep_stale_orders, max_age_seconds=24 * 3600, batch_size=3, max_batches=10),
+        TestingAsyncSessionLocal, interval_seconds=300,
+    )
+    runs = metrics.get("order_sweeper_runs_total")
+    batches = metrics.get("order_sweeper_batches_total")
+    expired = metrics.get("order_sweeper_expired_total")
+
+    assert await sweeper.run_once() == 7
+    assert metrics.get("order_sweeper_batches_total") - batches == 3 # 3 + 3 + 1
+    assert metrics.get("order_sweeper_expired_total") - expired == 7
+    assert metrics.get("order_sweeper_runs_total") - runs == 1
+    assert _statuses(db_session, pending + awaiting) == {"CANCELLED"}
+    assert crud_order.get_order(db_session, pending[0]).version == 2
+    assert _statuses(db_session, completed) == {"COMPLETED"}
+    assert _statuses(db_session, with_intent) == {"AWAITING_PAYMENT"}
+    assert _statuses(db_session, recent) == {"PENDING_PAYMENT"}
+    assert await sweeper.run_once() == 0
+
+@pytest.mark.asyncio
+async def test_run_is_bounded_by_max_batches(db_session: Session, test_product, test_normal_user):
+    order_ids = _create_orders(db_session, test_product, test_normal_user, 5, age=timedelta(days=2))
+    assert await _sweep(batch_size=2, max_batches=2) == 4
+    assert await _sweep(batch_size=2, max_batches=2) == 1
+    assert _statuses(db_session, order_ids) == {"CANCELLED"}
+
+@pytest.mark.asyncio
+async def test_dry_run_only_counts(db_session: Session, test_product, test_normal_user):
+    order_ids = _create_orders(db_session, test_product, test_normal_user, 3, age=timedelta(days=2))
+    matched = metrics.get("order_sweeper_dry_run_matched_total")
+    assert await _sweep(batch_size=2, max_batches=1, dry_run=True) == 2 # Up to batch_size * max_batches
+    assert await _sweep(batch_size=2, max_batches=1, dry_run=True, now=datetime.utcnow() - timedelta(days=3)) == 0
+    assert metrics.get("order_sweeper_dry_run_matched_total") - matched == 2
+    assert _statuses(db_session, order_ids) == {"PENDING_PAYMENT"}
@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core import config, metrics
+from app.core.order_writer import OrderWriter, order_writer
+from app.crud import crud_order
+from app.main import app
+from app.schemas.order import OrderCreateInternal
+from tests.conftest import TestingAsyncSessionLocal
+
+def _order_in(product, reseller, **fields) -> OrderCreateInternal:
+    return OrderCreateInternal(**{
+        "customer_email": f"coalesced_{uuid.uuid4().hex[:6]}@example.com", "product_package_id": product.id,
+        "reseller_id": reseller.id, "price_paid": product.price, "duration_days_at_purchase": product.duration_days,
+        "country_code_at_purchase": product.country_code, **fields,
+    })
+
+@pytest.mark.asyncio
+async def test_submitted_orders_are_committed_in_batches(db_session: Session, test_product, test_normal_user):
+    writer = OrderWriter(TestingAsyncSessionLocal, max_batch_size=10, max_delay_ms=20)
+    await writer.start()
+    batches = metrics.get("order_writer_batches_total")
+    try:
+        orders_in = [_order_in(test_product, test_normal_user) for _ in range(25)]
+        order_ids = await asyncio.gather(*(writer.submit(order_in) for order_in in orders_in))
+    finally:
+        await writer.stop()
+
+    assert len(set(order_ids)) == 25
+    assert metrics.get("order_writer_batches_total") - batches == 3 # 10 + 10 + 5
+    for order_id, order_in in zip(order_ids, orders_in):
+        assert crud_order.get_order(db_session, order_id).customer_email == order_in.customer_email
+
+@pytest.mark.asyncio
+async def test_failed_order_fails_only_its_own_submission(db_session: Session, test_product, test_normal_user):
+    crud_order.create_order(db_session, obj_in=_order_in(test_product, test_normal_user, stripe_payment_intent_id="pi_taken"))
+    writer = OrderWriter(TestingAsyncSessionLocal, max_batch_size=10, max_delay_ms=20)
+    await writer.start()
+    try:
+        results = await asyncio.gather(
+            writer.submit(_order_in(test_product, test_normal_user)),
+            writer.submit(_order_in(test_product, test_normal_user, stripe_payment_intent_id="pi_taken")), # Unique
+            writer.submit(_order_in(test_product, test_normal_user)),
+            return_exceptions=True,
+        )
+    finally:
+        await writer.stop()
+    assert isinstance(results[0], int) and isinstance(results[2], int)
+    assert isinstance(results[1], Exception)
+    assert crud_order.get_order_count_for_reseller(db_session, reseller_id=test_normal_user.id) == 3
+
+@pytest.mark.asyncio
+async def test_stop_writes_pending_orders_first(db_session: Session, test_product, test_normal_user):
+    writer = OrderWriter(TestingAsyncSessionLocal, max_batch_size=10, max_delay_ms=50)
+    await writer.start()
+    submitted = asyncio.ensure_future(writer.submit(_order_in(test_product, test_normal_user)))
+    await asyncio.sleep(0)
+    await writer.stop()
+    assert crud_order.get_order(db_session, await submitted) is not None
+    with pytest.raises(RuntimeError):
+        await writer.submit(_order_in(test_product, test_normal_user))
+
+def test_public_orders_go_through_the_writer_when_enabled(db_session: Session, test_product, test_normal_user, monkeypatch):
+    from fastapi.testclient import TestClient
+    monkeypatch.setattr(config, "ORDER_WRITE_COALESCING_ENABLED", True)
+    monkeypatch.setattr(order_writer, "_session_factory", TestingAsyncSessionLocal)
+    orders = metrics.get("order_writer_orders_total")
+    with TestClient(app) as client:
+        assert order_writer.running
+        response = client.post("/api/v1/orders/public/", json={
+            "customer_email": "writer@example.com", "product_package_id": test_product.id, "reseller_id": test_normal_user.id,
+        })
+    assert not order_writer.running
+    assert response.status_code == 201, response.text
+    assert response.json()["product_package"]["id"] == test_product.id
+    assert metrics.get("order_writer_orders_total") == orders + 1
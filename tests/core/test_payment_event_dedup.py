@@ -0,0 +1,22 @@
+from app.core import metrics
+from app.core.payment_event_dedup import RecentEventIds
+
+def test_recent_ids_are_seen_until_they_expire():
+    recent = RecentEventIds(max_size=10, ttl_seconds=60)
+    hits = metrics.get("payment_event_dedup_hits_total")
+    assert not recent.seen("evt_1", now=0)
+    recent.add("evt_1", now=0)
+    assert recent.seen("evt_1", now=59)
+    assert metrics.get("payment_event_dedup_hits_total") == hits + 1
+    assert not recent.seen("evt_1", now=60)
+    assert len(recent) == 0
+
+def test_oldest_ids_are_dropped_beyond_max_size():
+    recent = RecentEventIds(max_size=2, ttl_seconds=60)
+    for i, event_id in enumerate(["evt_1", "evt_2", "evt_3"]):
+        recent.add(event_id, now=i)
+    assert [recent.seen(event_id, now=3) for event_id in ["evt_1", "evt_2", "evt_3"]] == [False, True, True]
+
+    disabled = RecentEventIds(max_size=0, ttl_seconds=60)
+    disabled.add("evt_1", now=0)
+    assert not disabled.seen("evt_1", now=0)
@@ -0,0 +1,30 @@
+import time
+
+from app.core import metrics
+from app.core.payment_intent_cache import CachedPaymentIntent, PaymentIntentCache
+
+def _intent(intent_id: str = "pi_1", status: str = "requires_payment_method") -> CachedPaymentIntent:
+    return CachedPaymentIntent(id=intent_id, status=status, amount=1999, currency="usd", client_secret=f"{intent_id}_secret")
+
+def test_put_get_and_invalidate():
+    cache = PaymentIntentCache(max_size=10, ttl_seconds=60)
+    assert cache.get("pi_1") is None
+    cache.put(_intent())
+    hits = metrics.get("payment_intent_cache_hits_total")
+    assert cache.get("pi_1") == _intent()
+    assert metrics.get("payment_intent_cache_hits_total") == hits + 1
+
+    cache.invalidate("pi_1")
+    assert cache.get("pi_1") is None
+
+def test_entries_expire_and_are_bounded():
+    cache = PaymentIntentCache(max_size=2, ttl_seconds=0.05)
+    for intent_id in ("pi_1", "pi_2", "pi_3"):
+        cache.put(_intent(intent_id))
+    assert cache.get("pi_1") is None and cache.get("pi_3") is not None
+    time.sleep(0.06)
+    assert cache.get("pi_3") is None
+
+    disabled = PaymentIntentCache(max_size=0, ttl_seconds=60)
+    assert disabled.put(_intent()) == _intent() # Still converts
+    assert disabled.get("pi_1") is None
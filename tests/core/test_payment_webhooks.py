@@ -0,0 +1,153 @@
+import json
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core import config, metrics, payment_webhooks
+from app.core.payment_intent_cache import CachedPaymentIntent, payment_intent_cache
+from app.crud import crud_order, crud_outbox, crud_payment_event
+from app.models.commission_outbox import CommissionOutbox
+from app.models.order import Order as OrderModel
+from app.models.payment_event import PaymentWebhookEvent, ProcessedPaymentEvent
+from app.schemas.order import OrderCreateInternal, OrderUpdate
+from app.schemas.payment import PaymentWebhookEventEntry
+from tests.conftest import TestingAsyncSessionLocal, create_recruited_reseller
+
+@pytest.fixture
+def awaiting_order(db_session: Session, test_normal_user, test_product):
+    seller = create_recruited_reseller(db_session, recruiter=test_normal_user)
+    return crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email=f"cust_{uuid.uuid4().hex[:4]}@example.com", product_package_id=test_product.id,
+        reseller_id=seller.id, price_paid=test_product.price, currency_paid="USD",
+        duration_days_at_purchase=test_product.duration_days, country_code_at_purchase=test_product.country_code,
+        order_status="AWAITING_PAYMENT", stripe_payment_intent_id=f"pi_{uuid.uuid4().hex}",
+    ))
+
+def _store(db_session: Session, order, event_type: str, **intent_fields):
+    intent = {"id": order.stripe_payment_intent_id, "amount_received": 1999, "currency": "usd", **intent_fields}
+    event = {"id": f"evt_{uuid.uuid4().hex}", "type": event_type, "data": {"object": intent}}
+    crud_payment_event.store_event(db_session, event_id=event["id"], event_type=event_type, payload=json.dumps(event))
+    return event
+
+def _status(db_session: Session, order) -> str:
+    db_session.expire_all()
+    return crud_order.get_order(db_session, order.id).order_status
+
+@pytest.mark.asyncio
+async def test_succeeded_event_completes_order_and_queues_commissions(db_session: Session, awaiting_order, webhook_worker):
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+    processed = metrics.get("payment_webhook_processed_total")
+
+    assert await webhook_worker.drain() == 1
+    assert _status(db_session, awaiting_order) == "COMPLETED"
+    assert [e.order_id for e in db_session.query(CommissionOutbox).all()] == [awaiting_order.id]
+    assert crud_payment_event.get_pending_count(db_session) == 0
+    assert metrics.get("payment_webhook_processed_total") == processed + 1
+
+    # Applying a succeeded event again changes nothing
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+    assert await webhook_worker.drain() == 1
+    assert crud_outbox.get_pending_count(db_session) == 1
+
+@pytest.mark.asyncio
+async def test_events_invalidate_the_cached_intent(db_session: Session, awaiting_order, webhook_worker):
+    payment_intent_cache.put(CachedPaymentIntent(
+        id=awaiting_order.stripe_payment_intent_id, status="requires_payment_method", amount=1999, currency="usd", client_secret="secret"
+    ))
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+    await webhook_worker.drain()
+    assert payment_intent_cache.get(awaiting_order.stripe_payment_intent_id) is None
+
+@pytest.mark.asyncio
+async def test_failed_then_succeeded_payment(db_session: Session, awaiting_order, webhook_worker):
+    _store(db_session, awaiting_order, "payment_intent.payment_failed")
+    await webhook_worker.drain()
+    assert _status(db_session, awaiting_order) == "FAILED_PAYMENT"
+
+    # The customer retries with another card on the same PaymentIntent
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+    await webhook_worker.drain()
+    assert _status(db_session, awaiting_order) == "COMPLETED"
+
+@pytest.mark.asyncio
+async def test_amount_mismatch_or_unknown_intent_leaves_orders_alone(db_session: Session, awaiting_order, webhook_worker):
+    _store(db_session, awaiting_order, "payment_intent.succeeded", amount_received=100)
+    _store(db_session, awaiting_order, "payment_intent.succeeded", id="pi_unknown")
+    assert await webhook_worker.drain() == 2
+    assert _status(db_session, awaiting_order) == "AWAITING_PAYMENT"
+    assert crud_payment_event.get_pending_count(db_session) == 0
+
+@pytest.mark.asyncio
+async def test_payment_for_cancelled_order_is_reported_for_refund(db_session: Session, awaiting_order, webhook_worker, caplog):
+    db_session.execute(update(OrderModel).where(OrderModel.id == awaiting_order.id).values(order_status="CANCELLED"))
+    db_session.commit()
+    paid = metrics.get("payment_webhook_cancelled_order_paid_total")
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+
+    assert await webhook_worker.drain() == 1
+    assert _status(db_session, awaiting_order) == "CANCELLED"
+    assert metrics.get("payment_webhook_cancelled_order_paid_total") == paid + 1
+    assert any(r.levelname == "ERROR" and "refunded" in r.getMessage() for r in caplog.records)
+
+@pytest.mark.asyncio
+async def test_processing_failures_are_retried(db_session: Session, awaiting_order, webhook_worker, monkeypatch):
+    _store(db_session, awaiting_order, "payment_intent.succeeded")
+    real = payment_webhooks.process_event
+    calls = []
+
+    async def flaky(db, event):
+        calls.append(event["id"])
+        if len(calls) == 1:
+            raise RuntimeError("database hiccup")
+        await real(db, event)
+    monkeypatch.setattr(payment_webhooks, "process_event", flaky)
+
+    assert await webhook_worker.drain() == 2
+    assert len(calls) == 2
+    assert _status(db_session, awaiting_order) == "COMPLETED"
+    assert db_session.query(PaymentWebhookEvent).count() == 0
+
+@pytest.mark.asyncio
+async def test_processed_events_are_recorded_and_not_applied_twice(db_session: Session, awaiting_order, webhook_worker):
+    event = _store(db_session, awaiting_order, "payment_intent.succeeded")
+    await webhook_worker.drain()
+    assert crud_payment_event.is_processed(db_session, event_id=event["id"])
+    # Once processed, a redelivery is not stored again
+    assert not crud_payment_event.store_event(db_session, event_id=event["id"], event_type=event["type"], payload=json.dumps(event))
+
+    # A redelivery stored while the first was being completed is dropped by the worker
+    db_session.add(PaymentWebhookEvent(event_id=event["id"], event_type=event["type"], payload=json.dumps(event), attempts=0, available_at=datetime.utcnow()))
+    db_session.commit()
+    # Reset the order behind the state machine's back, as if the first delivery had not completed it
+    db_session.execute(update(OrderModel).where(OrderModel.id == awaiting_order.id).values(order_status="AWAITING_PAYMENT"))
+    db_session.commit()
+    duplicates = metrics.get("payment_webhook_duplicates_total")
+    assert await webhook_worker.drain() == 1
+    assert _status(db_session, awaiting_order) == "AWAITING_PAYMENT"
+    assert metrics.get("payment_webhook_duplicates_total") == duplicates + 1
+
+def test_purge_processed_events(db_session: Session):
+    entry = PaymentWebhookEventEntry(id=0, event_id="evt_old", event_type="payment_intent.succeeded", payload="{}", attempts=1)
+    crud_payment_event.complete_event(db_session, entry=entry)
+    assert crud_payment_event.purge_processed_events(db_session, before=datetime.utcnow() - timedelta(days=3)) == 0
+    assert crud_payment_event.purge_processed_events(db_session, before=datetime.utcnow() + timedelta(seconds=1)) == 1
+    assert not crud_payment_event.is_processed(db_session, event_id="evt_old")
+
+@pytest.mark.asyncio
+async def test_periodic_purge_keeps_ids_within_the_redelivery_window(db_session: Session, monkeypatch):
+    for event_id, age in (("evt_old", timedelta(days=8)), ("evt_recent", timedelta(days=2))):
+        crud_payment_event.complete_event(db_session, entry=PaymentWebhookEventEntry(
+            id=0, event_id=event_id, event_type="payment_intent.succeeded", payload="{}", attempts=1
+        ))
+        db_session.execute(update(ProcessedPaymentEvent).where(ProcessedPaymentEvent.event_id == event_id).values(
+            processed_at=datetime.utcnow() - age
+        ))
+    db_session.commit()
+    monkeypatch.setattr(config, "PROCESSED_PAYMENT_EVENT_RETENTION_SECONDS", 3600) # Below the window: the window applies
+    monkeypatch.setattr(payment_webhooks.processed_payment_event_purge, "_session_factory", TestingAsyncSessionLocal)
+
+    assert await payment_webhooks.processed_payment_event_purge.run_once() == 1
+    assert not crud_payment_event.is_processed(db_session, event_id="evt_old")
+    assert crud_payment_event.is_processed(db_session, event_id="evt_recent")
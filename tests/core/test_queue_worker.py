@@ -0,0 +1,14 @@
+import pytest
+
+from app.core.queue_worker import LeasedQueueWorker
+
+class _ClaimOnlyWorker(LeasedQueueWorker):
+    async def _claim(self, db, *, limit, lease_seconds):
+        return []
+
+def test_worker_missing_queue_specifics_cannot_be_created():
+    with pytest.raises(TypeError, match="_complete"):
+        _ClaimOnlyWorker(
+            concurrency=1, batch_size=1, poll_seconds=1, lease_seconds=1,
+            retry_base_seconds=1, retry_max_seconds=1, max_attempts=1,
+        )
@@ -0,0 +1,42 @@
+import pytest
+
+from app.core import security
+from app.core.security import (
+    get_password_hash_async, verify_password_async, verify_password, PasswordHashingBusyError
+)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("workers", [0, 1])
+async def test_async_hash_and_verify_roundtrip(workers, monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_WORKERS", workers) # On a thread, then in the process pool
+    try:
+        hashed = await get_password_hash_async("s3cret-password")
+        assert verify_password("s3cret-password", hashed)
+        assert await verify_password_async("s3cret-password", hashed) is True
+        assert await verify_password_async("wrong-password", hashed) is False
+    finally:
+        security.shutdown_password_hashing_pool()
+
+@pytest.mark.asyncio
+async def test_saturated_pool_rejects_immediately(monkeypatch):
+    monkeypatch.setattr(security, "PASSWORD_HASH_QUEUE_LIMIT", 0)
+    monkeypatch.setattr(security, "_in_flight", max(security.PASSWORD_HASH_WORKERS, 1))
+    with pytest.raises(PasswordHashingBusyError):
+        await verify_password_async("password", "not-a-hash")
+
+def test_login_returns_503_when_hashing_pool_saturated(client, db_session, normal_user_token_headers, monkeypatch):
+    _, user = normal_user_token_headers
+    monkeypatch.setattr(security, "PASSWORD_HASH_QUEUE_LIMIT", 0)
+    monkeypatch.setattr(security, "_in_flight", max(security.PASSWORD_HASH_WORKERS, 1))
+
+    response = client.post("/api/v1/auth/login", data={"username": user.email, "password": "testpassword123"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_app_shutdown_stops_the_hashing_pool(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    monkeypatch.setattr(security, "PASSWORD_HASH_WORKERS", 1)
+    with TestClient(app):
+        assert security._get_pool() is not None
+    assert security._pool is None
@@ -126,6 +126,31 @@ def test_get_unpaid_commissions_for_reseller(db_session: Session, db_reseller_fo
     unpaid_commissions_after_paid = crud_commission.get_unpaid_commissions_for_reseller(db=db_session, reseller_id=db_reseller_for_commission_tests.id)
     assert not any(c.id == created_commission.id for c in unpaid_commissions_after_paid)
 
+def test_get_commission_totals_by_reseller(db_session: Session, db_order_for_commission_tests: Order, db_reseller_for_commission_tests: ResellerProfile, db_product_for_commission_tests: ProductPackage):
+    for amount, status, currency, commission_type in (
+        (Decimal("1.10"), "UNPAID", "USD", "DIRECT_SALE"),
+        (Decimal("2.20"), "UNPAID", "USD", "BONUS"),
+        (Decimal("3.00"), "UNPAID", "EUR", "RECRUITMENT_TIER_1"),
+        (Decimal("5.00"), "PAID", "USD", "RECRUITMENT_TIER_2"),
+    ):
+        crud_commission.create_commission(db=db_session, obj_in=CommissionCreate(
+            order_id=db_order_for_commission_tests.id,
+            reseller_id=db_reseller_for_commission_tests.id,
+            commission_type=commission_type,
+            amount=amount,
+            currency=currency,
+            product_package_id_at_sale=db_product_for_commission_tests.id,
+            commission_status=status,
+        ))
+
+    totals = crud_commission.get_commission_totals_by_reseller(db_session, reseller_id=db_reseller_for_commission_tests.id)
+    by_key = {(t.commission_status, t.currency): (t.total_amount, t.count) for t in totals}
+    assert by_key == {
+        ("PAID", "USD"): (Decimal("5.00"), 1),
+        ("UNPAID", "EUR"): (Decimal("3.00"), 1),
+        ("UNPAID", "USD"): (Decimal("3.30"), 2),
+    }
+
 def test_get_commissions_by_order_id(db_session: Session, db_order_for_commission_tests: Order, created_commission: Commission):
     commissions = crud_commission.get_commissions_by_order_id(db=db_session, order_id=db_order_for_commission_tests.id)
     assert len(commissions) >= 1
@@ -149,3 +174,41 @@ def test_get_commissions_by_order_id(db_session: Session, db_order_for_commissio
 
     commissions_for_order = crud_commission.get_commissions_by_order_id(db=db_session, order_id=db_order_for_commission_tests.id)
     assert len(commissions_for_order) == 2
+
+
+def test_get_commissions_by_reseller_cursor_pagination(db_session: Session, db_order_for_commission_tests: Order, db_reseller_for_commission_tests: ResellerProfile, db_product_for_commission_tests: ProductPackage):
+    from app.utils.pagination import next_cursor
+    created = [
+        crud_commission.create_commission(db=db_session, obj_in=CommissionCreate(
+            order_id=db_order_for_commission_tests.id, reseller_id=db_reseller_for_commission_tests.id,
+            commission_type=f"TYPE_{i}", amount=Decimal("1.00"), currency="USD",
+            product_package_id_at_sale=db_product_for_commission_tests.id, commission_status="UNPAID"
+        ))
+        for i in range(3)
+    ]
+
+    page1 = crud_commission.get_commissions_by_reseller(db_session, reseller_id=db_reseller_for_commission_tests.id, limit=2)
+    page2 = crud_commission.get_commissions_by_reseller(
+        db_session, reseller_id=db_reseller_for_commission_tests.id, limit=2, cursor=next_cursor(page1, 2)
+    )
+    assert [c.id for c in page1 + page2] == [c.id for c in reversed(created)]
+
+def test_create_commissions_skips_duplicates(db_session: Session, db_order_for_commission_tests: Order, db_reseller_for_commission_tests: ResellerProfile, db_product_for_commission_tests: ProductPackage):
+    commissions_in = [
+        CommissionCreate(
+            order_id=db_order_for_commission_tests.id,
+            reseller_id=db_reseller_for_commission_tests.id,
+            commission_type=commission_type,
+            amount=Decimal("1.00"),
+            currency="USD",
+            product_package_id_at_sale=db_product_for_commission_tests.id,
+            commission_status="UNPAID",
+        )
+        for commission_type in ("DIRECT_SALE", "BONUS")
+    ]
+    crud_commission.create_commissions(db_session, objs_in=commissions_in)
+    # Recording the same set again (e.g. a repeated or concurrent completion) inserts nothing
+    crud_commission.create_commissions(db_session, objs_in=commissions_in)
+
+    commissions = crud_commission.get_commissions_by_order_id(db_session, order_id=db_order_for_commission_tests.id)
+    assert sorted(c.commission_type for c in commissions) == ["BONUS", "DIRECT_SALE"]
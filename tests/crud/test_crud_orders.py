@@ -127,3 +127,137 @@ def test_get_order_count_for_reseller(db_session: Session, test_reseller_for_ord
 def test_get_order_count_for_customer(db_session: Session, created_test_order: Order):
     count = crud_order.get_order_count_for_customer(db=db_session, customer_email=created_test_order.customer_email)
     assert count >= 1
+
+
+# --- Async variants ---
+@pytest.mark.asyncio
+async def test_create_order_async_loads_relationships(async_db_session, test_reseller_for_order: ResellerProfile, test_product_for_order: ProductPackage):
+    order_in_internal = OrderCreateInternal(
+        customer_email=f"async_cust_{uuid.uuid4().hex[:6]}@example.com",
+        product_package_id=test_product_for_order.id,
+        reseller_id=test_reseller_for_order.id,
+        price_paid=test_product_for_order.price,
+        duration_days_at_purchase=test_product_for_order.duration_days,
+        country_code_at_purchase=test_product_for_order.country_code
+    )
+    created_order = await crud_order.create_order_async(async_db_session, obj_in=order_in_internal)
+    assert created_order.id is not None
+    assert created_order.order_status == "PENDING_PAYMENT"
+    # Relationships must be usable without an implicit (blocking) lazy load
+    assert created_order.product_package.id == test_product_for_order.id
+    assert created_order.reseller.id == test_reseller_for_order.id
+
+@pytest.mark.asyncio
+async def test_get_and_update_order_async(async_db_session, test_reseller_for_order: ResellerProfile, created_test_order: Order):
+    retrieved_order = await crud_order.get_order_async(async_db_session, order_id=created_test_order.id)
+    assert retrieved_order is not None
+    assert retrieved_order.product_package is not None
+    assert retrieved_order.reseller is not None
+
+    updated_order = await crud_order.update_order_async(
+        async_db_session, db_obj=retrieved_order, obj_in=OrderUpdate(order_status="PROCESSING")
+    )
+    assert updated_order.order_status == "PROCESSING"
+
+    orders = await crud_order.get_orders_by_reseller_async(async_db_session, reseller_id=test_reseller_for_order.id)
+    assert [o.id for o in orders] == [created_test_order.id]
+    assert await crud_order.get_order_count_for_reseller_async(async_db_session, reseller_id=test_reseller_for_order.id) == 1
+
+
+def _create_orders(db_session: Session, reseller: ResellerProfile, product: ProductPackage, count: int, email: str = None):
+    return [
+        crud_order.create_order(db=db_session, obj_in=OrderCreateInternal(
+            customer_email=email or f"page_cust_{uuid.uuid4().hex[:6]}@example.com",
+            product_package_id=product.id, reseller_id=reseller.id, price_paid=product.price,
+            duration_days_at_purchase=product.duration_days, country_code_at_purchase=product.country_code
+        ))
+        for _ in range(count)
+    ]
+
+def test_get_orders_by_reseller_cursor_pagination(db_session: Session, test_reseller_for_order: ResellerProfile, test_product_for_order: ProductPackage):
+    from app.utils.pagination import next_cursor
+    # All rows share the same created_at second, so the id tiebreaker decides the order
+    created = _create_orders(db_session, test_reseller_for_order, test_product_for_order, 5)
+
+    page1 = crud_order.get_orders_by_reseller(db_session, reseller_id=test_reseller_for_order.id, limit=2)
+    cursor = next_cursor(page1, 2)
+    # A new order arriving between page requests must not shift the following pages
+    _create_orders(db_session, test_reseller_for_order, test_product_for_order, 1)
+    page2 = crud_order.get_orders_by_reseller(db_session, reseller_id=test_reseller_for_order.id, limit=2, cursor=cursor)
+    page3 = crud_order.get_orders_by_reseller(db_session, reseller_id=test_reseller_for_order.id, limit=2, cursor=next_cursor(page2, 2))
+
+    assert [o.id for o in page1 + page2 + page3] == [o.id for o in reversed(created)]
+    assert next_cursor(page3, 2) is None
+
+def test_get_orders_by_customer_cursor_pagination(db_session: Session, test_reseller_for_order: ResellerProfile, test_product_for_order: ProductPackage):
+    from app.utils.pagination import next_cursor
+    email = f"keyset_{uuid.uuid4().hex[:6]}@example.com"
+    created = _create_orders(db_session, test_reseller_for_order, test_product_for_order, 3, email=email)
+
+    page1 = crud_order.get_orders_by_customer(db_session, customer_email=email, limit=2)
+    page2 = crud_order.get_orders_by_customer(db_session, customer_email=email, limit=2, cursor=next_cursor(page1, 2))
+    assert [o.id for o in page1 + page2] == [o.id for o in reversed(created)]
+
+def test_create_orders_batch(db_session: Session, test_reseller_for_order: ResellerProfile, test_product_for_order: ProductPackage):
+    def order_in(email: str, status: str = "PENDING_PAYMENT") -> OrderCreateInternal:
+        return OrderCreateInternal(
+            customer_email=email, product_package_id=test_product_for_order.id, reseller_id=test_reseller_for_order.id,
+            price_paid=test_product_for_order.price, duration_days_at_purchase=test_product_for_order.duration_days,
+            country_code_at_purchase=test_product_for_order.country_code, order_status=status,
+        )
+
+    created = crud_order.create_orders(db_session, objs_in=[
+        order_in("batch_1@example.com"), order_in("batch_2@example.com", "COMPLETED"), order_in("batch_3@example.com"),
+    ])
+
+    assert [o.customer_email for o in created] == ["batch_1@example.com", "batch_2@example.com", "batch_3@example.com"]
+    assert all(o.id is not None and o.created_at is not None for o in created)
+    assert all(o.product_package.id == test_product_for_order.id and o.reseller.id == test_reseller_for_order.id for o in created)
+    assert crud_order.get_order_count_for_reseller(db_session, reseller_id=test_reseller_for_order.id) == 3
+    # Only the completed order of the batch is counted into the seller's sales totals
+    from app.crud import crud_team_volume
+    totals = crud_team_volume.get_team_volume(db_session, reseller_id=test_reseller_for_order.id, by_depth=False, by_period=False)
+    assert [(r.order_count, r.revenue) for r in totals] == [(1, test_product_for_order.price)]
+
+    assert crud_order.create_orders(db_session, objs_in=[]) == []
+
+# --- Versioned updates and the status state machine ---
+def test_update_order_bumps_version_with_one_statement(db_session: Session, created_test_order: Order):
+    from sqlalchemy import event
+    assert created_test_order.version == 1
+    updates = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('UPDATE "ORDER"'):
+            updates.append(statement)
+
+    event.listen(db_session.get_bind(), "before_cursor_execute", capture)
+    try:
+        updated = crud_order.update_order(db_session, db_obj=created_test_order, obj_in=OrderUpdate(order_status="AWAITING_PAYMENT"), commit=False)
+    finally:
+        event.remove(db_session.get_bind(), "before_cursor_execute", capture)
+    db_session.commit()
+
+    assert len(updates) == 1 and "version" in updates[0]
+    assert crud_order.get_order(db_session, created_test_order.id).version == 2
+    assert updated.order_status == "AWAITING_PAYMENT"
+
+def test_update_order_from_stale_version_conflicts(db_session: Session, created_test_order: Order):
+    crud_order.update_order(db_session, db_obj=created_test_order, obj_in=OrderUpdate(esim_provisioning_status="REQUESTED"))
+    with pytest.raises(crud_order.OrderVersionConflictError):
+        crud_order.update_order(db_session, db_obj=created_test_order, obj_in=OrderUpdate(order_status="CANCELLED", version=1))
+    db_session.rollback()
+    order = crud_order.get_order(db_session, created_test_order.id)
+    assert (order.order_status, order.version) == ("PENDING_PAYMENT", 2)
+
+    # Without a version, the update is made from the version of db_obj as loaded
+    order = crud_order.get_order(db_session, created_test_order.id)
+    crud_order.update_order(db_session, db_obj=order, obj_in=OrderUpdate(order_status="CANCELLED"))
+    assert crud_order.get_order(db_session, created_test_order.id).version == 3
+
+def test_update_order_refuses_undeclared_status_change(db_session: Session, created_test_order: Order):
+    from app.core.order_status import InvalidOrderStatusTransitionError
+    crud_order.update_order(db_session, db_obj=created_test_order, obj_in=OrderUpdate(order_status="CANCELLED"))
+    with pytest.raises(InvalidOrderStatusTransitionError):
+        crud_order.update_order(db_session, db_obj=created_test_order, obj_in=OrderUpdate(order_status="PROCESSING"))
+    assert crud_order.get_order(db_session, created_test_order.id).order_status == "CANCELLED"
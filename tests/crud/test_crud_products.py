@@ -1,4 +1,6 @@
 import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 import uuid
 from decimal import Decimal
@@ -126,3 +128,62 @@ def test_hard_delete_product(db_session: Session, test_product: ProductPackage):
     # Try deleting non-existent
     non_existent_delete = crud_product.hard_delete_product(db=db_session, product_id=99999)
     assert non_existent_delete is None
+
+
+@contextmanager
+def count_statements(db: Session):
+    statements = []
+    engine = db.get_bind()
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+
+def test_cached_reads_skip_database_once_warm(db_session: Session, test_product: ProductPackage):
+    country = test_product.country_code
+    # Warm up
+    crud_product.get_product_cached(db_session, test_product.id)
+    crud_product.get_active_products_by_country_cached(db_session, country_code=country)
+    crud_product.get_distinct_active_countries_cached(db_session)
+
+    with count_statements(db_session) as statements:
+        product = crud_product.get_product_cached(db_session, test_product.id)
+        by_country = crud_product.get_active_products_by_country_cached(db_session, country_code=country.lower())
+        countries = crud_product.get_distinct_active_countries_cached(db_session)
+    assert statements == []
+    assert product.id == test_product.id
+    assert [p.id for p in by_country] == [test_product.id]
+    assert countries == [country]
+
+def test_cached_reads_follow_writes(db_session: Session, test_product: ProductPackage):
+    crud_product.get_product_cached(db_session, test_product.id)
+    crud_product.get_active_products_by_country_cached(db_session, country_code=test_product.country_code)
+
+    crud_product.update_product(db_session, db_obj=test_product, obj_in=ProductPackageUpdate(name="Renamed", country_code="FR"))
+    assert crud_product.get_product_cached(db_session, test_product.id).name == "Renamed"
+    assert crud_product.get_active_products_by_country_cached(db_session, country_code="US") == []
+    assert [p.id for p in crud_product.get_active_products_by_country_cached(db_session, country_code="FR")] == [test_product.id]
+    assert crud_product.get_distinct_active_countries_cached(db_session) == ["FR"]
+
+    crud_product.delete_product(db_session, product_id=test_product.id)
+    assert crud_product.get_product_cached(db_session, test_product.id) is None
+    assert crud_product.get_product_cached(db_session, test_product.id, show_inactive=True).is_active is False
+    assert crud_product.get_active_products_by_country_cached(db_session, country_code="FR") == []
+    assert crud_product.get_distinct_active_countries_cached(db_session) == []
+
+    crud_product.hard_delete_product(db_session, product_id=test_product.id)
+    assert crud_product.get_product_cached(db_session, test_product.id, show_inactive=True) is None
+
+def test_cached_country_listing_pages_in_memory(db_session: Session):
+    for name in ("Charlie", "Alpha", "Bravo"):
+        crud_product.create_product(db_session, obj_in=ProductPackageCreate(
+            name=name, duration_days=30, country_code="NZ", price=Decimal("10.00"),
+            direct_commission_rate_or_amount=Decimal("1.00"), recruitment_commission_rate_or_amount=Decimal("0.50")
+        ))
+    page = crud_product.get_active_products_by_country_cached(db_session, country_code="NZ", skip=1, limit=1)
+    assert [p.name for p in page] == ["Bravo"]
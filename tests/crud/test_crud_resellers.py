@@ -4,7 +4,7 @@ import uuid
 
 from app.crud import crud_reseller
 from app.schemas.reseller import ResellerCreate, ResellerUpdate
-from app.models.reseller import ResellerProfile
+from app.models.reseller import ResellerProfile, ResellerClosure
 # from app.core.security import get_password_hash # Not strictly needed if we check for non-None hashed_password
 
 pytestmark = pytest.mark.crud
@@ -146,3 +146,85 @@ def test_get_recruited_resellers_no_recruits(db_session: Session):
 
     recruited_list = crud_reseller.get_recruited_resellers(db=db_session, recruiter_id=recruiter.id)
     assert len(recruited_list) == 0
+
+def _chain(db_session: Session, length: int) -> list:
+    """Resellers r0 <- r1 <- ... <- r(length-1), each recruited by the previous one."""
+    chain = [crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"chain_0_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A"
+    ))]
+    for i in range(1, length):
+        chain.append(crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+            email=f"chain_{i}_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A",
+            recruiter_id=chain[-1].id
+        )))
+    return chain
+
+def test_get_upline_nearest_first(db_session: Session):
+    chain = _chain(db_session, 4)
+    crud_reseller.update_reseller(db_session, db_obj=chain[1], obj_in=ResellerUpdate(is_active=False))
+
+    upline = crud_reseller.get_upline(db_session, reseller_id=chain[3].id, max_depth=10)
+    assert [(m.id, m.depth, m.is_active) for m in upline] == [
+        (chain[2].id, 1, True), (chain[1].id, 2, False), (chain[0].id, 3, True)
+    ]
+
+def test_get_upline_respects_max_depth(db_session: Session):
+    chain = _chain(db_session, 4)
+    assert [m.id for m in crud_reseller.get_upline(db_session, reseller_id=chain[3].id, max_depth=2)] == [chain[2].id, chain[1].id]
+    assert crud_reseller.get_upline(db_session, reseller_id=chain[0].id, max_depth=5) == []
+
+def test_get_uplines_matches_get_upline(db_session: Session):
+    chain = _chain(db_session, 4)
+    crud_reseller.update_reseller(db_session, db_obj=chain[1], obj_in=ResellerUpdate(is_active=False))
+    ids = [chain[3].id, chain[2].id, chain[0].id]
+    uplines = crud_reseller.get_uplines(db_session, reseller_ids=ids, max_depth=2)
+    assert uplines == {i: crud_reseller.get_upline(db_session, reseller_id=i, max_depth=2) for i in ids}
+    assert uplines[chain[0].id] == []
+
+def _closure(db_session: Session) -> set:
+    return {(row.ancestor_id, row.descendant_id, row.depth) for row in db_session.query(ResellerClosure).all()}
+
+def test_create_reseller_maintains_closure(db_session: Session):
+    a, b, c = _chain(db_session, 3)
+    assert _closure(db_session) == {
+        (a.id, a.id, 0), (b.id, b.id, 0), (c.id, c.id, 0),
+        (a.id, b.id, 1), (b.id, c.id, 1), (a.id, c.id, 2),
+    }
+
+def test_recruiter_change_moves_subtree(db_session: Session):
+    a, b, c = _chain(db_session, 3)
+    x = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"x_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A"
+    ))
+    # Move b (with its recruit c) from under a to under x
+    crud_reseller.update_reseller(db_session, db_obj=b, obj_in=ResellerUpdate(recruiter_id=x.id))
+    assert _closure(db_session) == {
+        (a.id, a.id, 0), (b.id, b.id, 0), (c.id, c.id, 0), (x.id, x.id, 0),
+        (x.id, b.id, 1), (b.id, c.id, 1), (x.id, c.id, 2),
+    }
+    assert [(m.id, m.depth) for m in crud_reseller.get_downline(db_session, reseller_id=x.id)] == [(b.id, 1), (c.id, 2)]
+    assert crud_reseller.get_downline(db_session, reseller_id=a.id) == []
+
+    # Detach b entirely
+    crud_reseller.update_reseller(db_session, db_obj=b, obj_in=ResellerUpdate(recruiter_id=None))
+    assert crud_reseller.get_downline(db_session, reseller_id=x.id) == []
+    assert [m.id for m in crud_reseller.get_downline(db_session, reseller_id=b.id)] == [c.id]
+
+def test_recruiter_change_rejects_cycles(db_session: Session):
+    a, b, c = _chain(db_session, 3)
+    for new_recruiter in (a, c): # itself, and a member of its own downline
+        with pytest.raises(crud_reseller.RecruiterCycleError):
+            crud_reseller.update_reseller(db_session, db_obj=a, obj_in=ResellerUpdate(recruiter_id=new_recruiter.id))
+    db_session.refresh(a)
+    assert a.recruiter_id is None
+
+def test_get_downline_depth_limit_and_paging(db_session: Session):
+    chain = _chain(db_session, 4)
+    top = chain[0]
+    sibling = crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+        email=f"sib_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A", recruiter_id=top.id
+    ))
+    assert [(m.id, m.depth) for m in crud_reseller.get_downline(db_session, reseller_id=top.id, max_depth=2)] == [
+        (chain[1].id, 1), (sibling.id, 1), (chain[2].id, 2)
+    ]
+    assert [m.id for m in crud_reseller.get_downline(db_session, reseller_id=top.id, skip=3, limit=5)] == [chain[3].id]
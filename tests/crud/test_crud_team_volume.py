@@ -0,0 +1,106 @@
+import pytest
+import uuid
+from datetime import date
+from decimal import Decimal
+from sqlalchemy.orm import Session
+
+from app.crud import crud_order, crud_commission, crud_reseller, crud_team_volume
+from app.models.sales_rollup import ResellerSalesRollup
+from app.schemas.commission import CommissionCreate
+from app.schemas.order import OrderCreateInternal, OrderUpdate
+from app.schemas.reseller import ResellerCreate
+
+pytestmark = pytest.mark.crud
+
+def _chain(db_session: Session, length: int):
+    chain = []
+    for i in range(length):
+        chain.append(crud_reseller.create_reseller(db_session, obj_in=ResellerCreate(
+            email=f"team_{i}_{uuid.uuid4().hex[:6]}@example.com", password="password", reseller_type="TYPE_A",
+            recruiter_id=chain[-1].id if chain else None
+        )))
+    return chain
+
+def _order(db_session: Session, product, reseller, *, status: str = "PENDING_PAYMENT", price: str = "10.00", currency: str = "USD"):
+    return crud_order.create_order(db_session, obj_in=OrderCreateInternal(
+        customer_email=f"c_{uuid.uuid4().hex[:6]}@example.com", product_package_id=product.id, reseller_id=reseller.id,
+        price_paid=Decimal(price), currency_paid=currency, duration_days_at_purchase=30, country_code_at_purchase="US",
+        order_status=status
+    ))
+
+def _commission(db_session: Session, order, reseller, amount: str):
+    crud_commission.create_commissions(db_session, objs_in=[CommissionCreate(
+        order_id=order.id, reseller_id=reseller.id, commission_type="DIRECT_SALE", amount=Decimal(amount),
+        currency=order.currency_paid, product_package_id_at_sale=order.product_package_id, commission_status="UNPAID"
+    )])
+
+def _rollup(db_session: Session) -> set:
+    db_session.expire_all()
+    return {
+        (row.reseller_id, row.period_start, row.currency, row.order_count, row.revenue, row.commission_total)
+        for row in db_session.query(ResellerSalesRollup).all()
+    }
+
+def _sales(db_session: Session, test_product):
+    top, middle, bottom = _chain(db_session, 3)
+    _order(db_session, test_product, top, status="COMPLETED", price="5.00")
+    middle_order = _order(db_session, test_product, middle)
+    crud_order.update_order(db_session, db_obj=middle_order, obj_in=OrderUpdate(order_status="COMPLETED"))
+    _order(db_session, test_product, bottom, status="COMPLETED", price="20.00")
+    _order(db_session, test_product, bottom, status="COMPLETED", price="7.00", currency="EUR")
+    _order(db_session, test_product, bottom) # Not completed: no volume
+    _commission(db_session, middle_order, middle, "2.50")
+    _commission(db_session, middle_order, top, "1.00")
+    return top, middle, bottom, middle_order
+
+def test_rollup_is_maintained_incrementally(db_session: Session, test_product):
+    top, middle, bottom, middle_order = _sales(db_session, test_product)
+    incremental = _rollup(db_session)
+    crud_team_volume.rebuild_sales_rollup(db_session)
+    assert _rollup(db_session) == incremental
+
+    month = date.today().replace(day=1)
+    assert (middle.id, month, "USD", 1, Decimal("10.00"), Decimal("2.50")) in incremental
+    assert (bottom.id, month, "EUR", 1, Decimal("7.00"), Decimal("0.00")) in incremental
+
+    # Leaving COMPLETED takes the order back out
+    crud_order.update_order(db_session, db_obj=middle_order, obj_in=OrderUpdate(order_status="REFUNDED"))
+    assert (middle.id, month, "USD", 0, Decimal("0.00"), Decimal("2.50")) in _rollup(db_session)
+    incremental = _rollup(db_session)
+    crud_team_volume.rebuild_sales_rollup(db_session)
+    # A rebuild only creates rows with data; compare the non-zero ones
+    assert {row for row in incremental if any(row[3:])} == _rollup(db_session)
+
+def test_rollup_without_on_conflict_support(db_session: Session, test_product, monkeypatch):
+    # As on a dialect without INSERT ... ON CONFLICT (dialect_insert returns None)
+    monkeypatch.setattr(crud_team_volume, "dialect_insert", lambda db, model: None)
+    monkeypatch.setattr(crud_commission, "dialect_insert", lambda db, model: None)
+    _sales(db_session, test_product)
+    incremental = _rollup(db_session)
+    monkeypatch.undo()
+    crud_team_volume.rebuild_sales_rollup(db_session)
+    assert _rollup(db_session) == incremental
+
+def test_get_team_volume_groups_by_depth_and_period(db_session: Session, test_product):
+    top, middle, bottom, _ = _sales(db_session, test_product)
+    month = date.today().replace(day=1)
+
+    rows = crud_team_volume.get_team_volume(db_session, reseller_id=top.id)
+    assert [(r.depth, r.period_start, r.currency, r.order_count, r.revenue, r.commission_total) for r in rows] == [
+        (0, month, "USD", 1, Decimal("5.00"), Decimal("1.00")),
+        (1, month, "USD", 1, Decimal("10.00"), Decimal("2.50")),
+        (2, month, "EUR", 1, Decimal("7.00"), Decimal("0")),
+        (2, month, "USD", 1, Decimal("20.00"), Decimal("0")),
+    ]
+
+    totals = crud_team_volume.get_team_volume(
+        db_session, reseller_id=top.id, include_self=False, by_depth=False, by_period=False
+    )
+    assert [(r.depth, r.period_start, r.currency, r.order_count, r.revenue) for r in totals] == [
+        (None, None, "EUR", 1, Decimal("7.00")),
+        (None, None, "USD", 2, Decimal("30.00")),
+    ]
+
+    assert [r.depth for r in crud_team_volume.get_team_volume(db_session, reseller_id=top.id, max_depth=1)] == [0, 1]
+    assert crud_team_volume.get_team_volume(db_session, reseller_id=top.id, period_from=date(2999, 1, 1)) == []
+    assert crud_team_volume.get_team_volume(db_session, reseller_id=bottom.id, include_self=False) == []
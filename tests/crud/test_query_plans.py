@@ -0,0 +1,107 @@
+import re
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.crud import crud_order, crud_commission, crud_product, crud_reseller, crud_team_volume
+from app.utils.pagination import encode_cursor
+from datetime import datetime
+
+# EXPLAIN QUERY PLAN checks: every read in app/crud must locate its rows through an
+# index (or the primary key) and get its ORDER BY from index order, never from a
+# full table scan or a temporary sort b-tree.
+
+pytestmark = pytest.mark.crud
+
+@contextmanager
+def captured_selects(db: Session):
+    statements = []
+    engine = db.get_bind()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+def query_plans(db: Session, crud_call):
+    with captured_selects(db) as statements:
+        crud_call()
+    assert statements, "CRUD call did not issue any SELECT"
+    plans = []
+    with db.get_bind().connect() as connection:
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+            # Scanning a CTE or a subquery reads its own (recursive) working set, not a table
+            cte_names = set(re.findall(r"WITH (?:RECURSIVE )?(\w+)\b", statement, flags=re.IGNORECASE))
+            cte_names.update(re.findall(r"^(?:CO-ROUTINE|MATERIALIZE) (\w+)$", "\n".join(row[3] for row in rows), flags=re.MULTILINE))
+            plans.append([row[3] for row in rows if row[3] not in {f"SCAN {name}" for name in cte_names}])
+    return plans
+
+def assert_indexed(plans):
+    for plan in plans:
+        for step in plan:
+            assert "USE TEMP B-TREE" not in step, f"Sort not served by an index: {plan}"
+            # "SCAN t USING [COVERING] INDEX ..." walks an index in order; a bare "SCAN t" reads the whole table
+            assert not re.match(r"^SCAN \w+$", step), f"Full table scan: {plan}"
+
+CURSOR = encode_cursor(datetime(2026, 1, 1), 5)
+
+CRUD_READS = {
+    "order.get_order": lambda db: crud_order.get_order(db, 1),
+    "order.get_orders_by_reseller": lambda db: crud_order.get_orders_by_reseller(db, reseller_id=1, skip=10),
+    "order.get_orders_by_reseller[cursor]": lambda db: crud_order.get_orders_by_reseller(db, reseller_id=1, cursor=CURSOR),
+    "order.get_orders_by_customer": lambda db: crud_order.get_orders_by_customer(db, customer_email="c@example.com"),
+    "order.get_orders_by_customer[cursor]": lambda db: crud_order.get_orders_by_customer(db, customer_email="c@example.com", cursor=CURSOR),
+    "order.get_order_by_stripe_payment_intent": lambda db: crud_order.get_order_by_stripe_payment_intent(db, payment_intent_id="pi_1"),
+    "order.get_order_count_for_reseller": lambda db: crud_order.get_order_count_for_reseller(db, reseller_id=1),
+    "order.get_completed_orders_after": lambda db: crud_order.get_completed_orders_after(db, after_id=10, last_id=500),
+    "order.get_order_id_range": lambda db: crud_order.get_order_id_range(db),
+    "order.get_order_count_for_customer": lambda db: crud_order.get_order_count_for_customer(db, customer_email="c@example.com"),
+    "order.count_stale_orders": lambda db: crud_order.count_stale_orders(db, created_before=datetime(2026, 1, 1), limit=500),
+    "commission.get_commission": lambda db: crud_commission.get_commission(db, 1),
+    "commission.get_commissions_by_reseller": lambda db: crud_commission.get_commissions_by_reseller(db, reseller_id=1),
+    "commission.get_commissions_by_reseller[status]": lambda db: crud_commission.get_commissions_by_reseller(db, reseller_id=1, status="UNPAID"),
+    "commission.get_commissions_by_reseller[cursor]": lambda db: crud_commission.get_commissions_by_reseller(db, reseller_id=1, status="UNPAID", cursor=CURSOR),
+    "commission.get_unpaid_commissions_for_reseller": lambda db: crud_commission.get_unpaid_commissions_for_reseller(db, reseller_id=1),
+    "commission.get_commission_totals_by_reseller": lambda db: crud_commission.get_commission_totals_by_reseller(db, reseller_id=1),
+    "commission.get_commissions_by_order_id": lambda db: crud_commission.get_commissions_by_order_id(db, order_id=1),
+    "commission.get_commissions_by_order_ids": lambda db: crud_commission.get_commissions_by_order_ids(db, order_ids=[1, 2, 3]),
+    "product.get_product": lambda db: crud_product.get_product(db, 1),
+    "product.get_products_by_ids": lambda db: crud_product.get_products_by_ids(db, product_ids=[1, 2, 3]),
+    "product.get_products_by_country": lambda db: crud_product.get_products_by_country(db, country_code="us"),
+    "product.get_all_products": lambda db: crud_product.get_all_products(db, is_active=True),
+    "product.get_distinct_active_countries": lambda db: crud_product.get_distinct_active_countries(db),
+    "reseller.get_reseller": lambda db: crud_reseller.get_reseller(db, 1),
+    "reseller.get_resellers_by_ids": lambda db: crud_reseller.get_resellers_by_ids(db, reseller_ids=[1, 2, 3]),
+    "reseller.get_reseller_by_email": lambda db: crud_reseller.get_reseller_by_email(db, "r@example.com"),
+    "reseller.get_recruited_resellers": lambda db: crud_reseller.get_recruited_resellers(db, recruiter_id=1),
+    "reseller.get_downline": lambda db: crud_reseller.get_downline(db, reseller_id=1),
+    "reseller.get_downline[max_depth]": lambda db: crud_reseller.get_downline(db, reseller_id=1, max_depth=2),
+    "reseller.get_upline": lambda db: crud_reseller.get_upline(db, reseller_id=1, max_depth=10),
+    "reseller.get_uplines": lambda db: crud_reseller.get_uplines(db, reseller_ids=[1, 2, 3], max_depth=10),
+}
+
+@pytest.mark.parametrize("name", sorted(CRUD_READS))
+def test_crud_read_uses_index(db_session: Session, name: str):
+    assert_indexed(query_plans(db_session, lambda: CRUD_READS[name](db_session)))
+
+# Aggregates over a team: the rows are found through indexes, but grouping by
+# depth/month/currency needs a temporary b-tree over the (small) grouped set.
+TEAM_VOLUME_READS = {
+    "team_volume.get_team_volume": lambda db: crud_team_volume.get_team_volume(db, reseller_id=1),
+    "team_volume.get_team_volume[totals]": lambda db: crud_team_volume.get_team_volume(
+        db, reseller_id=1, max_depth=3, period_from=datetime(2026, 1, 1).date(), by_depth=False, by_period=False
+    ),
+}
+
+@pytest.mark.parametrize("name", sorted(TEAM_VOLUME_READS))
+def test_team_volume_read_uses_index(db_session: Session, name: str):
+    for plan in query_plans(db_session, lambda: TEAM_VOLUME_READS[name](db_session)):
+        for step in plan:
+            assert not re.match(r"^SCAN \w+$", step), f"Full table scan: {plan}"
@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.db.session import install_sqlite_pragmas, sqlite_pragmas, to_async_database_uri
+
+def test_to_async_database_uri():
+    assert to_async_database_uri("sqlite:///./roamstop.db") == "sqlite+aiosqlite:///./roamstop.db"
+    assert to_async_database_uri("postgresql://u:p@db/roamstop") == "postgresql+asyncpg://u:p@db/roamstop"
+    assert to_async_database_uri("postgresql+psycopg2://u:p@db/roamstop") == "postgresql+asyncpg://u:p@db/roamstop"
+    assert to_async_database_uri("sqlite+aiosqlite:///x.db") == "sqlite+aiosqlite:///x.db"
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'tuned.db'}", poolclass=NullPool)
+    install_sqlite_pragmas(engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1 # NORMAL
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == sqlite_pragmas()["busy_timeout"]
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2 # MEMORY
+        assert connection.execute(text("PRAGMA cache_size")).scalar() == sqlite_pragmas()["cache_size"]
+    engine.dispose()
+
+@pytest.mark.asyncio
+async def test_sqlite_pragmas_applied_on_async_connect(tmp_path):
+    async_engine = create_async_engine(to_async_database_uri(f"sqlite:///{tmp_path / 'tuned_async.db'}"), poolclass=NullPool)
+    install_sqlite_pragmas(async_engine.sync_engine)
+    async with async_engine.connect() as connection:
+        assert (await connection.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await connection.execute(text("PRAGMA busy_timeout"))).scalar() == sqlite_pragmas()["busy_timeout"]
+    await async_engine.dispose()
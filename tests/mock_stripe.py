@@ -0,0 +1,101 @@
+"""
+A local stand-in for the Stripe API's PaymentIntent endpoints, for tests and
+benchmarks that must not reach api.stripe.com.
+
+    with MockStripeServer(latency_ms=50) as mock:
+        client = PaymentsClient(api_key="sk_test_mock", api_base=mock.url)
+
+Implements POST /v1/payment_intents (honouring Idempotency-Key) and
+GET /v1/payment_intents/<id> closely enough for the stripe library. Requests are
+served concurrently (one thread each) after latency_ms, like a remote API would,
+and recorded in `requests`.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qsl
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "MockStripeServer"
+    protocol_version = "HTTP/1.1" # Keep-alive, so clients can pool connections
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _record(self, params: Dict) -> None:
+        with self.server.lock:
+            self.server.requests.append({
+                "method": self.command, "path": self.path, "params": params,
+                "idempotency_key": self.headers.get("Idempotency-Key"),
+            })
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        params = dict(parse_qsl(body))
+        self._record(params)
+        if self.path != "/v1/payment_intents":
+            return self._reply(404, {"error": {"type": "invalid_request_error", "message": f"Unrecognized request URL (POST: {self.path})"}})
+        key = self.headers.get("Idempotency-Key")
+        with self.server.lock:
+            replayed = self.server.idempotent.get(key)
+        if replayed is not None:
+            return self._reply(200, replayed)
+        with self.server.lock:
+            self.server.created += 1
+            intent_id = f"pi_mock_{self.server.created}"
+            intent = {
+                "id": intent_id, "object": "payment_intent", "status": "requires_payment_method",
+                "amount": int(params["amount"]), "currency": params["currency"],
+                "client_secret": f"{intent_id}_secret_mock",
+                "metadata": {name[len("metadata["):-1]: value for name, value in params.items() if name.startswith("metadata[")},
+            }
+            self.server.payment_intents[intent_id] = intent
+            if key:
+                self.server.idempotent[key] = intent
+        self._reply(200, intent)
+
+    def do_GET(self):
+        self._record({})
+        intent_id = self.path.rsplit("/", 1)[-1]
+        intent = self.server.payment_intents.get(intent_id) if self.path.startswith("/v1/payment_intents/") else None
+        if intent is None:
+            return self._reply(404, {"error": {"type": "invalid_request_error", "code": "resource_missing", "message": f"No such payment_intent: '{intent_id}'"}})
+        self._reply(200, intent)
+
+class MockStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_ms: float = 0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.requests: List[Dict] = []
+        self.payment_intents: Dict[str, Dict] = {}
+        self.idempotent: Dict[str, Dict] = {} # Idempotency-Key -> the intent it created
+        self.created = 0
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "MockStripeServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+        self.server_close()
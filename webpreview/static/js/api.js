@@ -261,6 +261,31 @@ async function getMyCommissions(status = null, skip = 0, limit = 20) {
     }
 }
 
+/**
+ * Fetches the commission totals of the currently logged-in reseller. (AUTH REQUIRED)
+ * @returns {Promise<object>} A promise that resolves to the summary: reseller_id and totals, an array of
+ *   {commission_status, currency, total_amount, count} objects, one per status and currency.
+ */
+async function getMyCommissionSummary() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/resellers/me/commissions/summary`, {
+            method: 'GET',
+            headers: buildHeaders(),
+        });
+        if (response.status === 401) {
+            if (typeof window.logoutReseller === 'function') window.logoutReseller();
+            throw new Error('Unauthorized. Please login again.');
+        }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        return await response.json();
+    } catch (error) {
+        console.error('Error fetching reseller commission summary:', error);
+        throw error;
+    }
+}
+
 
 /**
  * Fetches the sales for the currently logged-in reseller. (AUTH REQUIRED)
@@ -359,5 +384,6 @@ window.api = {
     getResellerSales,
     getResellerSalesCount,
     updateResellerPromotionDetails,
-    getMyCommissions
+    getMyCommissions,
+    getMyCommissionSummary
 };
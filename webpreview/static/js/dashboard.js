@@ -181,13 +181,23 @@ document.addEventListener('DOMContentLoaded', function () {
 
         if (totalUnpaidCommissionsSpan) {
             totalUnpaidCommissionsSpan.textContent = 'Calculating...';
-            Promise.all([
-                api.getMyCommissions('UNPAID', 0, 10000), // Fetch more for accurate sum
-                api.getMyCommissions('READY_FOR_PAYOUT', 0, 10000)
-            ]).then(([unpaid, readyForPayout]) => {
-                const allUnpaid = unpaid.concat(readyForPayout);
-                const total = allUnpaid.reduce((sum, comm) => sum + parseFloat(comm.amount), 0);
-                totalUnpaidCommissionsSpan.textContent = total.toFixed(2);
+            // Totals are computed server-side (SUM/COUNT grouped by status and currency)
+            api.getMyCommissionSummary().then(summary => {
+                const unpaidStatuses = ['UNPAID', 'READY_FOR_PAYOUT'];
+                const byCurrency = {};
+                summary.totals
+                    .filter(row => unpaidStatuses.includes(row.commission_status))
+                    .forEach(row => {
+                        byCurrency[row.currency] = (byCurrency[row.currency] || 0) + parseFloat(row.total_amount);
+                    });
+                const currencies = Object.keys(byCurrency);
+                if (currencies.length <= 1) {
+                    totalUnpaidCommissionsSpan.textContent = (byCurrency[currencies[0]] || 0).toFixed(2);
+                } else {
+                    totalUnpaidCommissionsSpan.textContent = currencies
+                        .map(currency => `${byCurrency[currency].toFixed(2)} ${currency}`)
+                        .join(', ');
+                }
             }).catch(err => {
                 console.error("Error calculating total unpaid commissions:", err);
                 totalUnpaidCommissionsSpan.textContent = 'Error';